@@ -0,0 +1,166 @@
+"""
+Stress harness for concluding backup requests under contention.
+
+Opens a batch of backup requests, then fires several simultaneous Win/Lose/Truce clicks
+at every one of them through BackupControlsView: the author and an admin racing each
+other, plus re-delivered copies of the same interaction. It checks that each war is
+recorded exactly once, that the extra clicks are rejected, and that a click re-delivered
+after a restart is rejected as well. It also reports click latency percentiles and the
+wait on DataManager's save lock.
+
+Exits with status 1 if any war is recorded more or less than once.
+
+Usage:
+    python benchmarks/bench_conclude_contention.py --requests 1000 --clicks 4
+    python benchmarks/bench_conclude_contention.py --journaled --write-behind 0.5
+"""
+import argparse
+import asyncio
+import collections
+import datetime
+import json
+import logging
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+import discord
+
+from bench_hot_paths import GUILD_ID, Harness, percentile
+from fakes import FakeInteraction, FakeUser
+import celestialsentry as cs
+
+ADMIN_ID = 10_002
+BUTTONS = ["win", "lose", "truce"]
+
+
+async def click(view: cs.BackupBot.BackupControlsView, button: str, interaction: FakeInteraction) -> Tuple[float, str]:
+    """Clicks a result button and returns the latency and how the bot answered."""
+    start = time.perf_counter()
+    await getattr(view, button).callback(interaction)
+    latency = time.perf_counter() - start
+    kind, content, _ = interaction.response.sent[-1]
+    return latency, "concluded" if kind == "edit_message" else "rejected" if "already concluded" in (content or "") else "other"
+
+
+async def run(args: argparse.Namespace, workdir: str) -> dict:
+    harness = Harness(workdir, [], args)
+    admin = FakeUser(ADMIN_ID, administrator=True)
+    rng = random.Random(args.seed)
+
+    requests = [await harness.send_request() for _ in range(args.requests)]
+    message_ids = {request.sent_message.id for request in requests}
+    view = harness.bot.BackupControlsView(bot=harness.bot)
+
+    clicks = []
+    for request in requests:
+        message = request.sent_message
+        racers = [harness.interaction(message=message), FakeInteraction(harness.bot, harness.guild, admin, harness.channel, message=message)]
+        while len(racers) < args.clicks:
+            # A re-delivered interaction carries the same id and timestamp as the original.
+            original = rng.choice(racers[:2])
+            redelivered = FakeInteraction(harness.bot, harness.guild, original.user, harness.channel, message=message)
+            redelivered.id, redelivered.created_at = original.id, original.created_at
+            racers.append(redelivered)
+        clicks.extend((rng.choice(BUTTONS), interaction) for interaction in racers[:args.clicks])
+    rng.shuffle(clicks)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(click(view, button, interaction) for button, interaction in clicks))
+    elapsed = time.perf_counter() - start
+    await harness.bot.war_data.flush()
+    await harness.bot.active_requests.flush()
+
+    recorded = collections.Counter(record["war_id"] for record in harness.bot.war_data.iter_wars(str(GUILD_ID)))
+    outcomes = collections.Counter(outcome for _, outcome in results)
+    problems = []
+    if set(recorded) != message_ids:
+        problems.append(f"{len(message_ids - set(recorded))} wars missing, {len(set(recorded) - message_ids)} unexpected")
+    duplicated = sum(1 for count in recorded.values() if count > 1)
+    if duplicated:
+        problems.append(f"{duplicated} wars recorded more than once")
+    if outcomes["concluded"] != args.requests:
+        problems.append(f"{outcomes['concluded']} clicks concluded a request (expected {args.requests})")
+
+    # After a restart the index is rebuilt from storage, so a late re-delivery is still rejected.
+    restarted = harness.new_bot()
+    cs.bot = restarted
+    late = FakeInteraction(restarted, harness.guild, admin, harness.channel, message=requests[0].sent_message)
+    _, late_outcome = await click(restarted.BackupControlsView(bot=restarted), "lose", late)
+    if late_outcome != "rejected":
+        problems.append(f"a click re-delivered after a restart was {late_outcome}")
+    if restarted.war_data.war_count(str(GUILD_ID)) != args.requests:
+        problems.append("the war count changed after the restart")
+
+    latencies = sorted(latency for latency, _ in results)
+    lock_wait = cs.metrics.histogram_summary("datamanager_lock_wait_seconds")
+    return {
+        "requests": args.requests,
+        "clicks": len(clicks),
+        "concluded": outcomes["concluded"],
+        "rejected": outcomes["rejected"],
+        "other": outcomes["other"],
+        "duplicates_counted": cs.metrics.counter_value("duplicate_conclusions_total"),
+        "elapsed_seconds": elapsed,
+        "click_p50_ms": percentile(latencies, 50) * 1000,
+        "click_p99_ms": percentile(latencies, 99) * 1000,
+        "click_max_ms": latencies[-1] * 1000,
+        "lock_wait": {dict(key)["file"]: summary for key, summary in lock_wait.items()},
+        "problems": problems,
+    }
+
+
+def main(args: argparse.Namespace) -> int:
+    logging.getLogger().setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory(prefix="celestialsentry-bench-") as workdir:
+        result = asyncio.run(run(args, workdir))
+
+    print(
+        f"{result['clicks']} clicks on {result['requests']} requests in {result['elapsed_seconds']:.2f}s: "
+        f"{result['concluded']} concluded, {result['rejected']} rejected, {result['other']} other; "
+        f"click p50={result['click_p50_ms']:.2f}ms p99={result['click_p99_ms']:.2f}ms",
+        flush=True
+    )
+    for file, summary in sorted(result["lock_wait"].items()):
+        print(f"  lock wait on {file:<24} p50={summary['p50'] * 1000:8.3f}ms p99={summary['p99'] * 1000:8.3f}ms ({summary['count']} saves)")
+    for problem in result["problems"]:
+        print(f"FAIL: {problem}")
+    if not result["problems"]:
+        print("OK: every war was recorded exactly once.")
+
+    if args.output:
+        report = {
+            "meta": {
+                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "storage": args.storage,
+                "journaled": args.journaled,
+                "write_behind": args.write_behind,
+            },
+            "result": result,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 1 if result["problems"] else 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000, help="Backup requests to conclude (default: 1000).")
+    parser.add_argument("--clicks", type=int, default=4, help="Simultaneous result clicks per request, at least 2 (default: 4).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the button and ordering shuffle.")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--journaled", action="store_true", help="Enable DataManager's journaled mode.")
+    parser.add_argument("--write-behind", type=float, default=None, help="Enable write-behind saves with this window.")
+    parser.add_argument("--output", help="Also write the result as JSON here.")
+    args = parser.parse_args()
+    args.clicks = max(2, args.clicks)
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
@@ -0,0 +1,230 @@
+"""
+Offline benchmarks for the bot's hot paths: DataManager load/save, _send_backup_request,
+end_war (the Win/Lose/Truce buttons) and /warstats, at several war-history sizes.
+
+Everything runs against stand-in Discord objects (see fakes.py) in a temporary data
+directory, so no token or network access is needed. Results are written as JSON so runs
+from different versions can be diffed.
+
+Usage:
+    python benchmarks/bench_hot_paths.py --sizes 1000,100000 --output bench.json
+    python benchmarks/bench_hot_paths.py --sizes 1000000 --storage sqlite
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from typing import Awaitable, Callable, List
+
+import discord
+
+from fakes import FakeChannel, FakeGuild, FakeInteraction, FakeUser, generate_war_history
+import celestialsentry as cs
+
+GUILD_ID = 1_000_000_000_000_000_001
+CHANNEL_ID = 2_000
+ROLE_ID = 3_000
+AUTHOR_ID = 10_001
+
+Step = Callable[[], Awaitable[None]]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+async def time_steps(make_step: Callable[[], Awaitable[Step]], iterations: int, time_budget: float) -> List[float]:
+    """
+    Runs up to `iterations` steps and returns their latencies in seconds. `make_step` does the
+    untimed setup for one iteration and returns the coroutine function to time. Slow paths stop
+    early once `time_budget` seconds have been spent (but always run at least 3 times).
+    """
+    latencies: List[float] = []
+    spent = 0.0
+    for _ in range(iterations):
+        step = await make_step()
+        start = time.perf_counter()
+        await step()
+        latencies.append(time.perf_counter() - start)
+        spent += latencies[-1]
+        if spent > time_budget and len(latencies) >= 3:
+            break
+    return latencies
+
+
+async def peak_memory(make_step: Callable[[], Awaitable[Step]], iterations: int) -> int:
+    """Returns the peak traced allocation (bytes) while running a few steps."""
+    steps = [await make_step() for _ in range(iterations)]
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    for step in steps:
+        await step()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def summarize(path: str, records: int, latencies: List[float], peak_bytes: int) -> dict:
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    return {
+        "path": path,
+        "records": records,
+        "iterations": len(ordered),
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p90_ms": percentile(ordered, 90) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+        "throughput_ops": len(ordered) / total if total else 0.0,
+        "peak_memory_kb": peak_bytes / 1024,
+    }
+
+
+class Harness:
+    """A BackupBot wired to a temporary data directory and seeded with synthetic history."""
+    def __init__(self, workdir: str, records: List[dict], args: argparse.Namespace):
+        self.workdir = workdir
+        self.args = args
+        self.guild = FakeGuild(GUILD_ID)
+        self.channel = FakeChannel(CHANNEL_ID)
+        self.author = FakeUser(AUTHOR_ID)
+
+        cs.BASE_DIR = workdir
+        with open(os.path.join(workdir, "war_data.json"), 'w', encoding='utf-8') as f:
+            json.dump({str(GUILD_ID): records}, f)
+        self.bot = self.new_bot()
+        self.bot.configs.set(str(GUILD_ID), {"allowed_channel_id": CHANNEL_ID, "backup_role_id": ROLE_ID})
+        # The command callbacks resolve the module-level `bot`, so point it at this instance.
+        cs.bot = self.bot
+
+    def new_bot(self) -> cs.BackupBot:
+        return cs.BackupBot(
+            intents=discord.Intents.default(), guild_id=None, journaled=self.args.journaled,
+            write_behind=self.args.write_behind, war_storage=self.args.storage
+        )
+
+    def interaction(self, message=None) -> FakeInteraction:
+        return FakeInteraction(self.bot, self.guild, self.author, self.channel, message=message)
+
+    async def send_request(self) -> FakeInteraction:
+        interaction = self.interaction()
+        await cs._send_backup_request(interaction, "roblox_bench", "opp_1, opp_2, opp_3", "Europe", None, is_debug=False)
+        return interaction
+
+    # --- Step factories: untimed setup, returning the timed coroutine ---
+    async def load_step(self) -> Step:
+        async def step():
+            if self.args.storage == "sqlite":
+                cs.SQLiteWarStore("war_data.sqlite3").close()
+            else:
+                cs.JSONWarStore("war_data.json", journaled=self.args.journaled)
+        return step
+
+    async def save_step(self) -> Step:
+        record = generate_war_history(1, seed=int(time.time()))[0]
+        self.bot.war_data.append(str(GUILD_ID), record)
+        async def step():
+            await self.bot.war_data.save()
+            await self.bot.war_data.flush()
+        return step
+
+    async def send_request_step(self) -> Step:
+        interaction = self.interaction()
+        async def step():
+            await cs._send_backup_request(interaction, "roblox_bench", "opp_1, opp_2, opp_3", "Europe", None, is_debug=False)
+        return step
+
+    async def end_war_step(self) -> Step:
+        request = await self.send_request()
+        view = self.bot.BackupControlsView(bot=self.bot)
+        interaction = self.interaction(message=request.sent_message)
+        async def step():
+            await view.win.callback(interaction)
+        return step
+
+    async def warstats_step(self) -> Step:
+        interaction = self.interaction()
+        async def step():
+            await cs.warstats_command.callback(interaction)
+        return step
+
+
+async def bench_size(size: int, args: argparse.Namespace) -> List[dict]:
+    records = generate_war_history(size, seed=size)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="celestialsentry-bench-") as workdir:
+        harness = Harness(workdir, records, args)
+        del records
+
+        paths = [
+            ("datamanager.load", harness.load_step, min(args.iterations, 5)),
+            ("datamanager.save", harness.save_step, min(args.iterations, 20)),
+            ("send_backup_request", harness.send_request_step, args.iterations),
+            ("end_war", harness.end_war_step, args.iterations),
+        ]
+
+        # The first /warstats call builds the guild's aggregates; report it separately.
+        cold = await time_steps(harness.warstats_step, 1, args.time_budget)
+        results.append(summarize("warstats.cold", size, cold, 0))
+        paths.append(("warstats", harness.warstats_step, args.iterations))
+
+        for path, make_step, iterations in paths:
+            latencies = await time_steps(make_step, iterations, args.time_budget)
+            peak = await peak_memory(make_step, min(3, iterations))
+            results.append(summarize(path, size, latencies, peak))
+            print(f"[{size:>9} records] {path:<22} p50={results[-1]['p50_ms']:9.3f}ms p99={results[-1]['p99_ms']:9.3f}ms", flush=True)
+
+        await harness.bot.war_data.flush()
+    return results
+
+
+async def main(args: argparse.Namespace):
+    logging.getLogger().setLevel(logging.ERROR)
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "discord_py": discord.__version__,
+            "storage": args.storage,
+            "journaled": args.journaled,
+            "write_behind": args.write_behind,
+        },
+        "results": [],
+    }
+    for size in args.sizes:
+        report["results"].extend(await bench_size(size, args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(',')], default=[1_000, 100_000],
+                        help="Comma-separated war-history sizes (default: 1000,100000).")
+    parser.add_argument("--iterations", type=int, default=200, help="Max iterations per path (default: 200).")
+    parser.add_argument("--time-budget", type=float, default=10.0, help="Seconds to spend per path before stopping early.")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--journaled", action="store_true", help="Enable DataManager's journaled mode.")
+    parser.add_argument("--write-behind", type=float, default=None, help="Enable write-behind saves with this window.")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
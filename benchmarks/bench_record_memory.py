@@ -0,0 +1,110 @@
+"""
+Memory benchmark for war history held as one dict per record (the default) versus
+WarRecordColumns (WAR_COMPACT_RECORDS=true), at several history sizes.
+
+Each layout is loaded by JSONWarStore from the same synthetic war_data.json in a temporary
+directory, the way the bot loads it at startup. Reported per layout: resident memory after
+loading (total and per record), the peak while loading, load time, the time for
+war_summary (which has a column fast path) and for one full pass over the records as
+dicts, which the columnar layout has to decode. Results are written as JSON.
+
+Usage:
+    python benchmarks/bench_record_memory.py --sizes 100000,1000000 --output memory.json
+"""
+import argparse
+import datetime
+import gc
+import json
+import logging
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from typing import List, Optional
+
+from fakes import iter_war_history
+import celestialsentry as cs
+
+GUILD_ID = "1000000000000000001"
+LAYOUTS = [("dicts", None), ("columns", cs.WarRecordColumns)]
+
+
+def write_history(workdir: str, size: int):
+    """Writes a synthetic war_data.json without holding the whole history as dicts."""
+    records = cs.WarRecordColumns(iter_war_history(size, seed=size))
+    with open(os.path.join(workdir, "war_data.json"), 'w', encoding='utf-8') as f:
+        json.dump({GUILD_ID: records}, f, default=cs.json_default)
+
+
+def measure(size: int, layout: str, list_factory: Optional[type]) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    store = cs.JSONWarStore("war_data.json", list_factory=list_factory)
+    load_seconds = time.perf_counter() - start
+    resident, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    store.war_summary(GUILD_ID)
+    summary_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in store.iter_wars(GUILD_ID):
+        pass
+    iterate_seconds = time.perf_counter() - start
+    del store
+    return {
+        "layout": layout,
+        "records": size,
+        "resident_mb": resident / 2**20,
+        "bytes_per_record": resident / size,
+        "load_peak_mb": peak / 2**20,
+        "load_seconds": load_seconds,
+        "summary_seconds": summary_seconds,
+        "iterate_seconds": iterate_seconds,
+    }
+
+
+def main(args: argparse.Namespace):
+    logging.getLogger().setLevel(logging.ERROR)
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": [],
+    }
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory(prefix="celestialsentry-bench-") as workdir:
+            cs.BASE_DIR = workdir
+            write_history(workdir, size)
+            for layout, list_factory in LAYOUTS:
+                result = measure(size, layout, list_factory)
+                report["results"].append(result)
+                print(
+                    f"[{size:>9} records] {layout:<8} resident={result['resident_mb']:9.1f}MB "
+                    f"({result['bytes_per_record']:6.0f} B/record) load peak={result['load_peak_mb']:9.1f}MB "
+                    f"summary={result['summary_seconds']:7.3f}s iterate={result['iterate_seconds']:7.3f}s",
+                    flush=True
+                )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(',')], default=[100_000, 1_000_000],
+                        help="Comma-separated war-history sizes (default: 100000,1000000).")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
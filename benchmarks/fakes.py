@@ -0,0 +1,168 @@
+"""
+Offline stand-ins for the discord.py objects the bot's hot paths touch.
+
+They implement just enough of Interaction, Message, Guild and friends for the command
+and button handlers to run without a gateway connection. Embeds are real discord.Embed
+objects, which are plain data containers.
+"""
+import atexit
+import datetime
+import itertools
+import os
+import random
+import shutil
+import sys
+import tempfile
+from typing import Iterator, List, Optional
+
+import discord
+
+# Make celestialsentry importable when running scripts from this folder.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing celestialsentry builds the module-level bot, which opens its data files and
+# bot.log. Point those at a throwaway directory so runs never touch the repository.
+if "DATA_DIR" not in os.environ:
+    os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="celestialsentry-bench-data-")
+    atexit.register(shutil.rmtree, os.environ["DATA_DIR"], True)
+
+_snowflakes = itertools.count(1_100_000_000_000_000_000)
+
+REGIONS = ["US East", "US West", "Europe", "Australia", "Asia", "Unknown"]
+STATUSES = ["Win", "Loss", "Truce"]
+
+
+def next_snowflake() -> int:
+    return next(_snowflakes)
+
+
+class FakeRole:
+    def __init__(self, role_id: int):
+        self.id = role_id
+        self.mention = f"<@&{role_id}>"
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, name: str = "Benchmark Guild"):
+        self.id = guild_id
+        self.name = name
+        self.icon = None
+
+    def get_role(self, role_id: int) -> FakeRole:
+        return FakeRole(role_id)
+
+
+class FakePermissions:
+    def __init__(self, administrator: bool = False):
+        self.administrator = administrator
+
+
+class FakeUser:
+    def __init__(self, user_id: int, administrator: bool = False):
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+        self.guild_permissions = FakePermissions(administrator)
+
+    def __str__(self) -> str:
+        return f"user#{self.id}"
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+
+
+class FakeMessage:
+    def __init__(self, message_id: int, content: str, embed: Optional[discord.Embed], channel: FakeChannel):
+        self.id = message_id
+        self.content = content or ""
+        self.embeds: List[discord.Embed] = [embed] if embed else []
+        self.channel = channel
+        self.created_at = discord.utils.utcnow()
+
+
+class FakeCallbackResponse:
+    def __init__(self, message_id: Optional[int]):
+        self.message_id = message_id
+
+
+class FakeResponse:
+    """Records what a handler sent instead of talking to Discord."""
+    def __init__(self, interaction: 'FakeInteraction'):
+        self._interaction = interaction
+        self._done = False
+        self.sent: list = []
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def send_message(self, content=None, **kwargs) -> FakeCallbackResponse:
+        self._done = True
+        self.sent.append(("send_message", content, kwargs))
+        message = FakeMessage(next_snowflake(), content, kwargs.get("embed"), self._interaction.channel)
+        self._interaction.sent_message = message
+        return FakeCallbackResponse(message.id)
+
+    async def edit_message(self, **kwargs):
+        self._done = True
+        self.sent.append(("edit_message", None, kwargs))
+
+    async def send_modal(self, modal):
+        self._done = True
+        self.sent.append(("send_modal", None, {"modal": modal}))
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.sent: list = []
+
+    async def send(self, *args, **kwargs):
+        self.sent.append((args, kwargs))
+
+
+class FakeInteraction:
+    def __init__(
+        self, client, guild: FakeGuild, user: FakeUser, channel: FakeChannel,
+        message: Optional[FakeMessage] = None
+    ):
+        self.id = next_snowflake()
+        self.client = client
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = user
+        self.channel = channel
+        self.channel_id = channel.id
+        self.message = message
+        self.command = None
+        self.created_at = discord.utils.utcnow()
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup()
+        self.sent_message: Optional[FakeMessage] = None
+
+
+def generate_war_history(count: int, *, seed: int = 0, members: int = 200, opponent_pool: int = 5000) -> List[dict]:
+    """Generates `count` war records shaped like the ones end_war stores, oldest first."""
+    return list(iter_war_history(count, seed=seed, members=members, opponent_pool=opponent_pool))
+
+
+def iter_war_history(count: int, *, seed: int = 0, members: int = 200, opponent_pool: int = 5000) -> Iterator[dict]:
+    """Like generate_war_history, but yields the records one at a time."""
+    rng = random.Random(seed)
+    end = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+    for _ in range(count):
+        duration = rng.lognormvariate(5.5, 0.8)
+        end += datetime.timedelta(seconds=rng.randint(60, 3600))
+        opponents = [f"opp_{rng.randrange(opponent_pool)}" for _ in range(rng.randint(1, 6))]
+        initiator = 10_000 + rng.randrange(members)
+        yield {
+            "war_id": next_snowflake(), "initiator_id": initiator,
+            "initiator_roblox_user": f"roblox_{initiator}", "opponents": ", ".join(opponents),
+            "num_opponents": len(opponents), "region": rng.choice(REGIONS),
+            "start_time_utc": (end - datetime.timedelta(seconds=duration)).isoformat(),
+            "end_time_utc": end.isoformat(), "duration_seconds": duration,
+            "status": rng.choice(STATUSES),
+            "concluded_by_id": initiator if rng.random() < 0.9 else 10_000 + rng.randrange(members)
+        }
@@ -16,7 +16,12 @@ a = Analysis(
         'charset_normalizer',
         'idna',
         'multidict',
-        'yarl'
+        'yarl',
+        'trendchart',
+        # /wartrend charts: bundled when matplotlib is installed on the build machine;
+        # without it the exe starts with /wartrend disabled.
+        'matplotlib',
+        'matplotlib.backends.backend_agg'
     ],
     hookspath=[],
     hooksconfig={},
@@ -1,146 +1,3629 @@
+import time
+IMPORT_START = time.perf_counter()  # Startup timings measure module imports from here.
+
 import discord
+import abc
 import os
 import sys
+import io
 import re
 import json
 import logging
 import datetime
 import asyncio
+import atexit
+import gzip
+import logging.handlers
+import queue
+import shutil
+import contextlib
+import csv
+import tempfile
+import threading
+import hashlib
+import heapq
+import bisect
+import math
+import sqlite3
+import marshal
+import struct
+import zlib
+import importlib.util
+import multiprocessing
+from array import array
+from aiohttp import web, TraceConfig
 from discord.ui import View, Button, Modal, TextInput
 from dotenv import load_dotenv
-from typing import Optional, Union, cast
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Awaitable, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union, cast
+
+import trendchart
+
+try:
+    import numpy as np  # Optional: powers the /warstats breakdowns.
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa  # Optional: enables Parquet output for /warexport.
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# In the frozen (PyInstaller) exe, chart workers start the exe itself; hand them off here
+# before the rest of the module builds a bot.
+if getattr(sys, "frozen", False):
+    multiprocessing.freeze_support()
+
+# Optional: /wartrend charts. Only imported inside the chart worker processes.
+HAS_MATPLOTLIB = importlib.util.find_spec("matplotlib") is not None
+
+# Reference point for the startup phase timings logged once the bot is ready.
+PROCESS_START = time.perf_counter()
 
 # --- COMPILE-READY SETUP: Determine application's base directory ---
 if getattr(sys, 'frozen', False):
-    BASE_DIR = os.path.dirname(sys.executable)
+    APP_DIR = os.path.dirname(sys.executable)
 else:
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# --- Load settings from .env (needed before logging is configured) ---
+dotenv_path = os.path.join(APP_DIR, '.env')
+load_dotenv(dotenv_path=dotenv_path)
+
+# Data files and bot.log live here. DATA_DIR moves them elsewhere (the benchmarks and tests use a temporary directory).
+BASE_DIR = os.getenv('DATA_DIR', '').strip() or APP_DIR
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """Reads a boolean setting from the environment (e.g. `1`, `true`, `yes`)."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def env_int_list(name: str) -> Optional[List[int]]:
+    """Reads a comma-separated list of integers from the environment (e.g. `0,1,2`)."""
+    value = os.getenv(name, '').strip()
+    return [int(part) for part in value.split(',') if part.strip()] if value else None
 
 # --- Setup logging to both console and a file ---
-log_formatter = logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s')
-log_file_path = os.path.join(BASE_DIR, 'bot.log')
+LOG_LEVEL_SETTING = os.getenv('LOG_LEVEL', 'INFO').strip().upper()
+# getLevelName() returns the number of a registered level name (the same names as
+# logging.getLevelNamesMapping() on 3.11+); an unknown one falls back to INFO, with a
+# warning once logging is set up.
+LOG_LEVEL = LOG_LEVEL_SETTING if isinstance(logging.getLevelName(LOG_LEVEL_SETTING), int) else 'INFO'
+LOG_FORMAT = os.getenv('LOG_FORMAT', '').strip() or '%(asctime)s:%(levelname)s:%(name)s: %(message)s'
+# Write one JSON object per line instead of LOG_FORMAT.
+LOG_JSON = env_flag('LOG_JSON')
+# Hand records to a background thread so logging never blocks the event loop on disk writes.
+LOG_QUEUED = env_flag('LOG_QUEUED')
+# Rotate bot.log once it reaches this many bytes (0 disables size-based rotation)...
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', '0') or 0)
+# ...or on a schedule understood by TimedRotatingFileHandler (e.g. "midnight", "H").
+LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', '').strip()
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5') or 5)
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Formats each record as a single JSON line, so the log is cheap to parse."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def compress_rotated_log(source: str, dest: str):
+    """Rotator for the log handlers: gzips the finished segment instead of just renaming it."""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
 
-root_logger = logging.getLogger()
-root_logger.setLevel(logging.INFO)
 
-# File handler
-file_handler = logging.FileHandler(log_file_path, encoding='utf-8', mode='a')
-file_handler.setFormatter(log_formatter)
-root_logger.addHandler(file_handler)
+def configure_logging():
+    """Sends log records to bot.log and the console, as set up by the LOG_* settings."""
+    log_formatter = JsonLogFormatter() if LOG_JSON else logging.Formatter(LOG_FORMAT)
+    log_file_path = os.path.join(BASE_DIR, 'bot.log')
 
-# Console handler
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(log_formatter)
-root_logger.addHandler(console_handler)
+    root_logger = logging.getLogger()
+    root_logger.setLevel(LOG_LEVEL)
+
+    # File handler
+    file_handler: logging.FileHandler
+    if LOG_ROTATE_WHEN:
+        file_handler = logging.handlers.TimedRotatingFileHandler(log_file_path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    elif LOG_MAX_BYTES:
+        file_handler = logging.handlers.RotatingFileHandler(log_file_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    else:
+        file_handler = logging.FileHandler(log_file_path, encoding='utf-8', mode='a')
+    if isinstance(file_handler, logging.handlers.BaseRotatingHandler):
+        file_handler.namer = lambda name: f"{name}.gz"
+        file_handler.rotator = compress_rotated_log
+    file_handler.setFormatter(log_formatter)
+
+    # Console handler
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(log_formatter)
+
+    if LOG_QUEUED:
+        # The listener thread does the actual file and console writes.
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        log_listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        log_listener.start()
+        atexit.register(log_listener.stop)
+    else:
+        root_logger.addHandler(file_handler)
+        root_logger.addHandler(console_handler)
+    if LOG_LEVEL != LOG_LEVEL_SETTING:
+        logging.getLogger('discord').warning(
+            f"Unknown LOG_LEVEL '{LOG_LEVEL_SETTING}'; logging at INFO instead. Use DEBUG, INFO, WARNING, ERROR or CRITICAL."
+        )
+
+
+# A spawned chart worker re-runs this script as __mp_main__ before its first task (see
+# trendchart.start_pool); it must leave bot.log and the data files alone.
+CHART_WORKER = __name__ == "__mp_main__"
+if not CHART_WORKER:
+    configure_logging()
 
 # Get a logger instance for our bot
 logger = logging.getLogger('discord')
 
+class Metrics:
+    """
+    In-process counters, gauges and histograms, rendered in the Prometheus text format.
+    Label values are passed as keyword arguments, e.g. `metrics.inc("commands_total", command="backup")`.
+    """
+    PREFIX = "celestialsentry_"
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._counters: Dict[str, Dict[tuple, float]] = {}
+        self._gauges: Dict[str, Dict[tuple, float]] = {}
+        # Histogram state per label set: [per-bucket counts..., +Inf count, sum].
+        self._histograms: Dict[str, Dict[tuple, List[float]]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        series = self._counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        self._gauges.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+
+    def observe(self, name: str, value: float, **labels):
+        series = self._histograms.setdefault(name, {})
+        state = series.setdefault(tuple(sorted(labels.items())), [0.0] * (len(self.BUCKETS) + 2))
+        state[bisect.bisect_left(self.BUCKETS, value)] += 1
+        state[-1] += value
+
+    @contextlib.contextmanager
+    def time(self, name: str, **labels):
+        """Observes the wall-clock duration of the wrapped block (which may contain awaits)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter_value(self, name: str, **labels) -> float:
+        return self._counters.get(name, {}).get(tuple(sorted(labels.items())), 0.0)
+
+    def histogram_summary(self, name: str) -> Dict[tuple, dict]:
+        """Returns count, mean and estimated p50/p99 for every label set of a histogram."""
+        summaries = {}
+        for key, state in self._histograms.get(name, {}).items():
+            count = sum(state[:-1])
+            summaries[key] = {
+                "count": int(count),
+                "mean": state[-1] / count if count else 0.0,
+                "p50": self._quantile(state, 0.5),
+                "p99": self._quantile(state, 0.99),
+            }
+        return summaries
+
+    def _quantile(self, state: List[float], q: float) -> float:
+        """Estimates a quantile by interpolating within buckets, like Prometheus' histogram_quantile."""
+        count = sum(state[:-1])
+        if not count:
+            return 0.0
+        target, seen = q * count, 0.0
+        for i, bucket_count in enumerate(state[:-1]):
+            if seen + bucket_count >= target:
+                if i == len(self.BUCKETS):
+                    return self.BUCKETS[-1]
+                lower = self.BUCKETS[i - 1] if i else 0.0
+                return lower + (self.BUCKETS[i] - lower) * ((target - seen) / bucket_count if bucket_count else 0.0)
+            seen += bucket_count
+        return self.BUCKETS[-1]
+
+    @staticmethod
+    def _labels(key: tuple, extra: str = "") -> str:
+        parts = []
+        for name, value in key:
+            escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            parts.append(f'{name}="{escaped}"')
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        lines = []
+        for kind, metrics_by_name in (("counter", self._counters), ("gauge", self._gauges)):
+            for name, series in sorted(metrics_by_name.items()):
+                lines.append(f"# TYPE {self.PREFIX}{name} {kind}")
+                lines.extend(f"{self.PREFIX}{name}{self._labels(key)} {value}" for key, value in series.items())
+        for name, series in sorted(self._histograms.items()):
+            lines.append(f"# TYPE {self.PREFIX}{name} histogram")
+            for key, state in series.items():
+                cumulative = 0.0
+                for bound, bucket_count in zip((*self.BUCKETS, "+Inf"), state[:-1]):
+                    cumulative += bucket_count
+                    le_label = f'le="{bound}"'
+                    lines.append(f"{self.PREFIX}{name}_bucket{self._labels(key, le_label)} {cumulative}")
+                lines.append(f"{self.PREFIX}{name}_sum{self._labels(key)} {state[-1]}")
+                lines.append(f"{self.PREFIX}{name}_count{self._labels(key)} {cumulative}")
+        lines.append(f"# TYPE {self.PREFIX}uptime_seconds gauge")
+        lines.append(f"{self.PREFIX}uptime_seconds {time.time() - self.started_at}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide metrics registry, exposed by /botstats and the optional METRICS_PORT endpoint.
+metrics = Metrics()
+
+
+class BinarySnapshot:
+    """
+    Versioned binary file format for DataManager snapshots (DATA_SNAPSHOT_FORMAT=binary).
+
+    Layout: a header (magic, format version, marshal version, entry count), an index of
+    (key, kind, offset, length, crc32) entries, then one marshal payload per top-level key.
+    Reading parses only the header and index; DataManager decodes each payload the first
+    time its key is used, so startup no longer decodes every guild's history up front.
+    WarRecordColumns are stored as their column buffers rather than as records.
+    """
+    MAGIC = b"CSSNAP"
+    VERSION = 1
+    HEADER = struct.Struct("<6sHHI")
+    KEY_LENGTH = struct.Struct("<I")
+    ENTRY = struct.Struct("<BQQI")
+    PLAIN, COLUMNS = 0, 1
+
+    class Entry(NamedTuple):
+        """One top-level value, still encoded."""
+        kind: int
+        payload: bytes
+        crc: int
+
+    class Pending:
+        """
+        A list value's entry, encoded by the writer thread: `base` (an Entry or Pending) covers
+        its first items and `tail` holds the items appended since, copied on the event loop.
+        Without a base, `tail` is a copy of the whole list (or a WarRecordColumns.to_state()).
+        Once encoded, later snapshots reuse it for as long as the list only grows, so a save
+        after an append copies just the new items on the loop.
+        """
+        __slots__ = ("kind", "base", "tail", "count", "entry")
+
+        def __init__(self, kind: int, base, tail, count: int, entry: Optional['BinarySnapshot.Entry'] = None):
+            self.kind, self.base, self.tail, self.count, self.entry = kind, base, tail, count, entry
+
+        def encode(self) -> 'BinarySnapshot.Entry':
+            if self.entry is None:
+                if self.base is None:
+                    value = self.tail
+                else:
+                    value = BinarySnapshot.decode(BinarySnapshot.encode(self.base))
+                    for item in self.tail:
+                        value.append(item)
+                    if isinstance(value, WarRecordColumns):
+                        value = value.to_state()
+                payload = marshal.dumps(value)
+                self.entry = BinarySnapshot.Entry(self.kind, payload, zlib.crc32(payload))
+                self.base = self.tail = None  # Only the encoding is needed from now on.
+            return self.entry
+
+    @staticmethod
+    def path_for(json_path: str) -> str:
+        """Returns the snapshot path used in place of a JSON data file, e.g. war_data.snap."""
+        return f"{os.path.splitext(json_path)[0]}.snap"
+
+    @classmethod
+    def encode(cls, value) -> 'BinarySnapshot.Entry':
+        if isinstance(value, cls.Entry):
+            return value  # Never decoded since it was loaded; written back unchanged.
+        if isinstance(value, cls.Pending):
+            return value.encode()
+        if isinstance(value, WarRecordColumns):
+            kind, payload = cls.COLUMNS, marshal.dumps(value.to_state())
+        else:
+            kind, payload = cls.PLAIN, marshal.dumps(value)
+        return cls.Entry(kind, payload, zlib.crc32(payload))
+
+    @classmethod
+    def decode(cls, entry: 'BinarySnapshot.Entry'):
+        if zlib.crc32(entry.payload) != entry.crc:
+            raise ValueError("checksum mismatch")
+        value = marshal.loads(entry.payload)
+        return WarRecordColumns.from_state(value) if entry.kind == cls.COLUMNS else value
+
+    @classmethod
+    def dump(cls, data: dict, f):
+        """Writes `data` (values may be plain, WarRecordColumns, pending or still-encoded entries) to a binary file."""
+        entries = [(key.encode('utf-8'), cls.encode(value)) for key, value in data.items()]
+        f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, marshal.version, len(entries)))
+        offset = 0
+        for key, entry in entries:
+            f.write(cls.KEY_LENGTH.pack(len(key)))
+            f.write(key)
+            f.write(cls.ENTRY.pack(entry.kind, offset, len(entry.payload), entry.crc))
+            offset += len(entry.payload)
+        for _, entry in entries:
+            f.write(entry.payload)
+
+    @classmethod
+    def read(cls, path: str) -> Dict[str, 'BinarySnapshot.Entry']:
+        """Reads a snapshot's index and payloads without decoding them. Raises ValueError if it's unreadable."""
+        with open(path, 'rb') as f:
+            buffer = f.read()
+        try:
+            magic, version, marshal_version, count = cls.HEADER.unpack_from(buffer)
+            if magic != cls.MAGIC:
+                raise ValueError("not a snapshot file")
+            if version > cls.VERSION or marshal_version > marshal.version:
+                raise ValueError(f"written by a newer version (format {version}, marshal {marshal_version})")
+            position, index = cls.HEADER.size, []
+            for _ in range(count):
+                (key_length,) = cls.KEY_LENGTH.unpack_from(buffer, position)
+                position += cls.KEY_LENGTH.size
+                key = buffer[position:position + key_length].decode('utf-8')
+                position += key_length
+                index.append((key, *cls.ENTRY.unpack_from(buffer, position)))
+                position += cls.ENTRY.size
+        except (struct.error, UnicodeDecodeError) as e:
+            raise ValueError(f"corrupt index: {e}") from e
+        if index and position + index[-1][2] + index[-1][3] != len(buffer):
+            raise ValueError("truncated file")
+
+        view = memoryview(buffer)
+        return {
+            key: cls.Entry(kind, bytes(view[position + offset:position + offset + length]), crc)
+            for key, kind, offset, length, crc in index
+        }
+
+
 class DataManager:
     """
     A thread-safe manager for loading and saving JSON data.
     This class handles file I/O and uses an asyncio.Lock to prevent race conditions
     during write operations.
+
+    In journaled mode, each mutation is appended to a JSONL journal next to the snapshot
+    instead of rewriting the whole file on every save. The journal is replayed on top of
+    the snapshot at load time and compacted into a new snapshot in the background once it
+    grows past `compact_threshold` entries. Every snapshot records the sequence number of
+    the last entry it covers, and a journal left behind with journaling disabled is folded
+    into the snapshot at load, so switching the mode either way never loses or replays
+    entries.
+
+    All disk writes run in a thread-pool executor. With `write_behind` set (in seconds),
+    save() returns immediately and saves made within that window are merged into one write;
+    call flush() before shutting down. A failed write leaves the changes dirty, so the next
+    save or flush retries them.
+
+    Snapshots are taken on the event loop before they're handed to the writer thread, so
+    the thread never reads objects a handler may be editing in place: other values are
+    encoded on the loop, while lists are copied there and encoded by the thread. Encodings
+    are reused for values unchanged since the previous snapshot, and a list that only grew
+    has just its new items copied and merged into its previous encoding. That's why edits
+    to a value must always be followed by set() (or made through append()/delete()), and
+    items must never be edited in place once appended.
+
+    With `list_factory` set (e.g. WarRecordColumns), every list value is held in that
+    container instead of a plain list.
+
+    With `snapshot_format="binary"`, snapshots are written as a BinarySnapshot next to the
+    JSON path (war_data.json -> war_data.snap) and values are decoded lazily on first access.
+    A data file in the other format is converted on load and set aside as `<file>.converted`,
+    so switching back to "json" turns the data back into JSON.
     """
-    def __init__(self, filename: str):
+    JOURNAL_SEQ_KEY = "__journal_seq__"
+    WRITE_RETRY_SECONDS = 5  # Least wait before a failed background write is retried.
+
+    def __init__(
+        self, filename: str, *, journaled: bool = False, compact_threshold: int = 1000,
+        write_behind: Optional[float] = None, list_factory: Optional[Callable[[list], list]] = None,
+        snapshot_format: str = "json"
+    ):
         self.filepath = os.path.join(BASE_DIR, filename)
+        self.snapshot_path = BinarySnapshot.path_for(self.filepath)
+        self.snapshot_format = snapshot_format
+        self.list_factory = list_factory
+        self.journal_path = f"{self.filepath}.journal"
+        self.journaled = journaled
+        self.compact_threshold = compact_threshold
         self._lock = asyncio.Lock()
         self._data: dict = {}
+        self._encoded: Dict[str, BinarySnapshot.Entry] = {}  # Loaded from a binary snapshot but not decoded yet.
+        # Encoded (or being encoded) by a snapshot and unchanged since, lists aside from appends.
+        self._frozen: Dict[str, Union[BinarySnapshot.Entry, BinarySnapshot.Pending]] = {}
+        self._pending: List[str] = []  # Serialized journal lines not yet written to disk.
+        self._seq = 0  # Sequence number of the latest mutation.
+        self._journal_entries = 0  # Entries in the journal since the last snapshot.
+        self._compaction_task: Optional[asyncio.Task] = None
+        self.write_behind = write_behind
+        self._dirty = False
+        self._writer_task: Optional[asyncio.Task] = None
+        self._flush_requested = asyncio.Event()
+        self._file_mtime_ns: Optional[int] = None  # Of the data file as last loaded or written here.
         self.load()
 
+    @staticmethod
+    def has_files(filepath: str) -> bool:
+        """Returns whether a JSON data file, its journal or its binary snapshot exists."""
+        return any(os.path.exists(path) for path in (filepath, f"{filepath}.journal", BinarySnapshot.path_for(filepath)))
+
+    @classmethod
+    def open_existing(cls, filename: str) -> 'DataManager':
+        """
+        Loads a data file as it is on disk: from its binary snapshot if there is one, with its
+        journal replayed if there is one, and without converting it to another format.
+        """
+        filepath = os.path.join(BASE_DIR, filename)
+        return cls(
+            filename, journaled=os.path.exists(f"{filepath}.journal"),
+            snapshot_format="binary" if os.path.exists(BinarySnapshot.path_for(filepath)) else "json"
+        )
+
     def load(self):
-        """Loads data from the JSON file into memory."""
+        """Loads the snapshot (JSON or binary) into memory, replaying the journal if enabled."""
+        load_start = time.perf_counter()
+        binary = self.snapshot_format == "binary"
+        converted_from = None
+        self._frozen = {}
+        if binary and os.path.exists(self.snapshot_path):
+            self._load_binary(lazy=True)
+        elif not binary and not os.path.exists(self.filepath) and os.path.exists(self.snapshot_path):
+            if self._load_binary(lazy=False):
+                converted_from = self.snapshot_path
+        elif self._load_json() and binary:
+            converted_from = self.filepath
+
+        self._seq = self._data.pop(self.JOURNAL_SEQ_KEY, 0)
+        if self.list_factory:
+            for key, value in self._data.items():
+                if isinstance(value, list):
+                    self._data[key] = self.list_factory(value)
+        if converted_from:
+            self._convert(converted_from)
+        self._replay_journal()
+        if not self.journaled and os.path.exists(self.journal_path):
+            self._fold_journal()
+        self._file_mtime_ns = self._current_mtime_ns()
+        metrics.observe("datamanager_load_seconds", time.perf_counter() - load_start, file=os.path.basename(self.filepath))
+
+    def _current_mtime_ns(self) -> Optional[int]:
+        try:
+            return os.stat(self.snapshot_path if self.snapshot_format == "binary" else self.filepath).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def reload_changed(self) -> List[str]:
+        """
+        Reloads the data file if something other than this manager changed it since it was
+        last loaded or written here, and returns the keys whose values differ. Skipped while
+        changes made here are waiting to be written, so those are never overwritten.
+        """
+        if self._current_mtime_ns() == self._file_mtime_ns or self._dirty or self._pending or self._lock.locked():
+            return []
+        before = dict(self.items())
+        self.load()
+        after = dict(self.items())
+        changed = [key for key in before.keys() | after.keys() if before.get(key) != after.get(key)]
+        logger.info(f"{self.filepath} changed on disk; reloaded {len(changed)} changed keys.")
+        return changed
+
+    def _load_json(self) -> bool:
+        """Reads the JSON file. Returns whether it was read, so unreadable files are never converted."""
+        self._data = {}
         try:
             with open(self.filepath, 'r', encoding='utf-8') as f:
                 self._data = json.load(f)
                 logger.info(f"Data loaded successfully from {self.filepath}")
+                return True
         except FileNotFoundError:
             logger.warning(f"{self.filepath} not found. A new file will be created on first save.")
-            self._data = {}
         except json.JSONDecodeError:
             logger.error(f"Could not decode JSON from {self.filepath}. Starting with empty data.")
-            self._data = {}
+        return False
+
+    def _load_binary(self, lazy: bool) -> bool:
+        """Reads a binary snapshot. With `lazy`, values stay encoded until their key is first used."""
+        self._data = {}
+        try:
+            self._encoded = BinarySnapshot.read(self.snapshot_path)
+            logger.info(f"Data loaded successfully from {self.snapshot_path}")
+        except ValueError as e:
+            logger.error(f"Could not read {self.snapshot_path} ({e}). Starting with empty data.")
+            self._encoded = {}
+            return False
+        if self.JOURNAL_SEQ_KEY in self._encoded:
+            self._decode(self.JOURNAL_SEQ_KEY)
+        if not lazy:
+            for key in list(self._encoded):
+                self._decode(key)
+        return True
+
+    def _decode(self, key: str):
+        """Decodes a value left encoded by a lazy load, dropping it if its payload is damaged."""
+        entry = self._encoded.pop(key)
+        try:
+            value = BinarySnapshot.decode(entry)
+        except (ValueError, EOFError, TypeError) as e:
+            logger.error(f"Could not decode '{key}' from {self.snapshot_path} ({e}). Its data is lost.")
+            return
+        if isinstance(value, WarRecordColumns) and not self.list_factory:
+            value = list(value)  # Written with WAR_COMPACT_RECORDS on, read with it off.
+        value = self._data[key] = self._coerce(value)
+        kind = BinarySnapshot.COLUMNS if isinstance(value, WarRecordColumns) else BinarySnapshot.PLAIN
+        if isinstance(value, (list, WarRecordColumns)) and entry.kind == kind:
+            # Appends made before the next save are merged into the loaded encoding.
+            self._frozen[key] = BinarySnapshot.Pending(kind, None, None, len(value), entry)
+
+    def _convert(self, old_path: str):
+        """Rewrites the data just loaded from `old_path` in the configured format, then sets the old file aside."""
+        self._write_snapshot(self._snapshot())
+        os.replace(old_path, f"{old_path}.converted")
+        logger.info(f"Converted {old_path} to {self.snapshot_format}; the original was kept as {old_path}.converted")
+
+    def _replay_journal(self):
+        """Applies journal entries newer than the snapshot, truncating any torn trailing write."""
+        replayed, valid_end = 0, 0
+        try:
+            with open(self.journal_path, 'rb') as f:
+                for raw_line in f:
+                    try:
+                        # An entry is only complete with its newline; without it the next append would run into it.
+                        if not raw_line.endswith(b"\n"):
+                            raise ValueError("unterminated entry")
+                        entry = json.loads(raw_line)
+                    except (ValueError, UnicodeDecodeError):
+                        logger.warning(f"Discarding unreadable journal tail in {self.journal_path} at byte {valid_end}.")
+                        break
+                    valid_end += len(raw_line)
+                    if entry["seq"] > self._seq:
+                        self._apply(entry)
+                        self._seq = entry["seq"]
+                        replayed += 1
+        except FileNotFoundError:
+            return
+
+        # Cut off a partially written entry so new appends start on a clean line.
+        if os.path.getsize(self.journal_path) != valid_end:
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(valid_end)
+
+        self._journal_entries = replayed
+        if replayed:
+            logger.info(f"Replayed {replayed} journal entries from {self.journal_path}")
+
+    def _fold_journal(self):
+        """Writes the replayed journal into the snapshot and removes it, for when journaling is disabled."""
+        self._write_snapshot(self._snapshot())
+        os.remove(self.journal_path)
+        self._journal_entries = 0
+        logger.info(f"Folded {self.journal_path} into {self.filepath} because journaling is disabled.")
+
+    def _apply(self, entry: dict):
+        """Applies a single journal entry to the in-memory data."""
+        if entry["op"] == "set":
+            self._frozen.pop(entry["key"], None)
+            self._encoded.pop(entry["key"], None)
+            self._data[entry["key"]] = self._coerce(entry["value"])
+        elif entry["op"] == "append":
+            self._list(entry["key"]).append(entry["value"])
+        elif entry["op"] == "delete":
+            self._frozen.pop(entry["key"], None)
+            self._encoded.pop(entry["key"], None)
+            self._data.pop(entry["key"], None)
+
+    def _record(self, op: str, key: str, value):
+        """Queues a mutation for the journal. Serialized now so later in-place edits can't leak in."""
+        if self.journaled:
+            self._seq += 1
+            self._pending.append(json.dumps({"seq": self._seq, "op": op, "key": key, "value": value}))
+
+    def _coerce(self, value):
+        """Converts a list value to the list_factory container, if one is set."""
+        return self.list_factory(value) if self.list_factory and isinstance(value, list) else value
+
+    def _list(self, key: str):
+        """Returns the list stored under `key`, creating an empty one if needed."""
+        if key in self._encoded:
+            self._decode(key)
+        values = self._data.get(key)
+        if values is None:
+            values = self._data[key] = self._coerce([])
+        return values
+
+    def _snapshot(self) -> Dict[str, Union[BinarySnapshot.Entry, BinarySnapshot.Pending]]:
+        """
+        Returns the data as BinarySnapshot entries, with the sequence number of the latest
+        mutation it includes. Runs on the event loop, so later in-place edits can't race the
+        writer thread. Lists are returned as pending entries for the thread to encode, built
+        from their previous encoding plus copies of the items appended since; other values
+        changed since the last snapshot are encoded here. Values not decoded yet are passed
+        through as-is, to be written back unchanged.
+        """
+        snapshot = dict(self._encoded)
+        for key, value in self._data.items():
+            frozen = self._frozen.get(key)
+            if isinstance(value, (list, WarRecordColumns)):
+                if frozen is None or frozen.count > len(value):
+                    if isinstance(value, WarRecordColumns):
+                        frozen = BinarySnapshot.Pending(BinarySnapshot.COLUMNS, None, value.to_state(), len(value))
+                    else:
+                        frozen = BinarySnapshot.Pending(BinarySnapshot.PLAIN, None, list(value), len(value))
+                elif frozen.count < len(value):
+                    frozen = BinarySnapshot.Pending(frozen.kind, frozen, value[frozen.count:], len(value))
+                self._frozen[key] = frozen
+            elif frozen is None:
+                frozen = self._frozen[key] = BinarySnapshot.encode(value)
+            snapshot[key] = frozen
+        snapshot[self.JOURNAL_SEQ_KEY] = BinarySnapshot.encode(self._seq)
+        return snapshot
+
+    def _write_snapshot(self, data: Dict[str, Union[BinarySnapshot.Entry, BinarySnapshot.Pending]]) -> int:
+        """
+        Atomically replaces the data file with a _snapshot(), so a crash mid-save never leaves
+        it truncated. Returns bytes written.
+        """
+        binary = self.snapshot_format == "binary"
+        path = self.snapshot_path if binary else self.filepath
+        tmp_path = f"{path}.tmp"
+        if not binary:
+            data = {key: BinarySnapshot.decode(BinarySnapshot.encode(entry)) for key, entry in data.items()}
+        with open(tmp_path, 'wb') if binary else open(tmp_path, 'w', encoding='utf-8') as f:
+            if binary:
+                BinarySnapshot.dump(data, f)
+            else:
+                json.dump(data, f, indent=4, default=json_default)
+            f.flush()
+            os.fsync(f.fileno())
+            written = os.fstat(f.fileno()).st_size
+            mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+        os.replace(tmp_path, path)
+        self._file_mtime_ns = mtime_ns
+        return written
+
+    def _append_journal(self, lines: List[str]) -> int:
+        """Appends serialized entries to the journal with a single fsync. Returns bytes written."""
+        payload = "".join(f"{line}\n" for line in lines).encode('utf-8')
+        with open(self.journal_path, 'ab') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        return len(payload)
+
+    async def _flush_journal(self) -> int:
+        """Writes all pending journal entries from a worker thread. Must hold the lock. Returns bytes written."""
+        if not self._pending:
+            return 0
+        lines, self._pending = self._pending, []
+        try:
+            written = await asyncio.get_running_loop().run_in_executor(None, self._append_journal, lines)
+        except Exception:
+            # Keep the entries so the next save retries them; replay skips duplicate sequence numbers.
+            self._pending[:0] = lines
+            raise
+        self._journal_entries += len(lines)
+        return written
+
+    def _write_compacted(self, data: Dict[str, Union[BinarySnapshot.Entry, BinarySnapshot.Pending]]):
+        """Writes a snapshot covering every journal entry so far, then empties the journal."""
+        self._write_snapshot(data)
+        with open(self.journal_path, 'w', encoding='utf-8'):
+            pass
 
     async def save(self):
-        """Asynchronously saves the current in-memory data to the JSON file."""
+        """
+        Asynchronously saves the current in-memory data to the JSON file (or journal).
+        In write-behind mode this only marks the data dirty; saves made within the
+        same window are coalesced into a single background write.
+        """
+        if self.write_behind is not None:
+            self._dirty = True
+            if self._writer_task is None or self._writer_task.done():
+                self._writer_task = asyncio.get_running_loop().create_task(self._write_behind())
+            return
+        await self._persist()
+
+    async def _write_behind(self):
+        """
+        Background writer: waits out the coalescing window, then persists until clean. A
+        failed write is retried after another window (at least WRITE_RETRY_SECONDS), or left
+        for the next save once a flush has been requested, so flush() never spins on a
+        failing disk.
+        """
+        window = self.write_behind
+        while self._dirty:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=window)
+            except asyncio.TimeoutError:
+                pass
+            if await self._persist():
+                window = self.write_behind
+            elif self._flush_requested.is_set():
+                break
+            else:
+                window = max(self.write_behind, self.WRITE_RETRY_SECONDS)
+
+    async def _persist(self) -> bool:
+        """Writes the data to disk from a worker thread so the event loop is never blocked. Returns whether it succeeded."""
+        file_label = os.path.basename(self.filepath)
+        wait_start = time.perf_counter()
         async with self._lock:
+            metrics.observe("datamanager_lock_wait_seconds", time.perf_counter() - wait_start, file=file_label)
+            # Cleared before the write, so changes made while it runs mark the data dirty again.
+            self._dirty = False
             try:
-                with open(self.filepath, 'w', encoding='utf-8') as f:
-                    json.dump(self._data, f, indent=4)
+                with metrics.time("datamanager_save_seconds", file=file_label):
+                    if self.journaled:
+                        written = await self._flush_journal()
+                    else:
+                        written = await asyncio.get_running_loop().run_in_executor(None, self._write_snapshot, self._snapshot())
+                metrics.inc("datamanager_bytes_written_total", written, file=file_label)
                 logger.info(f"Data successfully saved to {self.filepath}")
             except Exception as e:
+                self._dirty = True  # Retried by the next save or flush.
+                metrics.inc("datamanager_save_errors_total", file=file_label)
                 logger.error(f"Failed to save data to {self.filepath}: {e}", exc_info=True)
+                return False
+
+        if self.journaled and self._journal_entries >= self.compact_threshold:
+            if self._compaction_task is None or self._compaction_task.done():
+                self._compaction_task = asyncio.get_running_loop().create_task(self.compact())
+        return True
+
+    async def flush(self):
+        """Persists any outstanding changes immediately. Awaited on shutdown so nothing is lost."""
+        if self._writer_task is not None and not self._writer_task.done():
+            self._flush_requested.set()
+            await self._writer_task
+            self._flush_requested.clear()
+        elif self._dirty or self._pending:
+            await self._persist()
+        if self._compaction_task is not None and not self._compaction_task.done():
+            await self._compaction_task
+
+    async def compact(self):
+        """Folds the journal into a fresh snapshot, writing it off the event loop."""
+        async with self._lock:
+            try:
+                await self._flush_journal()
+                snapshot, seq = self._snapshot(), self._seq
+                await asyncio.get_running_loop().run_in_executor(None, self._write_compacted, snapshot)
+                self._journal_entries = 0
+                logger.info(f"Journal compacted into {self.filepath} (seq {seq})")
+            except Exception as e:
+                logger.error(f"Failed to compact journal for {self.filepath}: {e}", exc_info=True)
 
     def get(self, key: str, default=None):
         """Gets a value from the data dictionary."""
+        if key in self._encoded:
+            self._decode(key)
         return self._data.get(key, default)
 
     def set(self, key: str, value):
         """Sets a value in the data dictionary. Requires a call to save() to persist."""
-        self._data[key] = value
+        self._encoded.pop(key, None)
+        self._frozen.pop(key, None)
+        self._data[key] = self._coerce(value)
+        self._record("set", key, value)
+
+    def append(self, key: str, item):
+        """Appends an item to the list stored under `key`. Requires a call to save() to persist."""
+        self._list(key).append(item)
+        self._record("append", key, item)
+
+    def delete(self, key: str):
+        """Removes a key from the data dictionary. Requires a call to save() to persist."""
+        self._frozen.pop(key, None)
+        if self._data.pop(key, None) is not None or self._encoded.pop(key, None) is not None:
+            self._record("delete", key, None)
 
+    def keys(self) -> List[str]:
+        """Returns every key, without decoding values from a lazy load."""
+        return [*self._data, *self._encoded]
 
-class BackupBot(discord.Client):
+    def items(self):
+        """Iterates over (key, value) pairs in the data dictionary."""
+        for key in list(self._encoded):
+            self._decode(key)
+        return self._data.items()
+
+
+class WarRecordColumns:
     """
-    A Discord bot for requesting backup in-game.
+    Compact, append-only storage for one guild's war records. Each field lives in its own
+    column: ids and epoch-microsecond timestamps in typed arrays, status and region as
+    small codes into per-guild tables, and names as interned strings. Indexing and
+    iteration return the usual record dicts, so it can stand in for a list of records.
+    Records that wouldn't survive the round trip unchanged (unexpected keys, non-UTC
+    timestamps) are kept as plain dicts instead. Those are only meant for the odd legacy
+    record: callers that iterate records (analytics, rollups, verify_war_stats) get a copy
+    of each raw dict, which is far slower than the column fast paths.
     """
-    def __init__(self, *, intents: discord.Intents, guild_id: int):
-        super().__init__(intents=intents)
-        self.tree = discord.app_commands.CommandTree(self)
-        
-        self.configs: DataManager = DataManager("config.json")
-        self.war_data: DataManager = DataManager("war_data.json")
+    FIELDS = (
+        "war_id", "initiator_id", "initiator_roblox_user", "opponents", "num_opponents", "region",
+        "start_time_utc", "end_time_utc", "duration_seconds", "status", "concluded_by_id"
+    )
+    MISSING = -1  # Stored for ids that are None, e.g. concluded_by_id on expired requests.
+    EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+    MICROSECOND = datetime.timedelta(microseconds=1)
+    _field_set = frozenset(FIELDS)
 
-        self.dev_guild = discord.Object(id=guild_id)
+    def __init__(self, records: Iterable[dict] = ()):
+        self.war_ids = array('q')
+        self.initiator_ids = array('q')
+        self.concluded_by_ids = array('q')
+        self.num_opponents = array('i')
+        self.start_times = array('q')
+        self.end_times = array('q')
+        self.durations = array('d')
+        self.status_codes = array('B')
+        self.region_codes = array('H')
+        self.roblox_users: List[str] = []
+        self.opponents: List[str] = []
+        self.statuses: List[str] = []
+        self.regions: List[str] = []
+        self._codes: Dict[str, int] = {}  # Status and region code lookups, prefixed to keep them apart.
+        self._raw: Dict[int, dict] = {}  # Index -> records kept as-is.
+        for record in records:
+            self.append(record)
 
-    async def setup_hook(self) -> None:
-        # Forcing a clear and resync
-        self.tree.clear_commands(guild=self.dev_guild)
-        await self.tree.sync(guild=self.dev_guild) # Clears the commands
+    @classmethod
+    def _encode_time(cls, value: str) -> int:
+        """Converts an ISO-8601 UTC timestamp to epoch microseconds; raises ValueError if it wouldn't round-trip."""
+        micros = (datetime.datetime.fromisoformat(value) - cls.EPOCH) // cls.MICROSECOND
+        if cls._decode_time(micros) != value:
+            raise ValueError(value)
+        return micros
 
-        # Now register the new ones
-        self.add_view(self.BackupControlsView(bot=self))
-        self.tree.copy_global_to(guild=self.dev_guild)
-        await self.tree.sync(guild=self.dev_guild)
-        logger.info(f"Commands forcibly cleared and resynced for guild: {self.dev_guild.id}")
+    @classmethod
+    def _decode_time(cls, micros: int) -> str:
+        return (cls.EPOCH + datetime.timedelta(microseconds=micros)).isoformat()
 
-    async def on_app_command_error(self, interaction: discord.Interaction, error: discord.app_commands.AppCommandError):
-        """Handles errors from all slash commands globally."""
-        user = interaction.user
-        # "id" is not a known attribute of "None" by checking for guild existence first.
-        guild_name = interaction.guild.name if interaction.guild else "Direct Message"
-        guild_id = interaction.guild.id if interaction.guild else "N/A"
-        command = interaction.command.name if interaction.command else "unknown_command"
+    def _code(self, kind: str, table: List[str], value: str) -> int:
+        code = self._codes.get(f"{kind}:{value}")
+        if code is None:
+            code = self._codes[f"{kind}:{value}"] = len(table)
+            table.append(value)
+        return code
 
-        if isinstance(error, discord.app_commands.CommandOnCooldown):
-            retry_after = int(error.retry_after)
-            await interaction.response.send_message(
-                f"⏳ **Woah There, Warrior!**\nThis command is on cooldown. Please try again in **{retry_after}** second{'s' if retry_after > 1 else ''}.",
-                ephemeral=True
-            )
-        elif isinstance(error, discord.app_commands.MissingPermissions):
-            logger.warning(f"User {user} ({user.id}) tried to use '/{command}' in guild '{guild_name}' ({guild_id}) without permissions.")
-            await interaction.response.send_message(
-                "❌ **Permission Denied**\nYou do not have the required permissions to run this command.",
-                ephemeral=True
-            )
-        elif isinstance(error, discord.app_commands.CheckFailure):
-            logger.warning(f"Check failed for user {user} ({user.id}) on command '/{command}' in guild '{guild_name}' ({guild_id}).")
-            await interaction.response.send_message(
-                "🚫 **Action Not Allowed**\nYou cannot perform this action.",
-                ephemeral=True
+    def _id(self, value: Optional[int]) -> int:
+        if value is None:
+            return self.MISSING
+        if type(value) is not int or value < 0:
+            raise TypeError(value)
+        return value
+
+    def append(self, record: dict):
+        try:
+            if record.keys() != self._field_set or type(record["num_opponents"]) is not int:
+                raise TypeError(record)
+            row = (
+                self._id(record["war_id"]), self._id(record["initiator_id"]), self._id(record["concluded_by_id"]),
+                record["num_opponents"], self._encode_time(record["start_time_utc"]), self._encode_time(record["end_time_utc"]),
+                float(record["duration_seconds"]),
+                self._code("status", self.statuses, record["status"]), self._code("region", self.regions, record["region"]),
+                sys.intern(record["initiator_roblox_user"]), sys.intern(record["opponents"]),
             )
+        except (TypeError, ValueError, OverflowError):
+            self._raw[len(self)] = dict(record)
+            row = (self.MISSING, self.MISSING, self.MISSING, 0, 0, 0, 0.0, 0, 0, "", "")
+        for column, value in zip(self._columns(), row):
+            column.append(value)
+
+    def _columns(self) -> tuple:
+        return (
+            self.war_ids, self.initiator_ids, self.concluded_by_ids, self.num_opponents, self.start_times,
+            self.end_times, self.durations, self.status_codes, self.region_codes, self.roblox_users, self.opponents
+        )
+
+    def record(self, index: int) -> dict:
+        """Returns the record at `index` as a new dict."""
+        raw = self._raw.get(index)
+        if raw is not None:
+            return dict(raw)
+        war_id, initiator_id, concluded_by_id = self.war_ids[index], self.initiator_ids[index], self.concluded_by_ids[index]
+        return {
+            "war_id": None if war_id == self.MISSING else war_id,
+            "initiator_id": None if initiator_id == self.MISSING else initiator_id,
+            "initiator_roblox_user": self.roblox_users[index],
+            "opponents": self.opponents[index],
+            "num_opponents": self.num_opponents[index],
+            "region": self.regions[self.region_codes[index]],
+            "start_time_utc": self._decode_time(self.start_times[index]),
+            "end_time_utc": self._decode_time(self.end_times[index]),
+            "duration_seconds": self.durations[index],
+            "status": self.statuses[self.status_codes[index]],
+            "concluded_by_id": None if concluded_by_id == self.MISSING else concluded_by_id,
+        }
+
+    def __len__(self) -> int:
+        return len(self.war_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.record(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("war record index out of range")
+        return self.record(index)
+
+    def __iter__(self) -> Iterator[dict]:
+        for index in range(len(self)):
+            yield self.record(index)
+
+    def summary(self) -> dict:
+        """Same result as WarHistoryQueries.war_summary, computed from the columns without decoding records."""
+        status_keys = {"Win": "wins", "Loss": "losses", "Truce": "truces", "Expired": "expired"}
+        summary = {"total": len(self), "wins": 0, "losses": 0, "truces": 0, "expired": 0, "total_duration": 0.0}
+        counts = [0] * len(self.statuses)
+        if self._raw:  # Raw rows hold a placeholder code that may not index the status table; skip them.
+            codes = (code for index, code in enumerate(self.status_codes) if index not in self._raw)
         else:
-            # For any other errors, log the full traceback and inform the user.
-            logger.error(f"Unhandled error in command '/{command}' triggered by {user} ({user.id}) in guild '{guild_name}' ({guild_id}):", exc_info=error)
-            
-            # Use followup if the interaction has already been responded to.
-            response_method = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
-            await response_method(
-                "🐛 **An Unexpected Error Occurred**\nI've encountered a problem while processing your command. My developer has been notified.",
-                ephemeral=True
+            codes = self.status_codes
+        for code in codes:
+            counts[code] += 1
+        for status, count in zip(self.statuses, counts):
+            if status in status_keys:
+                summary[status_keys[status]] += count
+        summary["total_duration"] = math.fsum(self.durations)
+        for raw in self._raw.values():
+            if raw.get('status') in status_keys:
+                summary[status_keys[raw['status']]] += 1
+            summary["total_duration"] += raw.get('duration_seconds', 0)
+        return summary
+
+    def latest(self, limit: int) -> List[dict]:
+        """Returns the `limit` most recently ended records, newest first."""
+        def end_time(index: int) -> int:
+            raw = self._raw.get(index)
+            if raw is None:
+                return self.end_times[index]
+            ended = datetime.datetime.fromisoformat(raw['end_time_utc'])
+            if ended.tzinfo is None:
+                ended = ended.replace(tzinfo=datetime.timezone.utc)
+            return (ended - self.EPOCH) // self.MICROSECOND
+        return [self.record(i) for i in heapq.nlargest(limit, range(len(self)), key=end_time)]
+
+    def war_id_set(self) -> set:
+        """Returns the set of recorded war ids, read straight from the id column."""
+        war_ids = set(self.war_ids)
+        war_ids.discard(self.MISSING)
+        war_ids.update(raw.get('war_id') for raw in self._raw.values())
+        war_ids.discard(None)
+        return war_ids
+
+    def copy(self) -> 'WarRecordColumns':
+        """Returns an independent copy, e.g. for a snapshot written from a worker thread."""
+        clone = WarRecordColumns()
+        for name, value in vars(self).items():
+            setattr(clone, name, value[:] if isinstance(value, (array, list)) else dict(value))
+        return clone
+
+    def as_json_list(self) -> list:
+        """Returns a list stand-in that json.dump streams record by record instead of materializing."""
+        return _StreamedList(len(self), self.__iter__)
+
+    def to_state(self) -> dict:
+        """
+        Returns copies of the columns as raw buffers and plain lists, as stored by
+        BinarySnapshot. Later appends don't change it, so a writer thread can encode it.
+        """
+        return {
+            "byteorder": sys.byteorder,
+            "arrays": {name: (value.typecode, value.tobytes()) for name, value in vars(self).items() if isinstance(value, array)},
+            "tables": {name: list(getattr(self, name)) for name in ("roblox_users", "opponents", "statuses", "regions")},
+            "raw": dict(self._raw),
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'WarRecordColumns':
+        """Rebuilds columns from to_state() output without decoding any records."""
+        columns = cls()
+        for name, (typecode, data) in state["arrays"].items():
+            column = array(typecode)
+            column.frombytes(data)
+            if state["byteorder"] != sys.byteorder:
+                column.byteswap()
+            setattr(columns, name, column)
+        for name, values in state["tables"].items():
+            setattr(columns, name, values)
+        columns._raw = state["raw"]
+        columns._codes = {f"status:{status}": code for code, status in enumerate(columns.statuses)}
+        columns._codes.update((f"region:{region}", code) for code, region in enumerate(columns.regions))
+        return columns
+
+
+class _StreamedList(list):
+    """
+    An empty list subclass reporting `length` items and iterating `iterate()`. json.dump's
+    (pure-Python) encoder only uses len() and iteration, so it writes the items lazily.
+    """
+    def __init__(self, length: int, iterate: Callable[[], Iterator]):
+        super().__init__()
+        self._length = length
+        self._iterate = iterate
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator:
+        return self._iterate()
+
+
+def json_default(value):
+    """json.dump hook that writes WarRecordColumns as a plain list of records."""
+    if isinstance(value, WarRecordColumns):
+        return value.as_json_list()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class WarHistoryQueries:
+    """
+    The war query helpers shared with SQLiteWarStore, for stores that keep one list of
+    records per guild behind get/set.
+    """
+    def war_count(self, guild_id: str) -> int:
+        """Returns the number of recorded wars for a guild."""
+        return len(self.get(guild_id) or [])
+
+    def war_summary(self, guild_id: str) -> dict:
+        """Returns total/win/loss/truce/expired counts and the summed duration for a guild."""
+        guild_wars = self.get(guild_id) or []
+        if isinstance(guild_wars, WarRecordColumns):
+            return guild_wars.summary()
+        return {
+            "total": len(guild_wars),
+            "wins": sum(1 for w in guild_wars if w['status'] == 'Win'),
+            "losses": sum(1 for w in guild_wars if w['status'] == 'Loss'),
+            "truces": sum(1 for w in guild_wars if w['status'] == 'Truce'),
+            "expired": sum(1 for w in guild_wars if w['status'] == 'Expired'),
+            "total_duration": sum(w.get('duration_seconds', 0) for w in guild_wars),
+        }
+
+    def concluded_war_ids(self, guild_id: str) -> set:
+        """Returns the ids of every recorded war for a guild."""
+        guild_wars = self.get(guild_id) or []
+        if isinstance(guild_wars, WarRecordColumns):
+            return guild_wars.war_id_set()
+        return {w['war_id'] for w in guild_wars if w.get('war_id') is not None}
+
+    def recent_wars(self, guild_id: str, limit: int = 5) -> List[dict]:
+        """Returns the most recently concluded wars, newest first."""
+        guild_wars = self.get(guild_id) or []
+        if isinstance(guild_wars, WarRecordColumns):
+            return guild_wars.latest(limit)
+        return sorted(guild_wars, key=lambda w: w['end_time_utc'], reverse=True)[:limit]
+
+    def iter_wars(self, guild_id: str) -> Iterator[dict]:
+        """
+        Yields a guild's war records oldest first, without copying the history. The list is
+        looked up now, so the iterator can be consumed from a worker thread; records appended
+        meanwhile are left out.
+        """
+        guild_wars = self.get(guild_id) or []
+        return (guild_wars[index] for index in range(len(guild_wars)))
+
+    def clear_wars(self, guild_id: str) -> int:
+        """Deletes a guild's war history and returns how many records were removed."""
+        war_count = self.war_count(guild_id)
+        if war_count:
+            self.set(guild_id, [])
+        return war_count
+
+    def remove_wars(self, guild_id: str, records: List[dict]) -> int:
+        """Deletes the given records (matched by war id and end time) and returns how many were removed."""
+        keys = {(record.get('war_id'), record['end_time_utc']) for record in records}
+        guild_wars = self.get(guild_id) or []
+        kept = [w for w in guild_wars if (w.get('war_id'), w['end_time_utc']) not in keys]
+        if len(kept) != len(guild_wars):
+            self.set(guild_id, kept)
+        return len(guild_wars) - len(kept)
+
+
+class JSONWarStore(WarHistoryQueries, DataManager):
+    """War history kept in war_data.json as one list of records per guild."""
+    def guild_ids(self) -> List[str]:
+        """Returns the ids of all guilds with stored war history."""
+        return self.keys()
+
+
+class SQLiteWarStore:
+    """
+    War history kept in a local SQLite database (WAL mode) instead of war_data.json.
+    Implements the same get/set/append/save interface as the JSON store, but answers
+    the stats queries with index lookups and never holds the full history in memory.
+
+    Appends are queued and committed by save() from a worker thread over a connection of
+    their own, so the event loop never waits for the write lock (which other shard
+    processes may hold). Reads include the queued records. The rare writes made on the
+    calling thread (set, clear_wars, remove_wars) commit the queue first, so writes always
+    land in order.
+    """
+    COLUMNS = (
+        "war_id", "initiator_id", "initiator_roblox_user", "opponents", "num_opponents", "region",
+        "start_time_utc", "end_time_utc", "duration_seconds", "status", "concluded_by_id"
+    )
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS wars (
+            guild_id TEXT NOT NULL,
+            war_id INTEGER,
+            initiator_id INTEGER,
+            initiator_roblox_user TEXT,
+            opponents TEXT,
+            num_opponents INTEGER,
+            region TEXT,
+            start_time_utc TEXT,
+            end_time_utc TEXT,
+            duration_seconds REAL,
+            status TEXT,
+            concluded_by_id INTEGER,
+            extra TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_wars_guild_end ON wars (guild_id, end_time_utc);
+        CREATE INDEX IF NOT EXISTS idx_wars_guild_status ON wars (guild_id, status);
+        CREATE INDEX IF NOT EXISTS idx_wars_guild_region ON wars (guild_id, region);
+        CREATE INDEX IF NOT EXISTS idx_wars_guild_initiator ON wars (guild_id, initiator_id);
+    """
+    LOOP_BUSY_TIMEOUT = 0.5  # Seconds a write on the event loop's connection waits for another writer.
+
+    def __init__(self, filename: str):
+        self.filepath = os.path.join(BASE_DIR, filename)
+        # Autocommit mode; multi-statement writes open their own transaction.
+        self._conn = sqlite3.connect(self.filepath, isolation_level=None, timeout=self.LOOP_BUSY_TIMEOUT)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        # Used by save()'s worker threads, one at a time, so it keeps the default busy timeout.
+        self._writer = sqlite3.connect(self.filepath, isolation_level=None, check_same_thread=False)
+        self._writer.execute("PRAGMA synchronous=NORMAL")
+        self._queued: List[Tuple[str, dict]] = []  # Appended but not committed yet, oldest first.
+        self._commit_lock = threading.Lock()  # Held for a whole commit of the queue.
+        # Held while committed records leave the queue, so reads see them exactly once.
+        self._queue_lock = threading.Lock()
+        logger.info(f"War database opened at {self.filepath}")
+
+    def _to_row(self, guild_id: str, record: dict) -> tuple:
+        extra = {k: v for k, v in record.items() if k not in self.COLUMNS}
+        return (guild_id, *(record.get(col) for col in self.COLUMNS), json.dumps(extra) if extra else None)
+
+    def _to_record(self, row: sqlite3.Row) -> dict:
+        record = {col: row[col] for col in self.COLUMNS}
+        if row["extra"]:
+            record.update(json.loads(row["extra"]))
+        return record
+
+    def _insert_rows(self, conn: sqlite3.Connection, rows: Iterable[tuple]):
+        placeholders = ", ".join("?" * (len(self.COLUMNS) + 2))
+        conn.executemany(f"INSERT INTO wars (guild_id, {', '.join(self.COLUMNS)}, extra) VALUES ({placeholders})", rows)
+
+    def _insert_many(self, conn: sqlite3.Connection, guild_id: str, records: Iterable[dict]):
+        self._insert_rows(conn, (self._to_row(guild_id, record) for record in records))
+
+    def _queued_records(self, guild_id: str) -> List[dict]:
+        return [record for queued_guild_id, record in self._queued if queued_guild_id == guild_id]
+
+    def _commit_queued(self, conn: sqlite3.Connection):
+        """Commits the queued records over `conn`. Must hold _commit_lock."""
+        queued = self._queued[:]
+        if not queued:
+            return
+        conn.execute("BEGIN IMMEDIATE")  # Waits for the write lock here, not at COMMIT.
+        try:
+            self._insert_rows(conn, (self._to_row(guild_id, record) for guild_id, record in queued))
+            with self._queue_lock:
+                conn.execute("COMMIT")
+                del self._queued[:len(queued)]  # Only appended to meanwhile.
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def _commit_in_worker(self):
+        with self._commit_lock:
+            self._commit_queued(self._writer)
+
+    @contextlib.contextmanager
+    def _writing(self):
+        """For writes on the calling thread: waits out a commit in progress and commits the queue first."""
+        with self._commit_lock:
+            self._commit_queued(self._conn)
+            yield
+
+    def get(self, guild_id: str, default=None):
+        """Returns a guild's full war history as a list of records (oldest first). Prefer iter_wars() for scans."""
+        return list(self.iter_wars(guild_id)) or default
+
+    def set(self, guild_id: str, records: List[dict]):
+        """Replaces a guild's war history."""
+        with self._writing(), self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM wars WHERE guild_id = ?", (guild_id,))
+            self._insert_many(self._conn, guild_id, records)
+
+    def append(self, guild_id: str, record: dict):
+        """Queues a single war record; save() commits it."""
+        self._queued.append((guild_id, dict(record)))
+
+    async def save(self):
+        """
+        Commits the queued records from a worker thread. A failed commit (e.g. the database
+        stayed locked) keeps them queued for the next save or flush.
+        """
+        if not self._queued:
+            return
+        try:
+            with metrics.time("datamanager_save_seconds", file=os.path.basename(self.filepath)):
+                await asyncio.to_thread(self._commit_in_worker)
+        except sqlite3.Error as e:
+            metrics.inc("datamanager_save_errors_total", file=os.path.basename(self.filepath))
+            logger.error(f"Failed to save war records to {self.filepath}: {e}", exc_info=True)
+
+    async def flush(self):
+        """Commits any queued records; awaited on shutdown so nothing is lost."""
+        await self.save()
+
+    def war_count(self, guild_id: str) -> int:
+        """Returns the number of recorded wars for a guild."""
+        with self._queue_lock:
+            stored = self._conn.execute("SELECT COUNT(*) FROM wars WHERE guild_id = ?", (guild_id,)).fetchone()[0]
+            return stored + len(self._queued_records(guild_id))
+
+    def war_summary(self, guild_id: str) -> dict:
+        """Returns total/win/loss/truce/expired counts and the summed duration for a guild."""
+        summary = {"total": 0, "wins": 0, "losses": 0, "truces": 0, "expired": 0, "total_duration": 0.0}
+        status_keys = {"Win": "wins", "Loss": "losses", "Truce": "truces", "Expired": "expired"}
+        with self._queue_lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*), TOTAL(duration_seconds) FROM wars WHERE guild_id = ? GROUP BY status",
+                (guild_id,)
+            ).fetchall()
+            rows += [(record["status"], 1, record["duration_seconds"] or 0.0) for record in self._queued_records(guild_id)]
+        for status, count, duration in rows:
+            summary["total"] += count
+            summary["total_duration"] += duration
+            if status in status_keys:
+                summary[status_keys[status]] += count
+        return summary
+
+    def guild_ids(self) -> List[str]:
+        """Returns the ids of all guilds with stored war history."""
+        with self._queue_lock:
+            guild_ids = [row[0] for row in self._conn.execute("SELECT DISTINCT guild_id FROM wars")]
+            return guild_ids + [guild_id for guild_id in dict.fromkeys(guild_id for guild_id, _ in self._queued) if guild_id not in guild_ids]
+
+    def concluded_war_ids(self, guild_id: str) -> set:
+        """Returns the ids of every recorded war for a guild."""
+        with self._queue_lock:
+            rows = self._conn.execute("SELECT war_id FROM wars WHERE guild_id = ? AND war_id IS NOT NULL", (guild_id,))
+            war_ids = {row[0] for row in rows}
+            war_ids.update(record["war_id"] for record in self._queued_records(guild_id) if record.get("war_id") is not None)
+        return war_ids
+
+    def recent_wars(self, guild_id: str, limit: int = 5) -> List[dict]:
+        """Returns the most recently concluded wars, newest first."""
+        with self._queue_lock:
+            rows = self._conn.execute(
+                "SELECT * FROM wars WHERE guild_id = ? ORDER BY end_time_utc DESC LIMIT ?", (guild_id, limit)
+            ).fetchall()
+            queued = self._queued_records(guild_id)
+        records = [*reversed(queued), *(self._to_record(row) for row in rows)]
+        return sorted(records, key=lambda record: record["end_time_utc"], reverse=True)[:limit]
+
+    def iter_wars(self, guild_id: str) -> Iterator[dict]:
+        """
+        Yields a guild's war records oldest first, queued ones included, fetching rows in
+        batches. The query starts now, so records saved or appended meanwhile are left out;
+        it uses its own read connection so it can be consumed from a worker thread.
+        """
+        conn = sqlite3.connect(self.filepath, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            with self._queue_lock:
+                # Executing steps to the first row, which fixes the snapshot the cursor reads.
+                cursor = conn.execute("SELECT * FROM wars WHERE guild_id = ? ORDER BY rowid", (guild_id,))
+                queued = self._queued_records(guild_id)
+        except BaseException:
+            conn.close()
+            raise
+        return self._stream(conn, cursor, queued)
+
+    def _stream(self, conn: sqlite3.Connection, cursor: sqlite3.Cursor, queued: List[dict]) -> Iterator[dict]:
+        try:
+            while rows := cursor.fetchmany(500):
+                for row in rows:
+                    yield self._to_record(row)
+            yield from queued
+        finally:
+            conn.close()
+
+    def clear_wars(self, guild_id: str) -> int:
+        """Deletes a guild's war history and returns how many records were removed."""
+        with self._writing():
+            return self._conn.execute("DELETE FROM wars WHERE guild_id = ?", (guild_id,)).rowcount
+
+    def remove_wars(self, guild_id: str, records: List[dict]) -> int:
+        """Deletes the given records (matched by war id and end time) and returns how many were removed."""
+        with self._writing(), self._conn:
+            self._conn.execute("BEGIN")
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "DELETE FROM wars WHERE guild_id = ? AND end_time_utc = ? AND war_id IS ?",
+                ((guild_id, record['end_time_utc'], record.get('war_id')) for record in records)
+            )
+            return self._conn.total_changes - before
+
+    def migrate_from_json(self, json_filename: str) -> int:
+        """
+        One-shot import of an existing war_data.json, with its journal replayed (or of its
+        binary snapshot). Only runs while the database is empty; the imported files are
+        renamed to *.migrated afterwards so they're never imported twice.
+        """
+        json_path = os.path.join(BASE_DIR, json_filename)
+        if not DataManager.has_files(json_path):
+            return 0
+        if self._conn.execute("SELECT 1 FROM wars LIMIT 1").fetchone():
+            logger.warning(f"Skipping migration of {json_path}: the war database already contains records.")
+            return 0
+
+        legacy = JSONWarStore.open_existing(json_filename)
+        migrated = 0
+        with self._conn:
+            self._conn.execute("BEGIN")
+            for guild_id, records in legacy.items():
+                self._insert_many(self._conn, guild_id, records)
+                migrated += len(records)
+        for path in (legacy.filepath, legacy.journal_path, legacy.snapshot_path):
+            if os.path.exists(path):
+                os.replace(path, f"{path}.migrated")
+        logger.info(f"Migrated {migrated} war records from {json_path} into {self.filepath}")
+        return migrated
+
+    def close(self):
+        """Closes the database connections. Records still queued are lost; flush() first."""
+        self._conn.close()
+        self._writer.close()
+
+
+def shard_id_for(guild_id: Union[int, str], shard_count: int) -> int:
+    """Returns the shard that Discord routes a guild to."""
+    return (int(guild_id) >> 22) % shard_count
+
+
+def shard_filename(filename: str, shard_id: int, shard_count: int) -> str:
+    """Returns the file holding one shard's guilds, e.g. config.shard-3-of-4.json."""
+    base, ext = os.path.splitext(filename)
+    return f"{base}.shard-{shard_id}-of-{shard_count}{ext}"
+
+
+class ShardedDataManager:
+    """
+    Splits per-guild data across one file per shard (e.g. config.shard-3-of-4.json) and only
+    loads the shards this process runs, so several processes can serve different shards
+    without overwriting each other. Keys must start with the guild id ("<guild_id>" or
+    "<guild_id>:<suffix>"). Offers the same interface as the wrapped manager class.
+
+    Which shard a guild belongs to depends on the shard count, so the count is part of the
+    file names. A shard file is (re)built from the unpartitioned file and the files of other
+    shard counts when it's missing or when one of those was written more recently, e.g.
+    after SHARD_COUNT changed; newer files win for guilds that appear in several.
+    """
+    def __init__(
+        self, filename: str, *, shard_count: int, shard_ids: Optional[List[int]] = None,
+        manager_cls: type = DataManager, **options
+    ):
+        self.shard_count = shard_count
+        self.shard_ids = list(shard_ids) if shard_ids is not None else list(range(shard_count))
+        self._shards: Dict[int, DataManager] = {}
+        sources = self._seed_sources(filename)
+        newest_source = max((mtime for mtime, _ in sources), default=None)
+        loaded: Dict[str, DataManager] = {}  # Each source is loaded once, for the first shard that needs it.
+        for shard_id in self.shard_ids:
+            shard_file = shard_filename(filename, shard_id, shard_count)
+            modified = self._modified_at(os.path.join(BASE_DIR, shard_file))
+            if newest_source is not None and (modified is None or modified < newest_source):
+                # An outdated shard file still holds guilds the newer files may lack.
+                seeds = sorted(sources + [(modified, shard_file)]) if modified is not None else sources
+                for _, source in seeds:
+                    if source not in loaded:
+                        loaded[source] = DataManager.open_existing(source)
+                self._seed(shard_file, shard_id, [loaded[source] for _, source in seeds])
+            self._shards[shard_id] = manager_cls(shard_file, **options)
+        self._dirty: set = set()
+
+    @staticmethod
+    def _modified_at(filepath: str) -> Optional[float]:
+        """Returns when a data file, its journal or its binary snapshot was last written, or None if none exist."""
+        paths = (filepath, f"{filepath}.journal", BinarySnapshot.path_for(filepath))
+        return max((os.path.getmtime(path) for path in paths if os.path.exists(path)), default=None)
+
+    def _seed_sources(self, filename: str) -> List[Tuple[float, str]]:
+        """
+        Finds the files this data was kept in before: the unpartitioned file and the shard
+        files of other shard counts (including the older, count-less names). Returns their
+        filenames with their last write times, oldest first.
+        """
+        dirname, basename = os.path.split(filename)  # e.g. war_archive/summaries.json
+        directory = os.path.join(BASE_DIR, dirname)
+        base, ext = os.path.splitext(basename)
+        pattern = re.compile(rf"{re.escape(base)}\.shard-\d+(?:-of-(\d+))?{re.escape(ext)}")
+        sources = {filename} if DataManager.has_files(os.path.join(BASE_DIR, filename)) else set()
+        for name in os.listdir(directory) if os.path.isdir(directory) else []:
+            if name.endswith(".journal"):
+                name = name[:-len(".journal")]
+            elif name.endswith(".snap"):
+                name = name[:-len(".snap")] + ext
+            match = pattern.fullmatch(name)
+            if match and match.group(1) != str(self.shard_count):
+                sources.add(os.path.join(dirname, name))
+        return sorted((cast(float, self._modified_at(os.path.join(BASE_DIR, name))), name) for name in sources)
+
+    def _seed(self, shard_file: str, shard_id: int, sources: List[DataManager]):
+        """Writes this shard's guilds, gathered from the given files (oldest first), into its shard file."""
+        shard_path = os.path.join(BASE_DIR, shard_file)
+        owned = {}
+        for source in sources:
+            owned.update((key, value) for key, value in source.items() if self._shard_for(key) == shard_id)
+        # An outdated journal or snapshot would be loaded on top of (or instead of) the new file.
+        for path in (f"{shard_path}.journal", BinarySnapshot.path_for(shard_path)):
+            if os.path.exists(path):
+                os.remove(path)
+        tmp_path = f"{shard_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(owned, f, indent=4, default=json_default)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, shard_path)
+        logger.info(f"Seeded {shard_path} with {len(owned)} entries from {', '.join(source.filepath for source in sources)}")
+
+    def _shard_for(self, key: str) -> int:
+        return shard_id_for(key.split(':', 1)[0], self.shard_count)
+
+    def _manager(self, key: str) -> DataManager:
+        shard_id = self._shard_for(key)
+        manager = self._shards.get(shard_id)
+        if manager is None:
+            raise KeyError(f"Key {key} belongs to shard {shard_id}, which this process does not run.")
+        return manager
+
+    def _mutating(self, key: str) -> DataManager:
+        shard_id = self._shard_for(key)
+        manager = self._manager(key)
+        self._dirty.add(shard_id)
+        return manager
+
+    def get(self, key: str, default=None):
+        return self._manager(key).get(key, default)
+
+    def set(self, key: str, value):
+        self._mutating(key).set(key, value)
+
+    def append(self, key: str, item):
+        self._mutating(key).append(key, item)
+
+    def delete(self, key: str):
+        self._mutating(key).delete(key)
+
+    def items(self):
+        for manager in self._shards.values():
+            yield from manager.items()
+
+    async def save(self):
+        """
+        Saves only the shards changed since the last save. Each stays dirty until its save
+        completes, so reload_changed() never reloads a shard over changes being written.
+        """
+        for shard_id in list(self._dirty):
+            await self._shards[shard_id].save()
+            self._dirty.discard(shard_id)
+
+    async def flush(self):
+        for manager in self._shards.values():
+            await manager.flush()
+
+    def reload_changed(self) -> List[str]:
+        """Reloads the shard files changed on disk by something else; see DataManager.reload_changed()."""
+        return [key for shard_id, manager in self._shards.items() if shard_id not in self._dirty for key in manager.reload_changed()]
+
+
+class ShardedWarStore(ShardedDataManager):
+    """ShardedDataManager over JSONWarStore files, routing the war query helpers by guild."""
+    def __init__(self, filename: str, **options):
+        super().__init__(filename, manager_cls=JSONWarStore, **options)
+
+    def guild_ids(self) -> List[str]:
+        return [guild_id for manager in self._shards.values() for guild_id in cast(JSONWarStore, manager).guild_ids()]
+
+    def war_count(self, guild_id: str) -> int:
+        return cast(JSONWarStore, self._manager(guild_id)).war_count(guild_id)
+
+    def war_summary(self, guild_id: str) -> dict:
+        return cast(JSONWarStore, self._manager(guild_id)).war_summary(guild_id)
+
+    def concluded_war_ids(self, guild_id: str) -> set:
+        return cast(JSONWarStore, self._manager(guild_id)).concluded_war_ids(guild_id)
+
+    def recent_wars(self, guild_id: str, limit: int = 5) -> List[dict]:
+        return cast(JSONWarStore, self._manager(guild_id)).recent_wars(guild_id, limit)
+
+    def iter_wars(self, guild_id: str) -> Iterator[dict]:
+        return cast(JSONWarStore, self._manager(guild_id)).iter_wars(guild_id)
+
+    def clear_wars(self, guild_id: str) -> int:
+        return cast(JSONWarStore, self._mutating(guild_id)).clear_wars(guild_id)
+
+    def remove_wars(self, guild_id: str, records: List[dict]) -> int:
+        return cast(JSONWarStore, self._mutating(guild_id)).remove_wars(guild_id, records)
+
+
+class PartitionedDataManager:
+    """
+    Keeps per-guild data in one file per guild (e.g. war_data/<guild_id>.json). A guild's
+    file is only loaded on first access and stays in an LRU cache of at most `max_guilds`
+    partitions; once the cache is over budget the least recently used partitions are
+    flushed and evicted in the background. Startup time and memory therefore scale with
+    the guilds that are actually active. Keys must start with the guild id, as for
+    ShardedDataManager, and each partition is a DataManager built with `options`.
+    Event handlers should `await load(guild_id)` first: it reads the partition in a worker
+    thread, whereas the synchronous accessors would read it on the event loop.
+    """
+    def __init__(
+        self, dirname: str, *, max_guilds: int = 500, legacy_filename: Optional[str] = None, **options
+    ):
+        self.dirname = dirname
+        self.directory = os.path.join(BASE_DIR, dirname)
+        self.max_guilds = max_guilds
+        self.options = options
+        self._cache: OrderedDict[str, DataManager] = OrderedDict()
+        # Partitions being flushed before eviction; accessing one puts it back in the cache.
+        self._evicting: Dict[str, DataManager] = {}
+        # Partitions being read in a worker thread by load().
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._dirty: set = set()
+        self._eviction_task: Optional[asyncio.Task] = None
+        # Called with a guild id after its partition is evicted, so derived caches can be dropped too.
+        self.eviction_listeners: List[Callable[[str], None]] = []
+        if legacy_filename:
+            self._seed_from_legacy(legacy_filename)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _seed_from_legacy(self, legacy_filename: str):
+        """Splits an unpartitioned file into per-guild files the first time the directory is created."""
+        legacy_path = os.path.join(BASE_DIR, legacy_filename)
+        if os.path.exists(self.directory) or not DataManager.has_files(legacy_path):
+            return
+        legacy = DataManager.open_existing(legacy_filename)
+        partitions: Dict[str, dict] = {}
+        for key, value in legacy.items():
+            partitions.setdefault(self._guild_for(key), {})[key] = value
+        # Build the directory under a temporary name so an interrupted split is simply redone.
+        tmp_directory = f"{self.directory}.tmp"
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+        for guild_id, data in partitions.items():
+            with open(os.path.join(tmp_directory, f"{guild_id}.json"), 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=4)
+        os.replace(tmp_directory, self.directory)
+        logger.info(f"Split {legacy_path} into {len(partitions)} guild files in {self.directory}")
+
+    @staticmethod
+    def _guild_for(key: str) -> str:
+        return key.split(':', 1)[0]
+
+    def _filename(self, guild_id: str) -> str:
+        return os.path.join(self.dirname, f"{guild_id}.json")
+
+    def _exists(self, guild_id: str) -> bool:
+        return DataManager.has_files(os.path.join(BASE_DIR, self._filename(guild_id)))
+
+    def _manager(self, key: str, create: bool = False) -> Optional[DataManager]:
+        """
+        Returns the partition holding `key`, loading it on a cache miss. Guilds without a
+        file yet return None unless `create` is set.
+        """
+        guild_id = self._guild_for(key)
+        manager = self._cache.get(guild_id)
+        if manager is not None:
+            self._cache.move_to_end(guild_id)
+            return manager
+
+        manager = self._evicting.pop(guild_id, None)
+        if manager is None:
+            if not create and not self._exists(guild_id):
+                return None
+            manager = DataManager(self._filename(guild_id), **self.options)
+            metrics.inc("partition_loads_total", file=self.dirname)
+        self._cache_partition(guild_id, manager)
+        return manager
+
+    def _cache_partition(self, guild_id: str, manager: DataManager):
+        self._cache[guild_id] = manager
+        metrics.set_gauge("partition_cached_guilds", len(self._cache), file=self.dirname)
+        if len(self._cache) > self.max_guilds:
+            self._schedule_eviction()
+
+    async def load(self, key: str):
+        """Reads the partition holding `key` in a worker thread, unless it's already in memory or has no file."""
+        guild_id = self._guild_for(key)
+        if guild_id in self._cache:
+            self._cache.move_to_end(guild_id)
+            return
+        if guild_id in self._evicting:
+            self._cache_partition(guild_id, self._evicting.pop(guild_id))
+            return
+        task = self._loading.get(guild_id)
+        if task is None:
+            task = self._loading[guild_id] = asyncio.get_running_loop().create_task(self._load_partition(guild_id))
+        await task
+
+    async def _load_partition(self, guild_id: str):
+        try:
+            if not await asyncio.to_thread(self._exists, guild_id):
+                return
+            manager = await asyncio.to_thread(DataManager, self._filename(guild_id), **self.options)
+        finally:
+            del self._loading[guild_id]
+        metrics.inc("partition_loads_total", file=self.dirname)
+        # A synchronous accessor may have loaded (and changed) the partition in the meantime.
+        if guild_id not in self._cache and guild_id not in self._evicting:
+            self._cache_partition(guild_id, manager)
+
+    def _mutating(self, key: str) -> DataManager:
+        self._dirty.add(self._guild_for(key))
+        return cast(DataManager, self._manager(key, create=True))
+
+    def _schedule_eviction(self):
+        if self._eviction_task is not None and not self._eviction_task.done():
+            return
+        try:
+            self._eviction_task = asyncio.get_running_loop().create_task(self.evict_cold())
+        except RuntimeError:
+            pass  # No event loop yet (e.g. --verify-stats at startup); the next save trims the cache.
+
+    async def evict_cold(self):
+        """Flushes and drops the least recently used partitions until the cache is within budget."""
+        while len(self._cache) > self.max_guilds:
+            guild_id, manager = self._cache.popitem(last=False)
+            self._evicting[guild_id] = manager
+            if guild_id in self._dirty:
+                await manager.save()
+                self._dirty.discard(guild_id)
+            await manager.flush()
+            if self._evicting.get(guild_id) is not manager:
+                continue  # Accessed again while flushing, so it's back in the cache.
+            del self._evicting[guild_id]
+            metrics.inc("partition_evictions_total", file=self.dirname)
+            for listener in self.eviction_listeners:
+                listener(guild_id)
+        metrics.set_gauge("partition_cached_guilds", len(self._cache), file=self.dirname)
+
+    def get(self, key: str, default=None):
+        manager = self._manager(key)
+        return manager.get(key, default) if manager is not None else default
+
+    def set(self, key: str, value):
+        self._mutating(key).set(key, value)
+
+    def append(self, key: str, item):
+        self._mutating(key).append(key, item)
+
+    def delete(self, key: str):
+        if self._manager(key) is not None:
+            self._mutating(key).delete(key)
+
+    def guild_ids(self) -> List[str]:
+        """Returns the ids of all guilds with a partition, without loading them."""
+        guild_ids = set(self._cache)
+        for name in os.listdir(self.directory):
+            if name.endswith(('.json', '.json.journal', '.snap')):
+                guild_ids.add(name.split('.', 1)[0])
+        return sorted(guild_ids)
+
+    def items(self):
+        """Iterates over every partition's (key, value) pairs. Loads each guild in turn."""
+        for guild_id in self.guild_ids():
+            manager = self._manager(guild_id)
+            if manager is not None:
+                yield from list(manager.items())
+
+    async def save(self):
+        """
+        Saves only the partitions changed since the last save. Each stays dirty until its
+        save completes, so reload_changed() never reloads a partition over changes being written.
+        """
+        for guild_id in list(self._dirty):
+            manager = self._cache.get(guild_id) or self._evicting.get(guild_id)
+            if manager is not None:
+                await manager.save()
+            self._dirty.discard(guild_id)
+        if len(self._cache) > self.max_guilds:
+            self._schedule_eviction()
+
+    async def flush(self):
+        if self._eviction_task is not None:
+            await self._eviction_task
+        await self.save()
+        for manager in list(self._cache.values()):
+            await manager.flush()
+
+    def reload_changed(self) -> List[str]:
+        """
+        Reloads the cached partitions changed on disk by something else; see
+        DataManager.reload_changed(). Partitions not in memory are read fresh on next use anyway.
+        """
+        return [key for guild_id, manager in list(self._cache.items()) if guild_id not in self._dirty for key in manager.reload_changed()]
+
+
+class PartitionedWarStore(WarHistoryQueries, PartitionedDataManager):
+    """War history kept in one file per guild (war_data/<guild_id>.json), loaded on demand."""
+
+
+class GuildWarStats:
+    """
+    Running aggregates of a guild's concluded wars (counts by status, summed duration and
+    the most recent engagements), so /warstats reads precomputed values instead of
+    rescanning the whole history.
+    """
+    RECENT_LIMIT = 5
+
+    def __init__(self):
+        self.status_counts: Dict[str, int] = {}
+        self.total = 0
+        self.total_duration = 0.0
+        self.recent: List[dict] = []  # Newest first, at most RECENT_LIMIT entries.
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> 'GuildWarStats':
+        """Builds the aggregates with a full pass over a guild's records."""
+        stats = cls()
+        for record in records:
+            stats.add(record)
+        return stats
+
+    @classmethod
+    def from_store(cls, store: Union['JSONWarStore', 'ShardedWarStore', 'PartitionedWarStore', 'SQLiteWarStore'], guild_id: str) -> 'GuildWarStats':
+        """Builds the aggregates from a store's summary queries."""
+        summary = store.war_summary(guild_id)
+        stats = cls()
+        stats.total = summary["total"]
+        stats.total_duration = summary["total_duration"]
+        stats.status_counts = {
+            "Win": summary["wins"], "Loss": summary["losses"], "Truce": summary["truces"], "Expired": summary["expired"]
+        }
+        stats.recent = store.recent_wars(guild_id, cls.RECENT_LIMIT)
+        return stats
+
+    def add(self, record: dict):
+        """Folds one newly concluded war into the aggregates."""
+        status = record['status']
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        self.total += 1
+        self.total_duration += record.get('duration_seconds', 0)
+
+        if len(self.recent) < self.RECENT_LIMIT or record['end_time_utc'] > self.recent[-1]['end_time_utc']:
+            self.recent.append(record)
+            self.recent.sort(key=lambda w: w['end_time_utc'], reverse=True)
+            del self.recent[self.RECENT_LIMIT:]
+
+    def add_summary(self, summary: dict):
+        """Adds totals in the stores' war_summary() shape (e.g. of archived wars); the recent list is left alone."""
+        self.total += summary["total"]
+        self.total_duration += summary["total_duration"]
+        for status, key in (("Win", "wins"), ("Loss", "losses"), ("Truce", "truces"), ("Expired", "expired")):
+            self.status_counts[status] = self.status_counts.get(status, 0) + summary[key]
+
+    def summary(self) -> dict:
+        """Returns the aggregates in the same shape as the stores' war_summary()."""
+        return {
+            "total": self.total,
+            "wins": self.status_counts.get("Win", 0),
+            "losses": self.status_counts.get("Loss", 0),
+            "truces": self.status_counts.get("Truce", 0),
+            "expired": self.status_counts.get("Expired", 0),
+            "total_duration": self.total_duration,
+        }
+
+    def matches(self, other: 'GuildWarStats') -> bool:
+        """Compares two sets of aggregates, allowing for float rounding in the duration sum."""
+        mine, theirs = self.summary(), other.summary()
+        return (
+            all(mine[key] == theirs[key] for key in ("total", "wins", "losses", "truces", "expired"))
+            and math.isclose(mine["total_duration"], theirs["total_duration"], rel_tol=1e-9, abs_tol=1e-6)
+            and [w['war_id'] for w in self.recent] == [w['war_id'] for w in other.recent]
+        )
+
+
+class WarAnalytics:
+    """
+    A columnar (NumPy) copy of a guild's war history used for /warstats breakdowns.
+    Timestamps are stored as epoch seconds, status and region as small integer codes,
+    so every breakdown is a handful of vectorized masks and bincounts. Newly concluded
+    wars are buffered and folded into the columns on the next query.
+    """
+    STATUS_CODES = {"Win": 0, "Loss": 1, "Truce": 2, "Expired": 3}
+    OTHER_STATUS = 4
+    MAX_OPPONENT_BUCKET = 5  # Opponent counts at or above this are grouped together.
+
+    def __init__(self):
+        self.regions: List[str] = []
+        self._region_codes: Dict[str, int] = {}
+        self._pending: List[tuple] = []
+        self.end_times = np.empty(0, dtype=np.int64)
+        self.statuses = np.empty(0, dtype=np.int8)
+        self.region_ids = np.empty(0, dtype=np.int16)
+        self.num_opponents = np.empty(0, dtype=np.int16)
+        self.durations = np.empty(0, dtype=np.float64)
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> 'WarAnalytics':
+        analytics = cls()
+        for record in records:
+            analytics.add(record)
+        return analytics
+
+    def add(self, record: dict):
+        """Buffers a newly concluded war; it's folded into the columns on the next query."""
+        region = record.get('region', 'Unknown')
+        region_id = self._region_codes.get(region)
+        if region_id is None:
+            region_id = self._region_codes[region] = len(self.regions)
+            self.regions.append(region)
+        ended = datetime.datetime.fromisoformat(record['end_time_utc'])
+        if ended.tzinfo is None:
+            ended = ended.replace(tzinfo=datetime.timezone.utc)
+        self._pending.append((
+            int(ended.timestamp()),
+            self.STATUS_CODES.get(record['status'], self.OTHER_STATUS),
+            region_id,
+            record.get('num_opponents', 0),
+            record.get('duration_seconds', 0.0),
+        ))
+
+    def _materialize(self):
+        if not self._pending:
+            return
+        end_times, statuses, region_ids, num_opponents, durations = zip(*self._pending)
+        self._pending = []
+        self.end_times = np.concatenate([self.end_times, np.array(end_times, dtype=np.int64)])
+        self.statuses = np.concatenate([self.statuses, np.array(statuses, dtype=np.int8)])
+        self.region_ids = np.concatenate([self.region_ids, np.array(region_ids, dtype=np.int16)])
+        self.num_opponents = np.concatenate([self.num_opponents, np.array(num_opponents, dtype=np.int16)])
+        self.durations = np.concatenate([self.durations, np.array(durations, dtype=np.float64)])
+
+    @staticmethod
+    def _group_record(groups: 'np.ndarray', statuses: 'np.ndarray', size: int) -> List[tuple]:
+        """Returns (group, total, wins, losses) for every non-empty group."""
+        totals = np.bincount(groups, minlength=size)
+        wins = np.bincount(groups[statuses == WarAnalytics.STATUS_CODES["Win"]], minlength=size)
+        losses = np.bincount(groups[statuses == WarAnalytics.STATUS_CODES["Loss"]], minlength=size)
+        return [(group, int(totals[group]), int(wins[group]), int(losses[group])) for group in np.flatnonzero(totals)]
+
+    def breakdown(self, since: Optional[float] = None) -> dict:
+        """Computes counts, duration percentiles and win rates by region and opponent count."""
+        self._materialize()
+        mask = self.end_times >= since if since is not None else slice(None)
+        statuses, durations = self.statuses[mask], self.durations[mask]
+        status_counts = np.bincount(statuses, minlength=self.OTHER_STATUS + 1)
+
+        by_region = self._group_record(self.region_ids[mask].astype(np.intp), statuses, len(self.regions))
+        opponent_buckets = np.clip(self.num_opponents[mask], 0, self.MAX_OPPONENT_BUCKET).astype(np.intp)
+        by_opponents = self._group_record(opponent_buckets, statuses, self.MAX_OPPONENT_BUCKET + 1)
+
+        return {
+            "total": int(statuses.size),
+            "wins": int(status_counts[self.STATUS_CODES["Win"]]),
+            "losses": int(status_counts[self.STATUS_CODES["Loss"]]),
+            "truces": int(status_counts[self.STATUS_CODES["Truce"]]),
+            "expired": int(status_counts[self.STATUS_CODES["Expired"]]),
+            "percentiles": tuple(np.percentile(durations, [50, 90, 99])) if durations.size else None,
+            "by_region": [(self.regions[group], *counts) for group, *counts in by_region],
+            "by_opponents": [(int(group), *counts) for group, *counts in by_opponents],
+        }
+
+
+class WarRollups:
+    """
+    Per-day totals of a guild's concluded wars (UTC days): counts by status and summed
+    duration. Built with one pass over the history and then updated as each war concludes,
+    so /wartrend never rescans it. Weekly totals are summed from the daily buckets.
+    """
+    STATUSES = ("Win", "Loss", "Truce", "Expired")
+
+    def __init__(self):
+        # Date ordinal -> [wins, losses, truces, expired, total, summed duration].
+        self.days: Dict[int, List[float]] = {}
+        self.version = 0  # Bumped on every change; rendered charts are cached against it.
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> 'WarRollups':
+        rollups = cls()
+        for record in records:
+            rollups.add(record)
+        return rollups
+
+    def add(self, record: dict):
+        """Folds one newly concluded war into its day's bucket."""
+        ended = datetime.datetime.fromisoformat(record['end_time_utc'])
+        if ended.tzinfo is not None:
+            ended = ended.astimezone(datetime.timezone.utc)
+        bucket = self.days.get(ended.toordinal())
+        if bucket is None:
+            bucket = self.days[ended.toordinal()] = [0, 0, 0, 0, 0, 0.0]
+        if record['status'] in self.STATUSES:
+            bucket[self.STATUSES.index(record['status'])] += 1
+        bucket[4] += 1
+        bucket[5] += record.get('duration_seconds', 0)
+        self.version += 1
+
+    def add_days(self, days: Dict[str, List[float]]):
+        """Adds daily buckets kept elsewhere (e.g. WarArchive's), keyed by date ordinal."""
+        for day, counts in days.items():
+            bucket = self.days.setdefault(int(day), [0, 0, 0, 0, 0, 0.0])
+            for i, value in enumerate(counts):
+                bucket[i] += value
+        self.version += 1
+
+    def series(self, period: str, since: Optional[datetime.date] = None) -> List[tuple]:
+        """
+        Returns (bucket start date, wins, losses, truces, expired, total, summed duration) per
+        day or per week (starting Monday), oldest first. Empty buckets are left out.
+        """
+        first_day = since.toordinal() if since else None
+        buckets: Dict[int, List[float]] = {}
+        for day, counts in self.days.items():
+            if first_day is not None and day < first_day:
+                continue
+            start = day - datetime.date.fromordinal(day).weekday() if period == "week" else day
+            totals = buckets.get(start)
+            if totals is None:
+                buckets[start] = list(counts)
+            else:
+                for i, value in enumerate(counts):
+                    totals[i] += value
+        return [(datetime.date.fromordinal(start), *buckets[start]) for start in sorted(buckets)]
+
+
+class OpponentIndex:
+    """
+    Inverted index of a guild's opponents: normalized Roblox name -> war ids and a
+    win/loss/truce tally. Names are also kept in a sorted list so prefix searches for
+    /opponent autocomplete are a binary search rather than a scan.
+    Ongoing requests are tracked too, so edits made with Edit Opps are reflected before
+    the war concludes.
+    """
+    def __init__(self):
+        self.entries: Dict[str, dict] = {}
+        self._names: List[str] = []  # Sorted normalized names.
+        self._active: Dict[int, str] = {}  # Ongoing war id -> raw opponents string.
+        self._sorted = True
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> 'OpponentIndex':
+        index = cls()
+        index._sorted = False  # Sort the name list once at the end instead of per insert.
+        for record in records:
+            index.add_war(record)
+        index._names.sort()
+        index._sorted = True
+        return index
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        """Roblox usernames are case-insensitive; ignore stray formatting around them."""
+        return name.strip().strip('`@').strip().lower()
+
+    @classmethod
+    def split(cls, opponents: str) -> Dict[str, str]:
+        """Splits a comma-separated opponents string into {normalized name: display name}."""
+        names: Dict[str, str] = {}
+        for opp in opponents.split(','):
+            normalized = cls.normalize(opp)
+            if normalized and normalized not in names:
+                names[normalized] = opp.strip().strip('`@').strip()
+        return names
+
+    def _entry(self, name: str, display: str) -> dict:
+        entry = self.entries.get(name)
+        if entry is None:
+            entry = self.entries[name] = {"name": display, "war_ids": [], "counts": {}, "last_fought": None, "active": set()}
+            if self._sorted:
+                bisect.insort(self._names, name)
+            else:
+                self._names.append(name)
+        return entry
+
+    def add_war(self, record: dict):
+        """Indexes a concluded war under each of its opponents."""
+        war_id, status = record['war_id'], record['status']
+        self.set_active(war_id, "")
+        for name, display in self.split(record.get('opponents', '')).items():
+            entry = self._entry(name, display)
+            entry["war_ids"].append(war_id)
+            entry["counts"][status] = entry["counts"].get(status, 0) + 1
+            if entry["last_fought"] is None or record['end_time_utc'] > entry["last_fought"]:
+                entry["last_fought"] = record['end_time_utc']
+
+    def set_active(self, war_id: int, opponents: str):
+        """Sets (or, with an empty string, clears) the opponents of an ongoing request."""
+        previous = self._active.pop(war_id, None)
+        if previous:
+            for name in self.split(previous):
+                self.entries[name]["active"].discard(war_id)
+        if opponents:
+            for name, display in self.split(opponents).items():
+                self._entry(name, display)["active"].add(war_id)
+            self._active[war_id] = opponents
+
+    def clear_history(self):
+        """Forgets all concluded wars while keeping ongoing requests indexed."""
+        active, self._active = self._active, {}
+        self.entries, self._names = {}, []
+        for war_id, opponents in active.items():
+            self.set_active(war_id, opponents)
+
+    def lookup(self, name: str) -> Optional[dict]:
+        return self.entries.get(self.normalize(name))
+
+    def search(self, prefix: str, limit: int = 25) -> List[dict]:
+        """Returns up to `limit` entries whose normalized name starts with `prefix`."""
+        prefix = self.normalize(prefix)
+        results = []
+        i = bisect.bisect_left(self._names, prefix)
+        while i < len(self._names) and len(results) < limit and self._names[i].startswith(prefix):
+            results.append(self.entries[self._names[i]])
+            i += 1
+        return results
+
+
+class MemberLeaderboard:
+    """
+    Per-member war counters for a guild (requests started, how they ended, and wars
+    concluded) with one sorted ranking per /leaderboard category. Each concluded war moves
+    the members involved within the rankings by binary search, and a page is read by
+    bisecting to a cursor (the sort key of the last entry shown), so neither updates nor
+    page reads ever re-sort or scan the history.
+    """
+    CATEGORIES = {
+        "requests": "Most Requests",
+        "wins": "Most Wins",
+        "win_rate": "Best Win Rate",
+        "conclusions": "Most Conclusions",
+    }
+    STATUS_FIELDS = {"Win": "wins", "Loss": "losses", "Truce": "truces", "Expired": "expired"}
+    MIN_DECIDED = 5  # Wins plus losses a member needs before they're ranked by win rate.
+
+    def __init__(self):
+        self.members: Dict[int, Dict[str, int]] = {}
+        # Category -> sorted sort keys; each key ends with the member id.
+        self.rankings: Dict[str, List[tuple]] = {category: [] for category in self.CATEGORIES}
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict], base: Optional[Dict[str, Dict[str, int]]] = None) -> 'MemberLeaderboard':
+        """Tallies `records` on top of `base`, counters kept elsewhere (e.g. WarArchive's) keyed by member id."""
+        board = cls()
+        for member_id, counts in (base or {}).items():
+            board.members[int(member_id)] = dict(counts)
+        for record in records:
+            board._tally(record)
+        # Rank everyone once at the end instead of moving members on every record.
+        for member_id in board.members:
+            for category, key in board._keys(member_id).items():
+                board.rankings[category].append(key)
+        for ranking in board.rankings.values():
+            ranking.sort()
+        return board
+
+    def _tally(self, record: dict) -> List[int]:
+        """Adds a war to its members' counters. Returns the ids of the members it touched."""
+        touched = []
+        initiator_id, concluded_by_id = record.get('initiator_id'), record.get('concluded_by_id')
+        if initiator_id is not None:
+            counts = self._counts(initiator_id)
+            counts["requests"] += 1
+            if record['status'] in self.STATUS_FIELDS:
+                counts[self.STATUS_FIELDS[record['status']]] += 1
+            touched.append(initiator_id)
+        if concluded_by_id is not None:
+            self._counts(concluded_by_id)["conclusions"] += 1
+            if concluded_by_id != initiator_id:
+                touched.append(concluded_by_id)
+        return touched
+
+    def _counts(self, member_id: int) -> Dict[str, int]:
+        counts = self.members.get(member_id)
+        if counts is None:
+            counts = self.members[member_id] = {"requests": 0, "wins": 0, "losses": 0, "truces": 0, "expired": 0, "conclusions": 0}
+        return counts
+
+    def _keys(self, member_id: int) -> Dict[str, tuple]:
+        """Returns a member's sort key in every category they're ranked in (smallest key ranks first)."""
+        counts = self.members.get(member_id)
+        if counts is None:
+            return {}
+        keys = {}
+        for category in ("requests", "wins", "conclusions"):
+            if counts[category]:
+                keys[category] = (-counts[category], member_id)
+        decided = counts["wins"] + counts["losses"]
+        if decided >= self.MIN_DECIDED:
+            keys["win_rate"] = (-counts["wins"] / decided, -decided, member_id)
+        return keys
+
+    def add_war(self, record: dict):
+        """Counts a newly concluded war and moves the members involved within the rankings."""
+        members = [member_id for member_id in {record.get('initiator_id'), record.get('concluded_by_id')} if member_id is not None]
+        previous = {member_id: self._keys(member_id) for member_id in members}
+        self._tally(record)
+        for member_id in members:
+            for category, key in previous[member_id].items():
+                ranking = self.rankings[category]
+                del ranking[bisect.bisect_left(ranking, key)]
+            for category, key in self._keys(member_id).items():
+                bisect.insort(self.rankings[category], key)
+
+    def page(self, category: str, size: int, after: Optional[tuple] = None, before: Optional[tuple] = None) -> Tuple[int, List[tuple]]:
+        """
+        Returns the zero-based rank of the first entry and up to `size` sort keys following the
+        cursor `after`, or preceding `before`. Without a cursor, returns the top of the ranking.
+        """
+        ranking = self.rankings[category]
+        if before is not None:
+            end = bisect.bisect_left(ranking, before)
+            start = max(0, end - size)
+        else:
+            start = bisect.bisect_right(ranking, after) if after is not None else 0
+            end = start + size
+        return start, ranking[start:end]
+
+
+class WarArchive:
+    """
+    Cold storage for war records moved out of the war store by the retention policy.
+    Records are written to gzip-compressed JSON-lines segments (war_archive/<guild_id>/
+    000001.jsonl.gz, ...) that are only ever added, never rewritten. Each guild's archived
+    wars are also folded into a summary in war_archive/summaries.json (status counts and
+    duration, daily rollups and per-member counters), which lifetime /warstats totals,
+    /wartrend and /leaderboard add to the live history instead of reading the segments.
+    """
+    SEGMENT_SUFFIX = ".jsonl.gz"
+
+    def __init__(
+        self, dirname: str = "war_archive", *, shard_count: Optional[int] = None, shard_ids: Optional[List[int]] = None, **options
+    ):
+        self.directory = os.path.join(BASE_DIR, dirname)  # Created with the first segment.
+        filename = os.path.join(dirname, "summaries.json")
+        self.summaries: Union[DataManager, ShardedDataManager]
+        if shard_count:
+            self.summaries = ShardedDataManager(filename, shard_count=shard_count, shard_ids=shard_ids, **options)
+        else:
+            self.summaries = DataManager(filename, **options)
+
+    @staticmethod
+    def select(records: Iterable[dict], start: Optional[datetime.datetime], end: datetime.datetime) -> List[dict]:
+        """Returns the records that ended in [start, end). Meant to run in a worker thread."""
+        selected = []
+        for record in records:
+            ended = datetime.datetime.fromisoformat(record['end_time_utc'])
+            if ended.tzinfo is None:
+                ended = ended.replace(tzinfo=datetime.timezone.utc)
+            if ended < end and (start is None or ended >= start):
+                selected.append(record)
+        return selected
+
+    def summary(self, guild_id: str) -> Optional[dict]:
+        """Returns a guild's archived totals, or None if nothing was archived."""
+        return self.summaries.get(guild_id)
+
+    def _guild_directory(self, guild_id: str) -> str:
+        return os.path.join(self.directory, guild_id)
+
+    def _segments(self, guild_id: str) -> List[str]:
+        directory = self._guild_directory(guild_id)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name for name in os.listdir(directory) if name.endswith(self.SEGMENT_SUFFIX))
+
+    def read_segment(self, guild_id: str, name: str) -> Iterator[dict]:
+        """Yields the records of one archive segment."""
+        with gzip.open(os.path.join(self._guild_directory(guild_id), name), 'rt', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def write_segment(self, guild_id: str, records: List[dict]) -> str:
+        """Writes records to a new segment, atomically and durably. Returns its name. Meant to run in a worker thread."""
+        directory = self._guild_directory(guild_id)
+        os.makedirs(directory, exist_ok=True)
+        segments = self._segments(guild_id)
+        name = f"{int(segments[-1].split('.', 1)[0]) + 1 if segments else 1:06d}{self.SEGMENT_SUFFIX}"
+        path = os.path.join(directory, name)
+        with open(f"{path}.tmp", 'wb') as f:
+            with gzip.GzipFile(fileobj=f, mode='wb') as gz:
+                for record in records:
+                    gz.write(json.dumps(record, default=json_default).encode('utf-8') + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+        return name
+
+    @staticmethod
+    def fold(summary: Optional[dict], name: str, records: List[dict]) -> dict:
+        """
+        Returns a guild's summary with a written segment's records added. The summary passed in
+        is left untouched, so this can run in a worker thread; the caller sets the result.
+        """
+        summary = summary or {
+            "total": 0, "wins": 0, "losses": 0, "truces": 0, "expired": 0, "total_duration": 0.0,
+            "days": {}, "members": {}, "segments": [],
+        }
+        # Built as a new value, so a snapshot being written never sees it half-updated.
+        updated = {key: summary[key] + value for key, value in GuildWarStats.from_records(records).summary().items()}
+        updated["days"] = {day: list(counts) for day, counts in summary["days"].items()}
+        for day, counts in WarRollups.from_records(records).days.items():
+            bucket = updated["days"].setdefault(str(day), [0, 0, 0, 0, 0, 0.0])
+            for i, value in enumerate(counts):
+                bucket[i] += value
+        updated["members"] = {member_id: dict(counts) for member_id, counts in summary["members"].items()}
+        for member_id, counts in MemberLeaderboard.from_records(records).members.items():
+            totals = updated["members"].setdefault(str(member_id), dict.fromkeys(counts, 0))
+            for key, value in counts.items():
+                totals[key] += value
+        updated["segments"] = [*summary["segments"], name]
+        return updated
+
+    def recover(self, guild_id: str, summary: Optional[dict], live_wars: Iterable[dict]) -> Optional[dict]:
+        """
+        Resolves segments left behind by an archive run that crashed before its summary was
+        saved: if the records are still in the live history the segment is deleted, otherwise
+        it's adopted into the summary. Meant to run in a worker thread: returns the summary
+        with the adopted segments folded in, or None if it's unchanged.
+        """
+        directory = self._guild_directory(guild_id)
+        if not os.path.isdir(directory):
+            return None
+        for name in os.listdir(directory):
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(directory, name))
+        known = set((summary or {}).get("segments", []))
+        live_war_ids: Optional[set] = None  # Only read from the history if there's a segment to check.
+        changed = False
+        for name in self._segments(guild_id):
+            if name in known:
+                continue
+            if live_war_ids is None:
+                live_war_ids = {record.get('war_id') for record in live_wars}
+            records = list(self.read_segment(guild_id, name))
+            if any(record.get('war_id') in live_war_ids for record in records):
+                os.remove(os.path.join(directory, name))
+                logger.warning(f"Removed archive segment {name} of guild {guild_id}: its records were never removed from the war history.")
+            else:
+                summary = self.fold(summary, name, records)
+                changed = True
+                logger.warning(f"Recovered archive segment {name} of guild {guild_id} ({len(records)} records).")
+        return summary if changed else None
+
+    def clear(self, guild_id: str) -> int:
+        """Deletes a guild's segments and summary. Returns the number of archived records removed."""
+        summary = self.summary(guild_id)
+        shutil.rmtree(self._guild_directory(guild_id), ignore_errors=True)
+        if summary is None:
+            return 0
+        self.summaries.delete(guild_id)
+        return summary["total"]
+
+
+class RequestTemplate:
+    """
+    A guild's /backup settings compiled from its config: the allowed channel, the resolved
+    backup role, the request timeout and the static parts of the request embed (title,
+    description, color, thumbnail), so a request only fills in its own fields.
+    """
+    DEFAULT_THUMBNAIL_URL = "https://i.imgur.com/P5LJ02a.png"
+
+    def __init__(self, config: dict, guild: discord.Guild):
+        self.allowed_channel_id: Optional[int] = config.get('allowed_channel_id')
+        self.backup_role_id: Optional[int] = config.get('backup_role_id')
+        self.backup_role: Optional[discord.Role] = guild.get_role(self.backup_role_id) if self.backup_role_id else None
+        self.request_timeout: Optional[int] = config.get("request_timeout_minutes")
+        custom_color_val = config.get("embed_color")
+        color = discord.Color(custom_color_val) if custom_color_val is not None else discord.Color.gold()
+        self._base = discord.Embed(
+            title="⚔️ Backup Request! ⚔️",
+            description="A warrior requires aid! The status of this engagement is **Ongoing**.",
+            color=color
+        ).set_thumbnail(url=config.get("thumbnail_url") or self.DEFAULT_THUMBNAIL_URL).to_dict()
+
+    def render(self, author: Union[discord.User, discord.Member], roblox_user: str, opps: str, region: str, link: Optional[str]) -> discord.Embed:
+        """Returns a request embed: the compiled static parts plus this request's fields."""
+        link_value = f"[Click Here to Join]({link})" if link else "*No link provided. Join via user's Roblox profile.*"
+        return discord.Embed.from_dict({
+            **self._base,
+            "thumbnail": dict(self._base["thumbnail"]),
+            "fields": [
+                {"name": "🛡️ User in Need", "value": f"**Discord:** {author.mention}\n**Roblox:** `{roblox_user}`", "inline": False},
+                {"name": "💀 Opponents", "value": f"`{opps}`", "inline": False},
+                {"name": "🌍 Region", "value": f"`{region}`", "inline": False},
+                {"name": "🔗 Join Link", "value": link_value, "inline": False},
+            ],
+            "footer": {"text": f"Celestial Sentry | The Supreme Manager | Author ID: {author.id}"},
+        })
+
+
+class RecentRequestIndex:
+    """
+    Recent backup requests keyed by guild, normalized opponent set and region, so a second
+    /backup against the same squad within `window` seconds can join the first request
+    instead of pinging the role again. Entries are kept in creation order, so expired
+    ones are dropped from the front.
+    """
+    def __init__(self, window: float):
+        self.window = window
+        self._requests: OrderedDict[tuple, Tuple[int, float]] = OrderedDict()
+
+    @staticmethod
+    def key(guild_id: str, opponents: str, region: str) -> tuple:
+        return (guild_id, frozenset(OpponentIndex.split(opponents)), region)
+
+    def _prune(self, now: float):
+        while self._requests:
+            _, (_, created_at) = next(iter(self._requests.items()))
+            if now - created_at <= self.window:
+                break
+            self._requests.popitem(last=False)
+
+    def add(self, guild_id: str, opponents: str, region: str, message_id: int, created_at: float):
+        if self.window <= 0:
+            return
+        key = self.key(guild_id, opponents, region)
+        self._requests.pop(key, None)
+        self._requests[key] = (message_id, created_at)
+        self._prune(created_at)
+
+    def find(self, guild_id: str, opponents: str, region: str, now: float) -> Optional[int]:
+        """Returns the message id of a matching request created within the window, if any."""
+        if self.window <= 0:
+            return None
+        self._prune(now)
+        match = self._requests.get(self.key(guild_id, opponents, region))
+        return match[0] if match else None
+
+
+class WarExport:
+    """
+    Streams a guild's war history into a CSV or Parquet file for /warexport.
+    Meant to run in a worker thread: records are filtered through a generator and
+    written in fixed-size chunks, so memory stays flat however long the history is.
+    """
+    COLUMNS = SQLiteWarStore.COLUMNS
+    CHUNK_SIZE = 1000
+
+    def __init__(
+        self,
+        records: Iterator[dict],
+        since: Optional[datetime.datetime] = None,
+        until: Optional[datetime.datetime] = None,
+        status: Optional[str] = None
+    ):
+        self.records = records
+        self.since, self.until, self.status = since, until, status
+        self.exported = 0
+
+    def rows(self) -> Iterator[dict]:
+        """Yields the records matching the filters, trimmed to the export columns."""
+        for record in self.records:
+            if self.status and record.get('status') != self.status:
+                continue
+            if self.since or self.until:
+                ended = datetime.datetime.fromisoformat(record['end_time_utc'])
+                if ended.tzinfo is None:
+                    ended = ended.replace(tzinfo=datetime.timezone.utc)
+                if (self.since and ended < self.since) or (self.until and ended >= self.until):
+                    continue
+            self.exported += 1
+            yield {col: record.get(col) for col in self.COLUMNS}
+
+    def chunks(self) -> Iterator[List[dict]]:
+        chunk = []
+        for row in self.rows():
+            chunk.append(row)
+            if len(chunk) >= self.CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def write_csv(self, path: str):
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.COLUMNS)
+            writer.writeheader()
+            for chunk in self.chunks():
+                writer.writerows(chunk)
+
+    def write_parquet(self, path: str):
+        assert pa is not None and pq is not None
+        schema = pa.schema([
+            ("war_id", pa.int64()), ("initiator_id", pa.int64()), ("initiator_roblox_user", pa.string()),
+            ("opponents", pa.string()), ("num_opponents", pa.int64()), ("region", pa.string()),
+            ("start_time_utc", pa.string()), ("end_time_utc", pa.string()), ("duration_seconds", pa.float64()),
+            ("status", pa.string()), ("concluded_by_id", pa.int64()),
+        ])
+        with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+            for chunk in self.chunks():
+                writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+
+    def write(self, directory: str, basename: str, file_format: str, size_limit: int) -> str:
+        """
+        Writes the export into `directory` and returns the file path. Files larger
+        than `size_limit` are gzipped so they still fit in a Discord attachment.
+        """
+        path = os.path.join(directory, f"{basename}.{file_format}")
+        if file_format == "parquet":
+            self.write_parquet(path)
+        else:
+            self.write_csv(path)
+        if os.path.getsize(path) > size_limit:
+            with open(path, 'rb') as f_in, gzip.open(f"{path}.gz", 'wb') as f_out:
+                shutil.copyfileobj(f_in, f_out)
+            os.remove(path)
+            path = f"{path}.gz"
+        return path
+
+
+class TokenBucket:
+    """
+    Client-side rate limiter for one Discord route: allows `capacity` calls in a burst and
+    refills at `rate` tokens per second. The rate-limit headers of each response cap the
+    tokens at what Discord reports left, and a 429 pauses the bucket for its Retry-After.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    async def acquire(self):
+        """Waits until a call on this route is allowed, then consumes a token."""
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def sync(self, remaining: int, reset_after: float):
+        """Applies a response's X-RateLimit-Remaining and X-RateLimit-Reset-After to the bucket."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate, float(remaining))
+        self.updated = now
+        if remaining < 1:
+            self._block_until(now + reset_after)
+
+    def penalize(self, retry_after: float):
+        """Blocks the route for `retry_after` seconds, as instructed by a 429 response."""
+        self._block_until(time.monotonic() + retry_after)
+
+    def _block_until(self, deadline: float):
+        """Allows no calls before `deadline`, then one right away, refilling from there."""
+        self.blocked_until = max(self.blocked_until, deadline)
+        self.tokens = 1.0
+        self.updated = self.blocked_until
+
+
+class CooldownStore(abc.ABC):
+    """
+    Token buckets for command cooldowns, keyed by strings like "backup:<guild_id>:<user_id>".
+    A bucket holds up to `capacity` tokens and refills at `rate` tokens per second; each use
+    takes one. A bucket that has refilled completely behaves like a new one, so
+    expire_idle() can drop it. Backends implement consume() as one atomic operation, so
+    several bot processes sharing a backend never both take the last token.
+    """
+    @staticmethod
+    def refill(tokens: float, updated: float, rate: float, capacity: float, now: float) -> Tuple[float, float]:
+        """Returns the bucket's tokens after refilling to `now` and taking one if possible, and the retry-after (0.0 if taken)."""
+        tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+        if tokens >= 1:
+            return tokens - 1, 0.0
+        return tokens, (1 - tokens) / rate
+
+    @abc.abstractmethod
+    def consume(self, key: str, rate: float, capacity: float, now: float) -> float:
+        """Takes a token from the bucket. Returns 0.0 if one was taken, otherwise the seconds until one refills."""
+
+    @abc.abstractmethod
+    def expire_idle(self, now: float) -> int:
+        """Deletes the buckets that are full again by `now`. Returns how many were deleted."""
+
+    def close(self):
+        """Releases the backend's resources."""
+
+
+class MemoryCooldownStore(CooldownStore):
+    """Buckets kept in this process only: they reset on restart and aren't shared between processes."""
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}  # Key -> (tokens, updated, full again at).
+
+    def consume(self, key: str, rate: float, capacity: float, now: float) -> float:
+        tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+        tokens, retry_after = self.refill(tokens, updated, rate, capacity, now)
+        self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        return retry_after
+
+    def expire_idle(self, now: float) -> int:
+        idle = [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]
+        for key in idle:
+            del self._buckets[key]
+        return len(idle)
+
+
+class SQLiteCooldownStore(CooldownStore):
+    """
+    Buckets kept in a local SQLite database (WAL mode), so cooldowns survive restarts and
+    are shared by every bot process using the same file. consume() runs as one IMMEDIATE
+    transaction. The database is opened on first use.
+
+    Calls run on the event loop, so a database locked by another process only blocks for
+    BUSY_TIMEOUT seconds before raising sqlite3.OperationalError. A file that isn't a usable
+    database raises sqlite3.DatabaseError on every call, and is reopened on the next one.
+    """
+    BUSY_TIMEOUT = 0.05
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS buckets (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated REAL NOT NULL,
+            full_at REAL NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_buckets_full_at ON buckets (full_at);
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # Autocommit mode; consume() opens its own transaction.
+            conn = sqlite3.connect(os.path.join(BASE_DIR, self.filename), isolation_level=None, timeout=self.BUSY_TIMEOUT)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(self.SCHEMA)
+            except sqlite3.Error:
+                conn.close()  # Kept only once it's set up, so a failed open is retried.
+                raise
+            self._conn = conn
+        return self._conn
+
+    def consume(self, key: str, rate: float, capacity: float, now: float) -> float:
+        conn = self._connection()
+        with conn:
+            # IMMEDIATE takes the write lock before reading, so no other process reads the same state.
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, retry_after = self.refill(*(row or (capacity, now)), rate, capacity, now)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)",
+                (key, tokens, now, now + (capacity - tokens) / rate)
+            )
+        return retry_after
+
+    def expire_idle(self, now: float) -> int:
+        return self._connection().execute("DELETE FROM buckets WHERE full_at <= ?", (now,)).rowcount
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class AlertBatch:
+    """The DM alerts for one backup request; reports its totals once every recipient is done."""
+    def __init__(self, total: int, on_complete: Callable[[int, int], Awaitable[None]]):
+        self.remaining = total
+        self.delivered = 0
+        self.failed = 0
+        self.started_at = time.perf_counter()
+        self.on_complete = on_complete
+
+    async def finish(self, delivered: bool):
+        if delivered:
+            self.delivered += 1
+        else:
+            self.failed += 1
+        self.remaining -= 1
+        if not self.remaining:
+            metrics.observe("alert_fanout_seconds", time.perf_counter() - self.started_at)
+            await self.on_complete(self.delivered, self.failed)
+
+
+class AlertDispatcher:
+    """
+    Sends backup alerts by DM through a fixed pool of worker tasks, so a large fan-out
+    never holds up the command that triggered it. Every Discord call first takes a token
+    from its route's bucket (plus a global bucket). Once attach()ed to the HTTP client's
+    trace, the rate-limit headers of every response on those routes resync their buckets,
+    and a 429 that makes it past discord.py pauses the route for its Retry-After.
+    """
+    # (rate per second, burst) per route template; DM channel creation is the strictest.
+    ROUTE_LIMITS = {
+        "global": (40.0, 40.0),
+        "POST /users/@me/channels": (2.0, 5.0),
+        "POST /channels/{channel_id}/messages": (1.0, 5.0),
+    }
+    # Request paths (after the /api/v<n> prefix) of the routes above.
+    ROUTE_PATHS = {
+        "POST /users/@me/channels": re.compile(r"/api/v\d+/users/@me/channels"),
+        "POST /channels/{channel_id}/messages": re.compile(r"/api/v\d+/channels/(?P<channel_id>\d+)/messages"),
+    }
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, workers: int = 4, queue_size: int = 5000):
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.get_running_loop().create_task(self._worker()))
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def attach(self, trace: TraceConfig):
+        """Feeds the responses seen by an aiohttp trace (the bot's `http_trace`) into the buckets."""
+        async def on_request_end(session, context, params):
+            self.observe_response(params.method, params.url.path, params.response.headers)
+        trace.on_request_end.append(on_request_end)
+
+    def observe_response(self, method: str, path: str, headers):
+        """Resyncs the bucket of the route a response belongs to from its rate-limit headers."""
+        remaining, reset_after = headers.get("X-RateLimit-Remaining"), headers.get("X-RateLimit-Reset-After")
+        if remaining is None or reset_after is None:
+            return
+        for route, pattern in self.ROUTE_PATHS.items():
+            match = pattern.fullmatch(path)
+            if match and route.startswith(f"{method} "):
+                # Only channels alerts were sent to have a bucket; other messages the bot sends don't need one.
+                bucket = self._buckets.get(route.format(**match.groupdict()))
+                if bucket is not None:
+                    bucket.sync(int(remaining), float(reset_after))
+                return
+
+    def bucket(self, route: str, **params) -> TokenBucket:
+        """Returns the bucket for a route, e.g. bucket("POST /channels/{channel_id}/messages", channel_id=1)."""
+        key = route.format(**params)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(*self.ROUTE_LIMITS[route])
+        return bucket
+
+    def dispatch(
+        self, recipients: List[Union[discord.Member, discord.User]], content: Optional[str], embed: discord.Embed,
+        on_complete: Callable[[int, int], Awaitable[None]]
+    ) -> int:
+        """
+        Queues a DM for each recipient and returns immediately with the number queued.
+        Recipients that don't fit in the queue are counted as failed.
+        """
+        if not recipients:
+            return 0
+        batch = AlertBatch(len(recipients), on_complete)
+        queued = 0
+        for recipient in recipients:
+            try:
+                self._queue.put_nowait((batch, recipient, content, embed))
+                queued += 1
+            except asyncio.QueueFull:
+                break
+        dropped = len(recipients) - queued
+        if dropped:
+            logger.warning(f"Alert queue is full; dropped {dropped} DM alert(s).")
+            metrics.inc("alert_dms_total", dropped, outcome="dropped")
+            batch.failed += dropped
+            batch.remaining -= dropped
+            if not batch.remaining:
+                asyncio.get_running_loop().create_task(on_complete(0, dropped))
+        return queued
+
+    async def _worker(self):
+        while True:
+            batch, recipient, content, embed = await self._queue.get()
+            try:
+                delivered = await self._deliver(recipient, content, embed)
+                metrics.inc("alert_dms_total", outcome="delivered" if delivered else "failed")
+                await batch.finish(delivered)
+            except Exception as e:
+                logger.error(f"Alert worker failed while reporting a DM to {recipient}: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, recipient: Union[discord.Member, discord.User], content: Optional[str], embed: discord.Embed) -> bool:
+        """Sends one DM, retrying after rate limits. Returns False if it couldn't be delivered."""
+        global_bucket = self.bucket("global")
+        for _ in range(self.MAX_ATTEMPTS):
+            bucket = global_bucket
+            try:
+                channel = recipient.dm_channel
+                if channel is None:
+                    bucket = self.bucket("POST /users/@me/channels")
+                    await bucket.acquire()
+                    await global_bucket.acquire()
+                    channel = await recipient.create_dm()
+                bucket = self.bucket("POST /channels/{channel_id}/messages", channel_id=channel.id)
+                await bucket.acquire()
+                await global_bucket.acquire()
+                await channel.send(content=content, embed=embed)
+                return True
+            except discord.Forbidden:
+                return False  # DMs closed or the bot is blocked.
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    logger.warning(f"Could not DM backup alert to {recipient}: {e}")
+                    return False
+                retry_after = float(e.response.headers.get("Retry-After", 1.0))
+                (global_bucket if e.response.headers.get("X-RateLimit-Global") else bucket).penalize(retry_after)
+                metrics.inc("alert_rate_limited_total")
+        return False
+
+
+class ExpiryScheduler:
+    """
+    Fires `callback(key, deadline)` once each deadline (epoch seconds) passes, from a single
+    task sleeping on a min-heap rather than one sleeping task per entry. Entries are never
+    removed; the callback decides whether the entry it's given is still current.
+    """
+    def __init__(self, callback: Callable[[str, float], Awaitable[None]]):
+        self.callback = callback
+        self._heap: List[Tuple[float, str]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, deadline: float, key: str):
+        heapq.heappush(self._heap, (deadline, key))
+        if self._heap[0] == (deadline, key):
+            self._wakeup.set()  # New earliest deadline; re-arm the sleep.
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                continue
+            deadline, key = heapq.heappop(self._heap)
+            try:
+                await self.callback(key, deadline)
+            except Exception as e:
+                logger.error(f"Scheduled expiry of {key} failed: {e}", exc_info=True)
+
+
+class InstrumentedCommandTree(discord.app_commands.CommandTree):
+    """A CommandTree that stamps each interaction on arrival so command latency can be measured."""
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["received_at"] = time.perf_counter()
+        # Time between Discord creating the interaction and it reaching us.
+        metrics.observe("gateway_delay_seconds", max(0.0, (discord.utils.utcnow() - interaction.created_at).total_seconds()))
+        if interaction.guild_id:
+            await cast(BackupBot, self.client).load_guild(str(interaction.guild_id))
+        return True
+
+
+class BackupBot(discord.AutoShardedClient):
+    """
+    A Discord bot for requesting backup in-game.
+    With a `guild_id`, commands are synced to that development guild only and the bot runs
+    a single shard; without one the bot runs in production mode, syncs commands globally
+    and is auto-sharded. When `shard_count` is given,
+    per-guild data is partitioned into one file per shard and only `shard_ids` are loaded.
+    With `partitioned`, configs and war history get one file per guild instead, loaded on
+    first use and evicted once more than `cache_guilds` guilds are resident.
+    `snapshot_format` ("json" or "binary") selects the on-disk format of the data files.
+    `cooldown_storage` ("sqlite" or "memory") selects where command cooldowns are kept.
+    """
+    TREND_CHARTS_PER_GUILD = 4  # Rendered /wartrend variants kept per guild.
+    DEFAULT_BACKUP_COOLDOWN = 60  # Seconds between a member's /backup requests, unless /setup changes it.
+
+    def __init__(
+        self, *, intents: discord.Intents, guild_id: Optional[int], journaled: bool = False,
+        write_behind: Optional[float] = None, war_storage: str = "json",
+        shard_count: Optional[int] = None, shard_ids: Optional[List[int]] = None,
+        metrics_port: Optional[int] = None, partitioned: bool = False, cache_guilds: int = 500,
+        alert_workers: int = 4, merge_window: float = 0, compact_records: bool = False,
+        chart_workers: int = 1, snapshot_format: str = "json", cooldown_storage: str = "sqlite"
+    ):
+        # Lets the DM alert dispatcher see the rate-limit headers of discord.py's responses.
+        http_trace = TraceConfig()
+        # A development bot only serves its guild, so it runs one gateway shard instead of
+        # the count Discord recommends for production.
+        gateway_shard_count = 1 if guild_id and not shard_count else shard_count
+        super().__init__(intents=intents, shard_count=gateway_shard_count, shard_ids=shard_ids, http_trace=http_trace)
+        self.tree = InstrumentedCommandTree(self)
+        self.tree.error(self.on_app_command_error)
+        self.metrics_port = metrics_port
+        self._metrics_runner: Optional[web.AppRunner] = None
+        self._loop_lag_task: Optional[asyncio.Task] = None
+        # Seconds spent in each startup phase; logged once on the first on_ready.
+        self.startup_timings: Dict[str, float] = {"imports": PROCESS_START - IMPORT_START}
+        self._login_start = 0.0
+        load_start = time.perf_counter()
+        
+        options = {"journaled": journaled, "write_behind": write_behind, "snapshot_format": snapshot_format}
+        self.configs: Union[DataManager, ShardedDataManager, PartitionedDataManager]
+        # Ongoing backup requests keyed by "<guild_id>:<message_id>", so button clicks don't have to parse embeds.
+        self.active_requests: Union[DataManager, ShardedDataManager]
+        self.war_data: Union[JSONWarStore, ShardedWarStore, PartitionedWarStore, SQLiteWarStore]
+        sharding = {"shard_count": shard_count, "shard_ids": shard_ids}
+        # Per-guild files never overlap between shard processes, so they need no shard split.
+        partitioning = {"max_guilds": cache_guilds}
+        if partitioned:
+            self.configs = PartitionedDataManager("config", legacy_filename="config.json", **partitioning, **options)
+        elif shard_count:
+            self.configs = ShardedDataManager("config.json", **sharding, **options)
+        else:
+            self.configs = DataManager("config.json", **options)
+        # Members opted in to DM alerts, per guild: {"<user_id>": [regions]}, where [] means every region.
+        self.alert_subscriptions: Union[DataManager, ShardedDataManager]
+        if shard_count:
+            self.active_requests = ShardedDataManager("active_requests.json", **sharding, **options)
+            self.alert_subscriptions = ShardedDataManager("alert_subscriptions.json", **sharding, **options)
+        else:
+            self.active_requests = DataManager("active_requests.json", **options)
+            self.alert_subscriptions = DataManager("alert_subscriptions.json", **options)
+        # Guilds with a /setup retention period, {"<guild_id>": days}, so the retention job
+        # never reads the configs of the others.
+        self.retention_index: Union[DataManager, ShardedDataManager]
+        if shard_count:
+            self.retention_index = ShardedDataManager("retention.json", **sharding)
+            index_files = [shard_filename("retention.json", i, shard_count) for i in self.retention_index.shard_ids]
+        else:
+            self.retention_index = DataManager("retention.json")
+            index_files = ["retention.json"]
+        # Partitioned configs aren't all in memory, so the index is only built from them once.
+        self._rebuild_retention_index = not partitioned or not any(DataManager.has_files(os.path.join(BASE_DIR, f)) for f in index_files)
+
+        # War history is saved in the background even without a write-behind window, so
+        # concluding a war never waits on the write. close() flushes it.
+        war_options = {**options, "write_behind": 0 if write_behind is None else write_behind}
+        if compact_records:
+            # Columnar war records take a fraction of the memory of one dict per record.
+            war_options["list_factory"] = WarRecordColumns
+        if war_storage == "sqlite":
+            # A single WAL-mode database is safe to share between shard processes.
+            self.war_data = SQLiteWarStore("war_data.sqlite3")
+            self.war_data.migrate_from_json("war_data.json")
+        elif partitioned:
+            self.war_data = PartitionedWarStore("war_data", legacy_filename="war_data.json", **partitioning, **war_options)
+            self.war_data.eviction_listeners.append(self.drop_guild_indexes)
+        elif shard_count:
+            self.war_data = ShardedWarStore("war_data.json", **sharding, **war_options)
+        else:
+            self.war_data = JSONWarStore("war_data.json", **war_options)
+        # Wars past a guild's /setup retention period: compressed segments plus summary totals.
+        self.war_archive = WarArchive("war_archive", **sharding, **options)
+        # Fingerprints of the last command tree synced to Discord, per application and guild.
+        self.command_sync_cache: DataManager = DataManager("command_sync.json")
+        self.startup_timings["load"] = time.perf_counter() - load_start
+
+        self.dev_guild: Optional[discord.Object] = discord.Object(id=guild_id) if guild_id else None
+        self._war_stats: Dict[str, GuildWarStats] = {}
+        self._war_analytics: Dict[str, WarAnalytics] = {}
+        self._opponent_indexes: Dict[str, OpponentIndex] = {}
+        self._war_rollups: Dict[str, WarRollups] = {}
+        self._leaderboards: Dict[str, MemberLeaderboard] = {}
+        # Ids of each guild's recorded wars, so a second conclusion of the same war is rejected in O(1).
+        self._concluded_war_ids: Dict[str, set] = {}
+        # Rendered /wartrend PNGs per guild, keyed by chart options: (rollups version, png).
+        self._trend_charts: Dict[str, OrderedDict] = {}
+        # Started on the first /wartrend, so hosts that never chart don't pay for worker processes.
+        self._chart_pool: Optional[ProcessPoolExecutor] = None
+        self.chart_workers = chart_workers
+        self.alerts = AlertDispatcher(workers=alert_workers)
+        self.alerts.attach(http_trace)
+        # Deadlines of requests from guilds with a /setup timeout, keyed like the registry.
+        self.expiry = ExpiryScheduler(self.expire_request)
+        self.recent_requests = RecentRequestIndex(merge_window)
+        # Serializes archive and prune runs, so the background job and /warprune never interleave.
+        self._archive_lock = asyncio.Lock()
+        self._retention_task: Optional[asyncio.Task] = None
+        # Compiled /backup settings per guild; dropped by /setup, role or channel deletes and config file edits.
+        self._request_templates: Dict[str, RequestTemplate] = {}
+        self._config_watch_task: Optional[asyncio.Task] = None
+        # Command cooldown buckets. The SQLite store survives restarts and is shared by shard processes.
+        self.cooldowns: CooldownStore = SQLiteCooldownStore("cooldowns.sqlite3") if cooldown_storage == "sqlite" else MemoryCooldownStore()
+        self._cooldown_expiry_task: Optional[asyncio.Task] = None
+
+    async def login(self, token: str) -> None:
+        self._login_start = time.perf_counter()
+        await super().login(token)
+
+    async def setup_hook(self) -> None:
+        # discord.py runs setup_hook at the end of login().
+        self.startup_timings["login"] = time.perf_counter() - self._login_start
+        if "--verify-stats" in sys.argv:
+            for guild_id in self.war_data.guild_ids():
+                self.verify_war_stats(guild_id)
+
+        self.add_view(self.BackupControlsView(bot=self))
+
+        # Deadlines are persisted in the registry, so pending expiries survive restarts.
+        requests = sorted(self.active_requests.items(), key=lambda item: item[1]["start_time_utc"])
+        for key, request in requests:
+            if request.get("expires_at"):
+                self.expiry.schedule(request["expires_at"], key)
+            if not request["is_debug"]:
+                start_time = datetime.datetime.fromisoformat(request["start_time_utc"]).timestamp()
+                self.recent_requests.add(request["guild_id"], request["opponents"], request["region"], int(key.split(':', 1)[1]), start_time)
+        self.expiry.start()
+
+        # Syncing overwrites the whole command list, so it's only needed when the tree changed.
+        sync_start = time.perf_counter()
+        force_sync = "--force-sync" in sys.argv
+        if self.dev_guild:
+            self.tree.copy_global_to(guild=self.dev_guild)
+            await self.sync_commands(guild=self.dev_guild, force=force_sync)
+        elif self.shard_ids is None or 0 in self.shard_ids:
+            # Global commands are shared by every shard; only the process running shard 0 syncs them.
+            await self.sync_commands(force=force_sync)
+        self.startup_timings["command_sync"] = time.perf_counter() - sync_start
+
+        self._loop_lag_task = self.loop.create_task(self._monitor_loop_lag())
+        self._retention_task = self.loop.create_task(self._enforce_retention())
+        self._config_watch_task = self.loop.create_task(self._watch_config())
+        self._cooldown_expiry_task = self.loop.create_task(self._expire_cooldowns())
+        self.alerts.start()
+        if self.metrics_port:
+            await self.start_metrics_server(self.metrics_port)
+
+    def command_fingerprint(self, guild: Optional[discord.abc.Snowflake] = None) -> str:
+        """Returns a stable hash of the command tree as it would be sent to Discord."""
+        payload = [command.to_dict(self.tree) for command in self.tree.get_commands(guild=guild)]
+        payload.sort(key=lambda command: (command.get("type", 1), command["name"]))
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    async def sync_commands(self, guild: Optional[discord.abc.Snowflake] = None, force: bool = False) -> bool:
+        """Syncs the command tree unless it matches the last synced fingerprint. Returns True if synced."""
+        scope = f"{self.application_id}:{guild.id if guild else 'global'}"
+        fingerprint = self.command_fingerprint(guild=guild)
+        if not force and self.command_sync_cache.get(scope) == fingerprint:
+            logger.info(f"Command tree unchanged for {scope}; skipping sync.")
+            return False
+
+        await self.tree.sync(guild=guild)
+        self.command_sync_cache.set(scope, fingerprint)
+        await self.command_sync_cache.save()
+        logger.info(f"Commands synced for {scope}{' (forced)' if force else ''}.")
+        return True
+
+    async def _monitor_loop_lag(self, interval: float = 0.5):
+        """Measures how late the event loop wakes up from a fixed sleep; anything blocking it shows up here."""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.perf_counter() - start - interval)
+            metrics.observe("event_loop_lag_seconds", lag)
+            metrics.set_gauge("event_loop_lag_last_seconds", lag)
+
+    async def start_metrics_server(self, port: int):
+        """Serves the metrics in Prometheus text format at http://127.0.0.1:<port>/metrics."""
+        async def handle_metrics(request: web.Request) -> web.Response:
+            metrics.set_gauge("gateway_latency_seconds", 0.0 if math.isnan(self.latency) else self.latency)
+            return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle_metrics)
+        self._metrics_runner = web.AppRunner(app)
+        await self._metrics_runner.setup()
+        await web.TCPSite(self._metrics_runner, "127.0.0.1", port).start()
+        logger.info(f"Metrics endpoint listening on http://127.0.0.1:{port}/metrics")
+
+    async def _watch_config(self, interval: float = 5.0):
+        """Picks up edits made to the config files outside the bot, recompiling only the guilds that changed."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                changed = self.configs.reload_changed()
+            except Exception as e:
+                logger.error(f"Could not reload the server configs: {e}", exc_info=True)
+                continue
+            retention_changed = False
+            for guild_id in changed:
+                self.invalidate_request_template(guild_id)
+                retention_changed |= self.update_retention_index(guild_id)
+            if retention_changed:
+                await self.retention_index.save()
+            if changed:
+                logger.info(f"Reloaded the config of {len(changed)} guilds edited on disk.")
+
+    async def _expire_cooldowns(self, interval: float = 600.0):
+        """Deletes cooldown buckets that have refilled, so the store only holds members still on cooldown."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                expired = self.cooldowns.expire_idle(time.time())
+            except sqlite3.Error as e:
+                logger.error(f"Could not expire idle cooldowns: {e}")
+                continue
+            if expired:
+                logger.debug(f"Expired {expired} idle cooldown buckets.")
+
+    def check_cooldown(self, interaction: discord.Interaction, command: str) -> bool:
+        """
+        Takes one use of `command` from the member's bucket, with the guild's /setup cooldown.
+        Raises CommandOnCooldown when the member has to wait, and allows the command if the
+        cooldown store can't be reached.
+        """
+        if interaction.guild_id is None:
+            return True
+        config = self.configs.get(str(interaction.guild_id)) or {}
+        per = config.get("backup_cooldown_seconds", self.DEFAULT_BACKUP_COOLDOWN)
+        if not per:
+            return True
+        try:
+            with metrics.time("cooldown_check_seconds"):
+                retry_after = self.cooldowns.consume(f"{command}:{interaction.guild_id}:{interaction.user.id}", 1 / per, 1, time.time())
+        except sqlite3.Error as e:
+            # Fail open: a busy, corrupt or unreadable cooldown database shouldn't block backup requests.
+            logger.warning(f"Cooldown check for /{command} skipped: {e}")
+            metrics.inc("cooldown_checks_total", outcome="unavailable")
+            return True
+        metrics.inc("cooldown_checks_total", outcome="limited" if retry_after else "allowed")
+        if retry_after:
+            raise discord.app_commands.CommandOnCooldown(discord.app_commands.Cooldown(1, per), retry_after)
+        return True
+
+    async def on_guild_role_delete(self, role: discord.Role):
+        template = self._request_templates.get(str(role.guild.id))
+        if template is not None and template.backup_role_id == role.id:
+            self.invalidate_request_template(str(role.guild.id))
+
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        template = self._request_templates.get(str(channel.guild.id))
+        if template is not None and template.allowed_channel_id == channel.id:
+            self.invalidate_request_template(str(channel.guild.id))
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command: discord.app_commands.Command):
+        self._record_command_metrics(interaction, "ok")
+
+    @staticmethod
+    def _record_command_metrics(interaction: discord.Interaction, outcome: str):
+        command = interaction.command.qualified_name if interaction.command else "unknown_command"
+        metrics.inc("commands_total", command=command, outcome=outcome)
+        received_at = interaction.extras.get("received_at")
+        if received_at is not None:
+            metrics.observe("command_latency_seconds", time.perf_counter() - received_at, command=command)
+
+    async def close(self) -> None:
+        """Flushes any pending data writes before disconnecting."""
+        if self._loop_lag_task:
+            self._loop_lag_task.cancel()
+        if self._retention_task:
+            self._retention_task.cancel()
+        if self._config_watch_task:
+            self._config_watch_task.cancel()
+        if self._cooldown_expiry_task:
+            self._cooldown_expiry_task.cancel()
+        if self._metrics_runner:
+            await self._metrics_runner.cleanup()
+        await self.alerts.close()
+        await self.expiry.close()
+        if self._chart_pool:
+            self._chart_pool.shutdown(wait=False, cancel_futures=True)
+        await self.configs.flush()
+        await self.active_requests.flush()
+        await self.alert_subscriptions.flush()
+        await self.war_data.flush()
+        await self.war_archive.summaries.flush()
+        self.cooldowns.close()
+        await super().close()
+
+    async def on_app_command_error(self, interaction: discord.Interaction, error: discord.app_commands.AppCommandError):
+        """Handles errors from all slash commands globally."""
+        user = interaction.user
+        # "id" is not a known attribute of "None" by checking for guild existence first.
+        guild_name = interaction.guild.name if interaction.guild else "Direct Message"
+        guild_id = interaction.guild.id if interaction.guild else "N/A"
+        command = interaction.command.name if interaction.command else "unknown_command"
+
+        outcome = (
+            "cooldown" if isinstance(error, discord.app_commands.CommandOnCooldown)
+            else "denied" if isinstance(error, discord.app_commands.CheckFailure) else "error"
+        )
+        self._record_command_metrics(interaction, outcome)
+
+        if isinstance(error, discord.app_commands.CommandOnCooldown):
+            retry_after = int(error.retry_after)
+            await interaction.response.send_message(
+                f"⏳ **Woah There, Warrior!**\nThis command is on cooldown. Please try again in **{retry_after}** second{'s' if retry_after > 1 else ''}.",
+                ephemeral=True
+            )
+        elif isinstance(error, discord.app_commands.MissingPermissions):
+            logger.warning(f"User {user} ({user.id}) tried to use '/{command}' in guild '{guild_name}' ({guild_id}) without permissions.")
+            await interaction.response.send_message(
+                "❌ **Permission Denied**\nYou do not have the required permissions to run this command.",
+                ephemeral=True
+            )
+        elif isinstance(error, discord.app_commands.CheckFailure):
+            logger.warning(f"Check failed for user {user} ({user.id}) on command '/{command}' in guild '{guild_name}' ({guild_id}).")
+            await interaction.response.send_message(
+                "🚫 **Action Not Allowed**\nYou cannot perform this action.",
+                ephemeral=True
+            )
+        else:
+            # For any other errors, log the full traceback and inform the user.
+            logger.error(f"Unhandled error in command '/{command}' triggered by {user} ({user.id}) in guild '{guild_name}' ({guild_id}):", exc_info=error)
+            
+            # Use followup if the interaction has already been responded to.
+            response_method = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
+            await response_method(
+                "🐛 **An Unexpected Error Occurred**\nI've encountered a problem while processing your command. My developer has been notified.",
+                ephemeral=True
+            )
+            
+    # --- DM Alerts ---
+    def alert_recipients(self, guild: discord.Guild, backup_role: discord.Role, region: str, exclude_id: int) -> List[discord.Member]:
+        """Returns the opted-in members who still have the backup role and want alerts for `region`."""
+        recipients = []
+        for user_id, regions in (self.alert_subscriptions.get(str(guild.id)) or {}).items():
+            member = guild.get_member(int(user_id))
+            if member is None or member.id == exclude_id or member.get_role(backup_role.id) is None:
+                continue
+            if not regions or region in regions:
+                recipients.append(member)
+        return recipients
+
+    def send_backup_alerts(self, interaction: discord.Interaction, recipients: List[discord.Member], embed: discord.Embed, jump_url: str):
+        """
+        Hands the DM alerts for a new backup request to the dispatcher without waiting for them.
+        The requester gets an ephemeral summary of delivered and failed DMs once all are done.
+        """
+        guild = interaction.guild
+        assert guild is not None
+
+        async def report(delivered: int, failed: int):
+            logger.info(f"Backup alert DMs for {jump_url} in guild '{guild.name}': {delivered} delivered, {failed} failed.")
+            try:
+                await interaction.followup.send(f"📨 **DM alerts:** {delivered} delivered, {failed} failed.", ephemeral=True)
+            except discord.HTTPException as e:
+                logger.warning(f"Could not report DM alert results to {interaction.user}: {e}")
+
+        alert = embed.copy()
+        alert.title = f"⚔️ Backup Request in {guild.name}! ⚔️"
+        alert.add_field(name="📍 Request", value=f"[Jump to the request]({jump_url})", inline=False)
+        alert.set_footer(text=f"You opted in with /notify in {guild.name}. Use /notify there to stop these alerts.")
+        self.alerts.dispatch(cast(List[Union[discord.Member, discord.User]], recipients), None, alert, report)
+
+    # --- War Records ---
+    def drop_guild_indexes(self, guild_id: str):
+        """Forgets a guild's derived war indexes; they're rebuilt from storage on next use."""
+        self._war_stats.pop(guild_id, None)
+        self._war_analytics.pop(guild_id, None)
+        self._opponent_indexes.pop(guild_id, None)
+        self._war_rollups.pop(guild_id, None)
+        self._trend_charts.pop(guild_id, None)
+        self._concluded_war_ids.pop(guild_id, None)
+        self._leaderboards.pop(guild_id, None)
+
+    async def load_guild(self, guild_id: str):
+        """Reads a guild's partitions off the event loop (DATA_PARTITIONED) before handlers access them."""
+        for store in (self.configs, self.war_data):
+            if isinstance(store, PartitionedDataManager):
+                await store.load(guild_id)
+
+    def guild_war_stats(self, guild_id: str) -> GuildWarStats:
+        """Returns a guild's running war aggregates, building them from storage on first access."""
+        stats = self._war_stats.get(guild_id)
+        if stats is None:
+            stats = self._war_stats[guild_id] = GuildWarStats.from_store(self.war_data, guild_id)
+            archived = self.war_archive.summary(guild_id)
+            if archived:
+                stats.add_summary(archived)
+        return stats
+
+    def guild_war_analytics(self, guild_id: str) -> WarAnalytics:
+        """Returns a guild's columnar war history, loading it from storage on first use. Requires numpy."""
+        analytics = self._war_analytics.get(guild_id)
+        if analytics is None:
+            analytics = self._war_analytics[guild_id] = WarAnalytics.from_records(self.war_data.iter_wars(guild_id))
+        return analytics
+
+    def guild_opponent_index(self, guild_id: str) -> OpponentIndex:
+        """Returns a guild's opponent index, building it from storage on first use."""
+        index = self._opponent_indexes.get(guild_id)
+        if index is None:
+            index = self._opponent_indexes[guild_id] = OpponentIndex.from_records(self.war_data.iter_wars(guild_id))
+            for key, request in self.active_requests.items():
+                if request["guild_id"] == guild_id and not request["is_debug"]:
+                    index.set_active(int(key.split(':', 1)[1]), request["opponents"])
+        return index
+
+    def guild_leaderboard(self, guild_id: str) -> MemberLeaderboard:
+        """Returns a guild's member rankings, building them from storage on first use."""
+        board = self._leaderboards.get(guild_id)
+        if board is None:
+            archived = self.war_archive.summary(guild_id)
+            board = self._leaderboards[guild_id] = MemberLeaderboard.from_records(
+                self.war_data.iter_wars(guild_id), archived["members"] if archived else None
+            )
+        return board
+
+    def guild_concluded_war_ids(self, guild_id: str) -> set:
+        """Returns the ids of a guild's recorded wars, loading them from storage on first use."""
+        war_ids = self._concluded_war_ids.get(guild_id)
+        if war_ids is None:
+            war_ids = self._concluded_war_ids[guild_id] = self.war_data.concluded_war_ids(guild_id)
+        return war_ids
+
+    def guild_war_rollups(self, guild_id: str) -> WarRollups:
+        """Returns a guild's daily war totals, building them from storage on first use."""
+        rollups = self._war_rollups.get(guild_id)
+        if rollups is None:
+            rollups = self._war_rollups[guild_id] = WarRollups.from_records(self.war_data.iter_wars(guild_id))
+            archived = self.war_archive.summary(guild_id)
+            if archived:
+                rollups.add_days(archived["days"])
+        return rollups
+
+    async def render_war_trend(self, guild_id: str, period: str, since: Optional[datetime.date]) -> Optional[bytes]:
+        """
+        Returns a guild's /wartrend chart as PNG bytes, or None if it has no wars in range.
+        Charts are drawn in the chart worker processes and reused until the guild's next war.
+        """
+        rollups = self.guild_war_rollups(guild_id)
+        charts = self._trend_charts.setdefault(guild_id, OrderedDict())
+        key = (period, since)
+        cached = charts.get(key)
+        if cached and cached[0] == rollups.version:
+            charts.move_to_end(key)
+            metrics.inc("wartrend_charts_total", cache="hit")
+            return cached[1]
+
+        series = rollups.series(period, since)
+        if not series:
+            return None
+        version = rollups.version
+        if self._chart_pool is None:
+            self._chart_pool = trendchart.start_pool(self.chart_workers)
+        try:
+            with metrics.time("wartrend_render_seconds"):
+                png = await asyncio.get_running_loop().run_in_executor(self._chart_pool, trendchart.render_trend_chart, period, series)
+        except BrokenProcessPool:
+            self._chart_pool = None  # A worker died; start a fresh pool on the next request.
+            raise
+        metrics.inc("wartrend_charts_total", cache="miss")
+
+        charts[key] = (version, png)
+        charts.move_to_end(key)
+        while len(charts) > self.TREND_CHARTS_PER_GUILD:
+            charts.popitem(last=False)
+        return png
+
+    def request_template(self, guild: discord.Guild) -> Optional[RequestTemplate]:
+        """Returns a guild's compiled /backup settings, compiling them on first use. None if it isn't configured."""
+        guild_id = str(guild.id)
+        template = self._request_templates.get(guild_id)
+        if template is not None:
+            metrics.inc("request_templates_total", cache="hit")
+            return template
+        config = self.configs.get(guild_id)
+        if not config:
+            return None
+        metrics.inc("request_templates_total", cache="miss")
+        template = RequestTemplate(config, guild)
+        if template.backup_role is not None:  # A missing role is looked up again on the next request.
+            self._request_templates[guild_id] = template
+        return template
+
+    def invalidate_request_template(self, guild_id: str):
+        """Drops a guild's compiled /backup settings; they're recompiled from its config on next use."""
+        self._request_templates.pop(guild_id, None)
+
+    async def rebuild_retention_index(self):
+        """Fills the retention index from every guild's config, reading partitioned configs off the event loop."""
+        if isinstance(self.configs, PartitionedDataManager):
+            for guild_id in self.configs.guild_ids():
+                await self.configs.load(guild_id)
+                self.update_retention_index(guild_id)
+        else:
+            for guild_id, _ in list(self.configs.items()):
+                self.update_retention_index(guild_id)
+        await self.retention_index.save()
+        self._rebuild_retention_index = False
+
+    def update_retention_index(self, guild_id: str) -> bool:
+        """Mirrors a guild's retention_days setting into the retention index. Returns whether the index changed."""
+        retention_days = (self.configs.get(guild_id) or {}).get("retention_days") or None
+        if retention_days == self.retention_index.get(guild_id):
+            return False
+        if retention_days:
+            self.retention_index.set(guild_id, retention_days)
+        else:
+            self.retention_index.delete(guild_id)
+        return True
+
+    def get_active_request(self, guild_id: str, message_id: int) -> Optional[dict]:
+        """Returns the registry entry for an ongoing backup request, if it has one."""
+        return self.active_requests.get(f"{guild_id}:{message_id}")
+
+    async def set_active_request(self, guild_id: str, message_id: int, request: dict):
+        """Adds or updates an ongoing backup request in the registry."""
+        self.active_requests.set(f"{guild_id}:{message_id}", request)
+        await self.active_requests.save()
+
+    async def remove_active_request(self, guild_id: str, message_id: int):
+        """Drops a concluded backup request from the registry."""
+        self.active_requests.delete(f"{guild_id}:{message_id}")
+        await self.active_requests.save()
+
+    def find_mergeable_request(self, guild_id: str, opponents: str, region: str, now: float) -> Optional[int]:
+        """Returns the id of an active request against the same opponents and region started within the merge window."""
+        message_id = self.recent_requests.find(guild_id, opponents, region, now)
+        if message_id is None:
+            return None
+        request = self.get_active_request(guild_id, message_id)
+        # The request may have concluded, or had its opponents edited, since it was indexed.
+        if request is None or RecentRequestIndex.key(guild_id, request["opponents"], region) != RecentRequestIndex.key(guild_id, opponents, region):
+            return None
+        return message_id
+
+    async def conclude_request(
+        self, guild_id: str, message_id: int, request: dict, status: str,
+        end_time: datetime.datetime, concluded_by_id: Optional[int]
+    ) -> bool:
+        """
+        Drops a backup request from the registry and, unless it's a debug request, records its
+        outcome. Shared by the result buttons and the expiry scheduler. Returns False without
+        changing anything if the war was already recorded, e.g. when two people click a result
+        at once or Discord re-delivers an interaction.
+        """
+        if not request["is_debug"]:
+            concluded = self.guild_concluded_war_ids(guild_id)
+            if message_id in concluded:
+                metrics.inc("duplicate_conclusions_total")
+                logger.warning(f"Ignored a duplicate conclusion of war {message_id} in guild {guild_id}.")
+                return False
+            # Claimed before the first await, so a concurrent conclusion sees it.
+            concluded.add(message_id)
+
+        try:
+            await self.remove_active_request(guild_id, message_id)
+            if request["is_debug"]:
+                return True
+
+            start_time = datetime.datetime.fromisoformat(request["start_time_utc"])
+            opponents_str = request["opponents"]
+            war_record = {
+                "war_id": message_id, "initiator_id": request["author_id"],
+                "initiator_roblox_user": request["roblox_user"], "opponents": opponents_str,
+                "num_opponents": len([opp.strip() for opp in opponents_str.split(',') if opp.strip()]),
+                "region": request["region"],
+                "start_time_utc": start_time.isoformat(), "end_time_utc": end_time.isoformat(),
+                "duration_seconds": (end_time - start_time).total_seconds(), "status": status,
+                "concluded_by_id": concluded_by_id
+            }
+            await self.record_war(guild_id, war_record)
+            logger.info(f"War record {message_id} saved for guild {guild_id}.")
+            return True
+        except BaseException:
+            # E.g. a locked war database: release the claim and put the request back, so a retry can conclude it.
+            if not request["is_debug"]:
+                concluded.discard(message_id)
+            if self.get_active_request(guild_id, message_id) is None:
+                self.active_requests.set(f"{guild_id}:{message_id}", request)
+            raise
+
+    async def expire_request(self, key: str, deadline: float):
+        """Concludes a request as "Expired" once its /setup timeout passes without a result."""
+        guild_id, message_id = key.split(':', 1)
+        request = self.get_active_request(guild_id, int(message_id))
+        if request is None or request.get("expires_at") != deadline:
+            return  # Concluded in the meantime.
+        await self.load_guild(guild_id)
+
+        if not await self.conclude_request(guild_id, int(message_id), request, "Expired", discord.utils.utcnow(), concluded_by_id=None):
+            return
+        metrics.inc("requests_expired_total")
+
+        try:
+            channel = self.get_channel(request["channel_id"]) or await self.fetch_channel(request["channel_id"])
+            message = await cast(discord.TextChannel, channel).fetch_message(int(message_id))
+        except discord.HTTPException as e:
+            logger.warning(f"Expired request {message_id} in guild {guild_id}, but couldn't fetch its message: {e}")
+            return
+        if not message.embeds:
+            return
+        view = self.BackupControlsView(bot=self)
+        embed = view.mark_concluded(
+            message.embeds[0], discord.Color.dark_grey(), "⌛ Backup Request Expired ⌛",
+            "Expired automatically: no result was reported in time."
+        )
+        try:
+            await message.edit(content="*This backup request has expired.*", embed=embed, view=view)
+        except discord.HTTPException as e:
+            logger.warning(f"Could not edit expired request {message_id} in guild {guild_id}: {e}")
+            return
+        logger.info(f"Backup request {message_id} expired in guild {guild_id}.")
+
+    async def record_war(self, guild_id: str, war_record: dict):
+        """Stores a concluded war and folds it into the guild's aggregates."""
+        stats = self.guild_war_stats(guild_id)  # Build from storage before the new record lands.
+        self.war_data.append(guild_id, war_record)
+        stats.add(war_record)
+        if guild_id in self._war_analytics:
+            self._war_analytics[guild_id].add(war_record)
+        if guild_id in self._opponent_indexes:
+            self._opponent_indexes[guild_id].add_war(war_record)
+        if guild_id in self._war_rollups:
+            self._war_rollups[guild_id].add(war_record)
+        if guild_id in self._concluded_war_ids:
+            self._concluded_war_ids[guild_id].add(war_record["war_id"])
+        if guild_id in self._leaderboards:
+            self._leaderboards[guild_id].add_war(war_record)
+        await self.war_data.save()
+
+    async def clear_war_history(self, guild_id: str) -> int:
+        """Deletes a guild's war history, archive included, and resets its aggregates. Returns the number of records removed."""
+        async with self._archive_lock:
+            war_count = self.war_data.clear_wars(guild_id)
+            archived = self.war_archive.clear(guild_id)
+            self._war_stats[guild_id] = GuildWarStats()
+            self._war_analytics.pop(guild_id, None)
+            self._war_rollups.pop(guild_id, None)
+            self._trend_charts.pop(guild_id, None)
+            self._concluded_war_ids.pop(guild_id, None)
+            self._leaderboards.pop(guild_id, None)
+            if guild_id in self._opponent_indexes:
+                self._opponent_indexes[guild_id].clear_history()
+            if war_count:
+                await self.war_data.save()
+            if archived:
+                await self.war_archive.summaries.save()
+        return war_count + archived
+
+    def _drop_history_indexes(self, guild_id: str):
+        """
+        Drops the indexes derived from a guild's live history after records leave it. The
+        concluded war ids are kept: they hold claims of conclusions in flight, and a removed
+        war must still never be recorded twice.
+        """
+        war_ids = self._concluded_war_ids.get(guild_id)
+        self.drop_guild_indexes(guild_id)
+        if war_ids is not None:
+            self._concluded_war_ids[guild_id] = war_ids
+
+    async def select_wars(self, guild_id: str, start: Optional[datetime.datetime], end: datetime.datetime) -> List[dict]:
+        """Returns a guild's live war records that ended in [start, end), scanning them in a worker thread."""
+        return await asyncio.get_running_loop().run_in_executor(
+            None, WarArchive.select, self.war_data.iter_wars(guild_id), start, end
+        )
+
+    async def archive_wars(self, guild_id: str, start: Optional[datetime.datetime], end: datetime.datetime) -> int:
+        """
+        Moves a guild's wars that ended in [start, end) into a new archive segment and its
+        summary, so lifetime totals are unchanged. Returns the number of records archived.
+        The segment is written first and the summary saved last, so a crash in between
+        leaves a segment that WarArchive.recover() resolves on the next run.
+        """
+        async with self._archive_lock:
+            await self.load_guild(guild_id)
+            loop = asyncio.get_running_loop()
+            recovered = await loop.run_in_executor(
+                None, self.war_archive.recover, guild_id, self.war_archive.summary(guild_id), self.war_data.iter_wars(guild_id)
             )
-            
+            if recovered is not None:
+                self.war_archive.summaries.set(guild_id, recovered)
+                await self.war_archive.summaries.save()
+            records = await self.select_wars(guild_id, start, end)
+            if not records:
+                return 0
+            with metrics.time("war_archive_seconds"):
+                name = await loop.run_in_executor(None, self.war_archive.write_segment, guild_id, records)
+                summary = await loop.run_in_executor(None, WarArchive.fold, self.war_archive.summary(guild_id), name, records)
+                self.war_data.remove_wars(guild_id, records)
+                self.war_archive.summaries.set(guild_id, summary)
+                self._drop_history_indexes(guild_id)
+                await self.war_data.save()
+                await self.war_data.flush()
+                await self.war_archive.summaries.save()
+                await self.war_archive.summaries.flush()
+            metrics.inc("wars_archived_total", len(records))
+            logger.info(f"Archived {len(records)} war records of guild {guild_id} into segment {name}.")
+            return len(records)
+
+    async def prune_wars(self, guild_id: str, start: Optional[datetime.datetime], end: datetime.datetime) -> int:
+        """Permanently deletes a guild's live wars that ended in [start, end), dropping them from its totals. Returns the number deleted."""
+        async with self._archive_lock:
+            await self.load_guild(guild_id)
+            records = await self.select_wars(guild_id, start, end)
+            if not records:
+                return 0
+            removed = self.war_data.remove_wars(guild_id, records)
+            self._drop_history_indexes(guild_id)
+            await self.war_data.save()
+            metrics.inc("wars_pruned_total", removed)
+            logger.warning(f"Pruned {removed} war records of guild {guild_id}.")
+            return removed
+
+    async def _enforce_retention(self, interval: float = 6 * 3600):
+        """
+        Archives wars older than each guild's /setup retention period, then checks again every
+        `interval` seconds. Only the guilds in the retention index are visited.
+        """
+        if self._rebuild_retention_index:
+            await self.rebuild_retention_index()
+        while True:
+            for guild_id, retention_days in list(self.retention_index.items()):
+                cutoff = discord.utils.utcnow() - datetime.timedelta(days=retention_days)
+                try:
+                    await self.archive_wars(guild_id, None, cutoff)
+                except Exception as e:
+                    logger.error(f"Retention run failed for guild {guild_id}: {e}", exc_info=True)
+            await asyncio.sleep(interval)
+
+    def verify_war_stats(self, guild_id: str) -> bool:
+        """
+        Compares a guild's running aggregates against a full recompute from storage.
+        On a mismatch the recomputed values replace the running ones.
+        """
+        expected = GuildWarStats.from_records(self.war_data.iter_wars(guild_id))
+        archived = self.war_archive.summary(guild_id)
+        if archived:
+            expected.add_summary(archived)
+        if self.guild_war_stats(guild_id).matches(expected):
+            return True
+        logger.error(f"War stats for guild {guild_id} drifted from the stored history; rebuilding them.")
+        self._war_stats[guild_id] = expected
+        return False
+
     # --- Utility Functions ---
     @staticmethod
     def is_author_or_admin(interaction: discord.Interaction, author_id: int) -> bool:
@@ -178,16 +3661,36 @@ class BackupBot(discord.Client):
                     break
             
             await interaction.response.edit_message(embed=original_embed)
+
+            if interaction.guild:
+                bot_instance = cast(BackupBot, interaction.client)
+                guild_id = str(interaction.guild.id)
+                request = bot_instance.get_active_request(guild_id, interaction.message.id)
+                if request:
+                    request["opponents"] = new_opps
+                    await bot_instance.set_active_request(guild_id, interaction.message.id, request)
+                if "DEBUG MODE" not in interaction.message.content:
+                    bot_instance.guild_opponent_index(guild_id).set_active(interaction.message.id, new_opps)
             guild_name = interaction.guild.name if interaction.guild else "DM"
             guild_id = interaction.guild.id if interaction.guild else "N/A"
             logger.info(f"Opponents list edited by {interaction.user} in guild '{guild_name}' ({guild_id})")
 
-    class ConfirmResetView(View):
-        def __init__(self, *, bot: 'BackupBot', author: Union[discord.User, discord.Member]):
+    class ConfirmView(View):
+        """
+        Asks the admin who ran a destructive command to confirm it. On confirmation the buttons
+        are disabled, `progress` is shown while `action` runs, and the message `action` returns
+        replaces it.
+        """
+        def __init__(
+            self, *, author: Union[discord.User, discord.Member], label: str, progress: str,
+            action: Callable[[discord.Guild], Awaitable[str]]
+        ):
             super().__init__(timeout=60.0)
-            self.bot = bot
             self.author = author
+            self.progress = progress
+            self.action = action
             self.confirmed = False
+            self.confirm.label = label
 
         async def interaction_check(self, interaction: discord.Interaction) -> bool:
             if interaction.user.id != self.author.id:
@@ -195,34 +3698,99 @@ class BackupBot(discord.Client):
                 return False
             return True
 
-        @discord.ui.button(label="Confirm Reset", style=discord.ButtonStyle.danger)
+        @discord.ui.button(label="Confirm", style=discord.ButtonStyle.danger)
         async def confirm(self, interaction: discord.Interaction, button: Button):
             if not interaction.guild:
                 await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
                 return
 
-            guild_id = str(interaction.guild.id)
-            war_count = 0
-            guild_war_data = self.bot.war_data.get(guild_id)
-
-            if guild_war_data:
-                war_count = len(guild_war_data)
-                self.bot.war_data.set(guild_id, [])
-                await self.bot.war_data.save()
-            
-            logger.warning(f"War data for guild '{interaction.guild.name}' ({guild_id}) was reset by admin {self.author}.")
-
             for item in self.children:
                 if isinstance(item, (Button, discord.ui.Select)):
                     item.disabled = True
-            
-            await interaction.response.edit_message(
-                content=f"✅ **Success!** All **{war_count}** war records have been deleted for this server.", 
-                view=self
-            )
+            await interaction.response.edit_message(content=self.progress, view=self)
             self.confirmed = True
             self.stop()
 
+            content = await self.action(interaction.guild)
+            await interaction.edit_original_response(content=content, view=self)
+
+    class LeaderboardView(View):
+        """Previous/Next paging for a /leaderboard message. Each page is read from the ranking by cursor."""
+        PAGE_SIZE = 10
+
+        def __init__(self, *, bot: 'BackupBot', guild: discord.Guild, category: str, author: Union[discord.User, discord.Member]):
+            super().__init__(timeout=300.0)
+            self.bot = bot
+            self.guild = guild
+            self.category = category
+            self.author = author
+            self.start = 0
+            self.keys: List[tuple] = []
+            self.interaction: Optional[discord.Interaction] = None  # The /leaderboard call, to disable the buttons on timeout.
+
+        async def on_timeout(self):
+            if self.interaction is None:
+                return
+            for item in self.children:
+                if isinstance(item, Button):
+                    item.disabled = True
+            try:
+                await self.interaction.edit_original_response(view=self)
+            except discord.HTTPException:
+                pass  # The message may have been deleted.
+
+        def load(self, after: Optional[tuple] = None, before: Optional[tuple] = None):
+            """Reads the page after or before a cursor and updates the buttons."""
+            board = self.bot.guild_leaderboard(str(self.guild.id))
+            self.start, self.keys = board.page(self.category, self.PAGE_SIZE, after=after, before=before)
+            if not self.keys and self.start:
+                self.start, self.keys = board.page(self.category, self.PAGE_SIZE, before=(float('inf'),))  # Past the end: show the last page.
+            self.previous.disabled = self.start == 0
+            self.next.disabled = self.start + len(self.keys) >= len(board.rankings[self.category])
+
+        def describe(self, counts: Dict[str, int]) -> str:
+            record = f"{counts['wins']}W / {counts['losses']}L / {counts['truces']}T"
+            if self.category == "requests":
+                return f"**{counts['requests']}** requests · {record}"
+            if self.category == "wins":
+                return f"**{counts['wins']}** wins from {counts['requests']} requests"
+            if self.category == "win_rate":
+                return f"**{counts['wins'] / (counts['wins'] + counts['losses']) * 100:.1f}%** · {record}"
+            return f"**{counts['conclusions']}** wars concluded"
+
+        def embed(self) -> discord.Embed:
+            board = self.bot.guild_leaderboard(str(self.guild.id))
+            title = MemberLeaderboard.CATEGORIES[self.category]
+            lines = [
+                f"`#{self.start + offset + 1}` <@{key[-1]}> — {self.describe(board.members[key[-1]])}"
+                for offset, key in enumerate(self.keys)
+            ]
+            embed = discord.Embed(title=f"🏆 {title} in {self.guild.name}", description="\n".join(lines), color=discord.Color.gold())
+            ranked = len(board.rankings[self.category])
+            footer = f"Ranks {self.start + 1}-{self.start + len(self.keys)} of {ranked}"
+            if self.category == "win_rate":
+                footer += f" · Members need {MemberLeaderboard.MIN_DECIDED} wins + losses to be ranked"
+            embed.set_footer(text=footer)
+            return embed
+
+        async def interaction_check(self, interaction: discord.Interaction) -> bool:
+            if interaction.user.id != self.author.id:
+                await interaction.response.send_message("Run `/leaderboard` yourself to page through it.", ephemeral=True)
+                return False
+            return True
+
+        @discord.ui.button(label="◀ Previous", style=discord.ButtonStyle.secondary)
+        async def previous(self, interaction: discord.Interaction, button: Button):
+            with metrics.time("button_latency_seconds", button="leaderboard_page"):
+                self.load(before=self.keys[0] if self.keys else None)
+                await interaction.response.edit_message(embed=self.embed(), view=self)
+
+        @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+        async def next(self, interaction: discord.Interaction, button: Button):
+            with metrics.time("button_latency_seconds", button="leaderboard_page"):
+                self.load(after=self.keys[-1] if self.keys else None)
+                await interaction.response.edit_message(embed=self.embed(), view=self)
+
     class BackupControlsView(View):
         def __init__(self, *, bot: 'BackupBot'):
             super().__init__(timeout=None)
@@ -235,10 +3803,41 @@ class BackupBot(discord.Client):
                 return int(match.group(1)) if match else 0
             return 0
 
+        @classmethod
+        def parse_request_embed(cls, message: discord.Message) -> dict:
+            """Recovers a request's details from its embed. Fallback for messages missing from the registry."""
+            embed = message.embeds[0]
+            request = {
+                "author_id": cls.get_author_id_from_embed(embed), "roblox_user": "Unknown",
+                "opponents": "Unknown", "region": "Unknown",
+                "start_time_utc": message.created_at.isoformat(), "is_debug": "DEBUG MODE" in message.content
+            }
+            for field in embed.fields:
+                if field.name == "🛡️ User in Need":
+                    # Ensure field.value is a str (fallback to empty string) so re.search accepts it
+                    field_text = field.value if field.value is not None else ""
+                    match = re.search(r"\*\*Roblox:\*\* `(.+?)`", field_text)
+                    if match:
+                        request["roblox_user"] = match.group(1)
+                elif field.name == "💀 Opponents":
+                    request["opponents"] = (field.value if field.value is not None else "").strip('`')
+                elif field.name == "🌍 Region":
+                    request["region"] = (field.value if field.value is not None else "").strip('`')
+            return request
+
+        def get_request(self, interaction: discord.Interaction) -> dict:
+            """Looks up a request in the registry, parsing the embed only for legacy messages."""
+            assert interaction.message is not None
+            request = self.bot.get_active_request(str(interaction.guild_id), interaction.message.id)
+            return request or self.parse_request_embed(interaction.message)
+
         async def interaction_check(self, interaction: discord.Interaction) -> bool:
             assert interaction.message is not None, "Interaction from a view must have a message"
             
-            author_id = self.get_author_id_from_embed(interaction.message.embeds[0])
+            # Persistent buttons bypass the command tree, which loads the guild for commands.
+            if interaction.guild_id:
+                await self.bot.load_guild(str(interaction.guild_id))
+            author_id = self.get_request(interaction)["author_id"]
             if not self.bot.is_author_or_admin(interaction, author_id):
                 await interaction.response.send_message(
                     "Only the person who started the request or an admin can use these controls.",
@@ -250,13 +3849,20 @@ class BackupBot(discord.Client):
         @discord.ui.button(label="Edit Opps", style=discord.ButtonStyle.secondary, custom_id="backup_view:edit_opps")
         async def edit_opps(self, interaction: discord.Interaction, button: Button):
             assert interaction.message is not None
-            current_opps = ""
-            for field in interaction.message.embeds[0].fields:
-                if field.name == "💀 Opponents":
-                    # field.value can be None; ensure we operate on a string
-                    current_opps = (field.value or "").strip('`')
-                    break
-            await interaction.response.send_modal(self.bot.EditOppsModal(current_opps=current_opps))
+            with metrics.time("button_latency_seconds", button="edit_opps"):
+                current_opps = self.get_request(interaction)["opponents"]
+                await interaction.response.send_modal(self.bot.EditOppsModal(current_opps=current_opps))
+
+        def mark_concluded(self, embed: discord.Embed, color: discord.Color, title: str, status_text: str) -> discord.Embed:
+            """Restyles a request's embed as concluded and disables this view's buttons."""
+            embed.title = title
+            embed.color = color
+            embed.description = "This engagement has concluded."
+            embed.add_field(name="Status", value=status_text, inline=False)
+            for item in self.children:
+                if isinstance(item, (Button, discord.ui.Select)):
+                    item.disabled = True
+            return embed
 
         async def end_war(self, interaction: discord.Interaction, status: str, color: discord.Color, title: str):
             if not interaction.guild:
@@ -265,365 +3871,842 @@ class BackupBot(discord.Client):
             assert interaction.message is not None
 
             guild_id = str(interaction.guild.id)
-            original_embed = interaction.message.embeds[0]
-            
-            # Check if this is a debug war. If so, do not record stats.
-            if "DEBUG MODE" not in interaction.message.content:
-                start_time = interaction.message.created_at
-                end_time = interaction.created_at
-                duration = end_time - start_time
-                initiator_id = self.get_author_id_from_embed(original_embed)
-                
-                roblox_user, opponents_str, region = "Unknown", "Unknown", "Unknown"
-                for field in original_embed.fields:
-                    if field.name == "🛡️ User in Need":
-                        # Ensure field.value is a str (fallback to empty string) so re.search accepts it
-                        field_text = field.value if field.value is not None else ""
-                        match = re.search(r"\*\*Roblox:\*\* `(.+?)`", field_text)
-                        if match:
-                            roblox_user = match.group(1)
-                    elif field.name == "💀 Opponents":
-                        opponents_str = (field.value if field.value is not None else "").strip('`')
-                    elif field.name == "🌍 Region":
-                        region = (field.value if field.value is not None else "").strip('`')
-                
-                num_opponents = len([opp.strip() for opp in opponents_str.split(',') if opp.strip()])
-
-                war_record = {
-                    "war_id": interaction.message.id, "initiator_id": initiator_id,
-                    "initiator_roblox_user": roblox_user, "opponents": opponents_str,
-                    "num_opponents": num_opponents, "region": region,
-                    "start_time_utc": start_time.isoformat(), "end_time_utc": end_time.isoformat(),
-                    "duration_seconds": duration.total_seconds(), "status": status,
-                    "concluded_by_id": interaction.user.id
-                }
-                
-                guild_war_data = self.bot.war_data.get(guild_id, [])
-                if guild_war_data is not None:
-                    guild_war_data.append(war_record)
-                    self.bot.war_data.set(guild_id, guild_war_data)
-                    await self.bot.war_data.save()
-                
-                logger.info(f"War record {interaction.message.id} saved for guild '{interaction.guild.name}' ({guild_id}).")
-
-            original_embed.title = title
-            original_embed.color = color
-            original_embed.description = "This engagement has concluded."
-            original_embed.add_field(name="Status", value=f"Concluded as a **{status}** by {interaction.user.mention}", inline=False)
-
-            for item in self.children:
-                if isinstance(item, (Button, discord.ui.Select)):
-                    item.disabled = True
+            request = self.get_request(interaction)
+            # Debug requests are dropped from the registry without recording stats.
+            if not await self.bot.conclude_request(guild_id, interaction.message.id, request, status, interaction.created_at, interaction.user.id):
+                await interaction.response.send_message("This backup request has already concluded.", ephemeral=True)
+                return
 
+            original_embed = self.mark_concluded(
+                interaction.message.embeds[0], color, title, f"Concluded as a **{status}** by {interaction.user.mention}"
+            )
             await interaction.response.edit_message(content=f"*This backup request has concluded.*", embed=original_embed, view=self)
             logger.info(f"Backup request concluded as '{status}' by {interaction.user} in guild '{interaction.guild.name}' ({interaction.guild.id})")
 
         @discord.ui.button(label="Win", style=discord.ButtonStyle.success, custom_id="backup_view:win")
         async def win(self, interaction: discord.Interaction, button: Button):
-            await self.end_war(interaction, "Win", discord.Color.green(), "✔️ Backup Concluded (VICTORY!) ✔️")
+            with metrics.time("button_latency_seconds", button="win"):
+                await self.end_war(interaction, "Win", discord.Color.green(), "✔️ Backup Concluded (VICTORY!) ✔️")
 
         @discord.ui.button(label="Lose", style=discord.ButtonStyle.danger, custom_id="backup_view:lose")
         async def lose(self, interaction: discord.Interaction, button: Button):
-            await self.end_war(interaction, "Loss", discord.Color.red(), "❌ Backup Concluded (DEFEAT) ❌")
+            with metrics.time("button_latency_seconds", button="lose"):
+                await self.end_war(interaction, "Loss", discord.Color.red(), "❌ Backup Concluded (DEFEAT) ❌")
 
         @discord.ui.button(label="Truce", style=discord.ButtonStyle.primary, custom_id="backup_view:truce")
         async def truce(self, interaction: discord.Interaction, button: Button):
-            await self.end_war(interaction, "Truce", discord.Color.light_grey(), "🤝 Backup Concluded (TRUCE) 🤝")
+            with metrics.time("button_latency_seconds", button="truce"):
+                await self.end_war(interaction, "Truce", discord.Color.light_grey(), "🤝 Backup Concluded (TRUCE) 🤝")
 
 
 # --- Bot instance and event listeners ---
-dotenv_path = os.path.join(BASE_DIR, '.env')
-load_dotenv(dotenv_path=dotenv_path)
-
 TOKEN = os.getenv('DISCORD_TOKEN')
-DEV_GUILD_ID = 1167835890228416623
-
-intents = discord.Intents.default()
-intents.members = True
-intents.message_content = True
-
-bot = BackupBot(intents=intents, guild_id=DEV_GUILD_ID)
-
-@bot.event
-async def on_ready():
-    if bot.user:  # Check if bot.user is not None
-        logger.info(f'Logged in as {bot.user.name} (ID: {bot.user.id})')
-        logger.info('Bot is ready and listening for commands.')
-        logger.info('------')
-
-# --- Shared Command Logic ---
-async def _send_backup_request(
-    interaction: discord.Interaction, roblox_user: str, opps: str,
-    region: str, link: Optional[str], is_debug: bool
-):
-    bot_instance = cast(BackupBot, interaction.client)
-    
-    if not interaction.guild:
-        await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
-        return
-
-    guild_id = str(interaction.guild.id)
-    server_config = bot_instance.configs.get(guild_id)
-
-    if not server_config:
-        await interaction.response.send_message(
-            "**Bot Not Configured!** An administrator must run the `/setup` command first.",
-            ephemeral=True
+# "development" syncs commands to DEV_GUILD_ID only; "production" syncs them globally.
+BOT_MODE = os.getenv('BOT_MODE', 'development').strip().lower()
+DEV_GUILD_ID = int(os.getenv('DEV_GUILD_ID', '0') or 0) if BOT_MODE != 'production' else None
+# Total number of shards; when set, per-guild data files are partitioned by shard.
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', '0') or 0) or None
+# The shards this process runs (e.g. "0,1"); defaults to all of them.
+SHARD_IDS = env_int_list('SHARD_IDS')
+# Local port for the Prometheus metrics endpoint; unset disables it.
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0') or 0) or None
+# Append mutations to a journal instead of rewriting the data files on every save.
+DATA_JOURNALED = env_flag('DATA_JOURNALED')
+# Coalescing window (seconds) for background saves; unset keeps saves synchronous with each change,
+# except war history, which is always written in the background.
+_write_behind_setting = os.getenv('DATA_WRITE_BEHIND_SECONDS', '').strip()
+DATA_WRITE_BEHIND_SECONDS = float(_write_behind_setting) if _write_behind_setting else None
+# Seconds during which a /backup against the same opponents and region joins the active request instead of pinging again; 0 disables.
+BACKUP_MERGE_WINDOW_SECONDS = float(os.getenv('BACKUP_MERGE_WINDOW_SECONDS', '0') or 0)
+# Number of concurrent workers sending /notify DM alerts.
+ALERT_WORKERS = int(os.getenv('ALERT_WORKERS', '4') or 4)
+# Number of processes drawing /wartrend charts.
+CHART_WORKERS = int(os.getenv('CHART_WORKERS', '1') or 1)
+# Where command cooldowns are kept: "sqlite" (cooldowns.sqlite3, survives restarts) or "memory".
+COOLDOWN_STORAGE = os.getenv('COOLDOWN_STORAGE', 'sqlite').strip().lower()
+# Where war history is stored: "json" (war_data.json) or "sqlite" (war_data.sqlite3).
+WAR_STORAGE = os.getenv('WAR_STORAGE', 'json').strip().lower()
+# On-disk format of the data files: "json" or "binary" (lazily decoded BinarySnapshot files).
+DATA_SNAPSHOT_FORMAT = os.getenv('DATA_SNAPSHOT_FORMAT', 'json').strip().lower()
+# Hold JSON war history in compact columns instead of one dict per record.
+WAR_COMPACT_RECORDS = env_flag('WAR_COMPACT_RECORDS')
+# Keep configs and war history in one file per guild, loaded on demand.
+DATA_PARTITIONED = env_flag('DATA_PARTITIONED')
+# How many guilds' partitions stay in memory before the least recently used are evicted.
+DATA_CACHE_GUILDS = int(os.getenv('DATA_CACHE_GUILDS', '500') or 500)
+
+# Everything below builds and runs the bot, which a chart worker must skip.
+if not CHART_WORKER:
+    intents = discord.Intents.default()
+    intents.members = True
+    intents.message_content = True
+
+    bot = BackupBot(
+        intents=intents, guild_id=DEV_GUILD_ID, journaled=DATA_JOURNALED, write_behind=DATA_WRITE_BEHIND_SECONDS,
+        war_storage=WAR_STORAGE, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS, metrics_port=METRICS_PORT,
+        partitioned=DATA_PARTITIONED, cache_guilds=DATA_CACHE_GUILDS, alert_workers=ALERT_WORKERS,
+        merge_window=BACKUP_MERGE_WINDOW_SECONDS, compact_records=WAR_COMPACT_RECORDS, chart_workers=CHART_WORKERS,
+        snapshot_format=DATA_SNAPSHOT_FORMAT, cooldown_storage=COOLDOWN_STORAGE
+    )
+
+    @bot.event
+    async def on_ready():
+        if bot.user:  # Check if bot.user is not None
+            logger.info(f'Logged in as {bot.user.name} (ID: {bot.user.id})')
+            logger.info('Bot is ready and listening for commands.')
+            if "ready" not in bot.startup_timings:
+                bot.startup_timings["ready"] = time.perf_counter() - PROCESS_START
+                timings = ", ".join(f"{phase}={seconds:.3f}s" for phase, seconds in bot.startup_timings.items())
+                logger.info(f"Startup timings: {timings}")
+            logger.info('------')
+
+    # --- Shared Command Logic ---
+    async def _send_backup_request(
+        interaction: discord.Interaction, roblox_user: str, opps: str,
+        region: str, link: Optional[str], is_debug: bool
+    ):
+        bot_instance = cast(BackupBot, interaction.client)
+
+        if not interaction.guild:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+
+        guild_id = str(interaction.guild.id)
+        template = bot_instance.request_template(interaction.guild)
+
+        if template is None:
+            await interaction.response.send_message(
+                "**Bot Not Configured!** An administrator must run the `/setup` command first.",
+                ephemeral=True
+            )
+            return
+
+        allowed_channel_id = template.allowed_channel_id
+
+        if interaction.channel and interaction.channel.id != allowed_channel_id:
+            await interaction.response.send_message(
+                f"You can only use this command in the <#{allowed_channel_id}> channel.",
+                ephemeral=True
+            )
+            return
+
+        backup_role = template.backup_role
+        if not backup_role and not is_debug:
+            logger.error(f"Config error in guild '{interaction.guild.name}' ({guild_id}): Backup role ID '{template.backup_role_id}' not found.")
+            await interaction.response.send_message(
+                f"Configuration Error: The backup role was not found. An admin should re-run `/setup`.",
+                ephemeral=True
+            )
+            return
+
+        if not is_debug:
+            existing_id = bot_instance.find_mergeable_request(guild_id, opps, region, interaction.created_at.timestamp())
+            if existing_id is not None:
+                await _join_backup_request(interaction, existing_id, roblox_user)
+                return
+
+        embed = template.render(interaction.user, roblox_user, opps, region, link)
+
+        message_content = f"**DEBUG MODE:** No roles pinged." if is_debug or not backup_role else backup_role.mention
+        allowed_mentions = discord.AllowedMentions.none() if is_debug else discord.AllowedMentions(roles=True)
+
+        callback = await interaction.response.send_message(
+            content=message_content, embed=embed, allowed_mentions=allowed_mentions,
+            view=bot.BackupControlsView(bot=bot)
         )
-        return
+        if callback.message_id:
+            is_debug_request = is_debug or not backup_role
+            request_timeout = template.request_timeout
+            expires_at = interaction.created_at.timestamp() + request_timeout * 60 if request_timeout else None
+            await bot_instance.set_active_request(guild_id, callback.message_id, {
+                "guild_id": guild_id, "channel_id": interaction.channel_id, "author_id": interaction.user.id,
+                "roblox_user": roblox_user, "opponents": opps, "region": region,
+                "start_time_utc": interaction.created_at.isoformat(), "is_debug": is_debug_request,
+                "expires_at": expires_at
+            })
+            if expires_at:
+                bot_instance.expiry.schedule(expires_at, f"{guild_id}:{callback.message_id}")
+            if not is_debug_request:
+                bot_instance.guild_opponent_index(guild_id).set_active(callback.message_id, opps)
+                bot_instance.recent_requests.add(guild_id, opps, region, callback.message_id, interaction.created_at.timestamp())
+                assert backup_role is not None
+                recipients = bot_instance.alert_recipients(interaction.guild, backup_role, region, exclude_id=interaction.user.id)
+                if recipients:
+                    jump_url = f"https://discord.com/channels/{guild_id}/{interaction.channel_id}/{callback.message_id}"
+                    bot_instance.send_backup_alerts(interaction, recipients, embed, jump_url)
+        logger.info(f"Backup request started by {interaction.user} in guild '{interaction.guild.name}' (Debug: {is_debug})")
+
+        if not link:
+            await interaction.followup.send(
+                content="**Friendly Reminder:** You didn't provide a server link. Make sure your **Roblox joins are on** so people can help!",
+                ephemeral=True
+            )
+
 
-    allowed_channel_id = server_config.get('allowed_channel_id')
-    backup_role_id = server_config.get('backup_role_id')
+    async def _join_backup_request(interaction: discord.Interaction, message_id: int, roblox_user: str):
+        """Adds the user to an already active request against the same opponents instead of pinging again."""
+        bot_instance = cast(BackupBot, interaction.client)
+        assert interaction.guild is not None
+        guild_id = str(interaction.guild.id)
+        request = bot_instance.get_active_request(guild_id, message_id)
+        assert request is not None
+
+        joined = request.setdefault("joined", [])
+        added = interaction.user.id != request["author_id"] and all(j["user_id"] != interaction.user.id for j in joined)
+        listed = False
+        if added:
+            joined.append({"user_id": interaction.user.id, "roblox_user": roblox_user})
+            await bot_instance.set_active_request(guild_id, message_id, request)
+            try:
+                # The request's own channel: /setup may have moved the backup channel since.
+                channel = bot_instance.get_channel(request["channel_id"]) or await bot_instance.fetch_channel(request["channel_id"])
+                message = await cast(discord.TextChannel, channel).fetch_message(message_id)
+                embed = message.embeds[0]
+                value = "\n".join(f"<@{j['user_id']}> (`{j['roblox_user']}`)" for j in joined)[:1024]
+                for i, field in enumerate(embed.fields):
+                    if field.name == "🛡️ Also Needs Help":
+                        embed.set_field_at(i, name="🛡️ Also Needs Help", value=value, inline=False)
+                        break
+                else:
+                    embed.insert_field_at(1, name="🛡️ Also Needs Help", value=value, inline=False)
+                await message.edit(embed=embed)
+                listed = True
+            except discord.HTTPException as e:
+                logger.warning(f"Could not add {interaction.user} to request {message_id} in guild {guild_id}: {e}")
 
-    if interaction.channel and interaction.channel.id != allowed_channel_id:
+        jump_url = f"https://discord.com/channels/{guild_id}/{request['channel_id']}/{message_id}"
+        if not added:
+            outcome = "and you're already on it"
+        elif listed:
+            outcome = "so you've been added to it instead of pinging again"
+        else:
+            outcome = "so nobody was pinged again, but the request couldn't be updated to list you; mention it there"
         await interaction.response.send_message(
-            f"You can only use this command in the <#{allowed_channel_id}> channel.",
+            f"🔗 **Already Requested!** A backup request against these opponents in this region is already active, {outcome}: [Jump to the request]({jump_url})",
             ephemeral=True
         )
-        return
+        metrics.inc("backup_pings_suppressed_total")
+        logger.info(f"Backup request by {interaction.user} merged into {message_id} in guild '{interaction.guild.name}'.")
 
-    backup_role = interaction.guild.get_role(backup_role_id)
-    if not backup_role and not is_debug:
-        logger.error(f"Config error in guild '{interaction.guild.name}' ({guild_id}): Backup role ID '{backup_role_id}' not found.")
-        await interaction.response.send_message(
-            f"Configuration Error: The backup role was not found. An admin should re-run `/setup`.",
-            ephemeral=True
+
+    # --- Slash Command Definitions ---
+    @bot.tree.command(name="help", description="Shows a list of all available commands.")
+    async def help_command(interaction: discord.Interaction):
+        embed = discord.Embed(
+            title="Celestial Sentry Commands",
+            description="Here's a list of commands you can use:",
+            color=discord.Color.blurple()
         )
-        return
-        
-    custom_color_val = server_config.get("embed_color")
-    color = discord.Color(custom_color_val) if custom_color_val is not None else discord.Color.gold()
-    
-    custom_thumbnail_url = server_config.get("thumbnail_url")
-    thumbnail_url = custom_thumbnail_url or "https://i.imgur.com/P5LJ02a.png"
-
-    embed = discord.Embed(
-        title="⚔️ Backup Request! ⚔️",
-        description="A warrior requires aid! The status of this engagement is **Ongoing**.",
-        color=color
-    )
-    embed.set_thumbnail(url=thumbnail_url)
-    user_info = f"**Discord:** {interaction.user.mention}\n**Roblox:** `{roblox_user}`"
-    embed.add_field(name="🛡️ User in Need", value=user_info, inline=False)
-    embed.add_field(name="💀 Opponents", value=f"`{opps}`", inline=False)
-    embed.add_field(name="🌍 Region", value=f"`{region}`", inline=False)
-
-    if link:
-        embed.add_field(name="🔗 Join Link", value=f"[Click Here to Join]({link})", inline=False)
-    else:
-        embed.add_field(name="🔗 Join Link", value="*No link provided. Join via user's Roblox profile.*", inline=False)
 
-    embed.set_footer(text=f"Celestial Sentry | The Supreme Manager | Author ID: {interaction.user.id}")
+        admin_commands = ["setup", "debugbackup", "resetstats", "botstats", "warexport", "warprune"]
+
+        for command in bot.tree.get_commands():
+            description = getattr(command, 'description', "No description available.")
+            if command.name in admin_commands:
+                description += " `[ADMIN]`"
 
-    message_content = f"**DEBUG MODE:** No roles pinged." if is_debug or not backup_role else backup_role.mention
-    allowed_mentions = discord.AllowedMentions.none() if is_debug else discord.AllowedMentions(roles=True)
+            embed.add_field(name=f"/{command.name}", value=description, inline=False)
 
-    await interaction.response.send_message(
-        content=message_content, embed=embed, allowed_mentions=allowed_mentions,
-        view=bot.BackupControlsView(bot=bot)
+        embed.set_footer(text="Contact an administrator for help with admin-only commands.")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+    @bot.tree.command(name="setup", description="[ADMIN] Configure the bot for this server.")
+    @discord.app_commands.checks.has_permissions(administrator=True)
+    @discord.app_commands.describe(
+        backup_channel="The channel where backup requests are sent.", 
+        backup_role="The role to be pinged for backup requests.",
+        embed_color="A hex color code for embeds (e.g., #FF5733).",
+        thumbnail_url="A URL for the embed thumbnail image.",
+        request_timeout="Minutes after which a request with no result expires (0 turns expiry off).",
+        retention_days="Days of detailed war history to keep; older wars are archived into totals (0 keeps everything).",
+        backup_cooldown="Seconds each member must wait between /backup requests (default 60, 0 turns it off)."
     )
-    logger.info(f"Backup request started by {interaction.user} in guild '{interaction.guild.name}' (Debug: {is_debug})")
+    async def setup_command(
+        interaction: discord.Interaction, 
+        backup_channel: discord.TextChannel, 
+        backup_role: discord.Role,
+        embed_color: Optional[str] = None,
+        thumbnail_url: Optional[str] = None,
+        request_timeout: Optional[discord.app_commands.Range[int, 0, 10080]] = None,
+        retention_days: Optional[discord.app_commands.Range[int, 0, 3650]] = None,
+        backup_cooldown: Optional[discord.app_commands.Range[int, 0, 86400]] = None
+    ):
+        bot_instance = cast(BackupBot, interaction.client)
+        if not interaction.guild:
+            await interaction.response.send_message("This command must be used in a server.", ephemeral=True)
+            return
+
+        guild_id = str(interaction.guild.id)
+
+        # Ensure we have a mutable dict for config; fall back to an empty dict if none exists.
+        config_data = bot_instance.configs.get(guild_id) or {}
+        config_data["backup_role_id"] = backup_role.id
+        config_data["allowed_channel_id"] = backup_channel.id
+
+        embed = discord.Embed(title="✅ Configuration Updated!", description="The bot's settings have been updated.", color=discord.Color.green())
+        embed.add_field(name="Backup Channel", value=backup_channel.mention, inline=False)
+        embed.add_field(name="Backup Role", value=backup_role.mention, inline=False)
+
+        if embed_color:
+            match = re.match(r'^#?([A-Fa-f0-9]{6})$', embed_color)
+            if match:
+                color_int = int(match.group(1), 16)
+                config_data['embed_color'] = color_int
+                embed.add_field(name="Embed Color", value=f"`#{match.group(1).upper()}`", inline=True)
+            else:
+                await interaction.response.send_message("❌ **Invalid Color:** Please use a valid 6-digit hex format (e.g., `#FF5733`).", ephemeral=True)
+                return
+
+        if thumbnail_url:
+            if thumbnail_url.startswith(('http://', 'https://')):
+                config_data['thumbnail_url'] = thumbnail_url
+                embed.add_field(name="Thumbnail URL", value=f"[Link]({thumbnail_url})", inline=True)
+            else:
+                await interaction.response.send_message("❌ **Invalid URL:** Thumbnail URL must start with `http://` or `https://`.", ephemeral=True)
+                return
+
+        if request_timeout is not None:
+            config_data['request_timeout_minutes'] = request_timeout
+            embed.add_field(name="Request Timeout", value=f"`{request_timeout}` minutes" if request_timeout else "Off", inline=True)
+
+        if retention_days is not None:
+            config_data['retention_days'] = retention_days
+            embed.add_field(name="War History Retention", value=f"`{retention_days}` days" if retention_days else "Keep everything", inline=True)
+
+        if backup_cooldown is not None:
+            config_data['backup_cooldown_seconds'] = backup_cooldown
+            embed.add_field(name="Backup Cooldown", value=f"`{backup_cooldown}` seconds" if backup_cooldown else "Off", inline=True)
+
+        bot_instance.configs.set(guild_id, config_data)
+        bot_instance.invalidate_request_template(guild_id)
+        await bot_instance.configs.save()
+        if bot_instance.update_retention_index(guild_id):
+            await bot_instance.retention_index.save()
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        logger.info(f"Bot configured for guild '{interaction.guild.name}' ({guild_id}) by admin {interaction.user}.")
+
+
+    REGION_CHOICES = [
+        discord.app_commands.Choice(name="🇺🇸 US East", value="US East"), discord.app_commands.Choice(name="🇺🇸 US West", value="US West"),
+        discord.app_commands.Choice(name="🇪🇺 Europe", value="Europe"), discord.app_commands.Choice(name="🇦🇺 Australia", value="Australia"),
+        discord.app_commands.Choice(name="🇸🇬 Asia", value="Asia"), discord.app_commands.Choice(name="❓ Unknown", value="Unknown"),
+    ]
 
-    if not link:
-        await interaction.followup.send(
-            content="**Friendly Reminder:** You didn't provide a server link. Make sure your **Roblox joins are on** so people can help!",
-            ephemeral=True
-        )
 
+    def persistent_cooldown(command: str):
+        """Like app_commands.checks.cooldown, but with the guild's /setup cooldown and buckets kept in the bot's CooldownStore."""
+        def predicate(interaction: discord.Interaction) -> bool:
+            return cast(BackupBot, interaction.client).check_cooldown(interaction, command)
+        return discord.app_commands.check(predicate)
 
-# --- Slash Command Definitions ---
-@bot.tree.command(name="help", description="Shows a list of all available commands.")
-async def help_command(interaction: discord.Interaction):
-    embed = discord.Embed(
-        title="Celestial Sentry Commands",
-        description="Here's a list of commands you can use:",
-        color=discord.Color.blurple()
+
+    @bot.tree.command(name="backup", description="Request backup from your allies.")
+    @persistent_cooldown("backup")
+    @discord.app_commands.describe(roblox_user="Your Roblox username or profile link.", opps="The usernames of the players teaming on you.", link="Optional: A private server link for easy joining.")
+    @discord.app_commands.choices(region=REGION_CHOICES)
+    async def backup_command(interaction: discord.Interaction, roblox_user: str, opps: str, region: discord.app_commands.Choice[str], link: Optional[str] = None):
+        await _send_backup_request(interaction, roblox_user, opps, region.value, link, is_debug=False)
+
+
+    @bot.tree.command(name="debugbackup", description="[ADMIN] Create a backup request without pinging roles.")
+    @discord.app_commands.checks.has_permissions(administrator=True)
+    @discord.app_commands.choices(region=REGION_CHOICES)
+    async def debugbackup_command(interaction: discord.Interaction, roblox_user: str, opps: str, region: discord.app_commands.Choice[str], link: Optional[str] = None):
+        await _send_backup_request(interaction, roblox_user, opps, region.value, link, is_debug=True)
+
+
+    @bot.tree.command(name="notify", description="Turn DM alerts for this server's backup requests on or off.")
+    @discord.app_commands.describe(
+        enabled="Whether you want to be sent a DM when someone requests backup.",
+        region="Optional: Only alert me for this region. Run again to add or remove more regions."
     )
-    
-    admin_commands = ["setup", "debugbackup", "resetstats"]
-    
-    for command in bot.tree.get_commands():
-        description = getattr(command, 'description', "No description available.")
-        if command.name in admin_commands:
-            description += " `[ADMIN]`"
-        
-        embed.add_field(name=f"/{command.name}", value=description, inline=False)
-    
-    embed.set_footer(text="Contact an administrator for help with admin-only commands.")
-    await interaction.response.send_message(embed=embed, ephemeral=True)
-
-
-@bot.tree.command(name="setup", description="[ADMIN] Configure the bot for this server.")
-@discord.app_commands.checks.has_permissions(administrator=True)
-@discord.app_commands.describe(
-    backup_channel="The channel where backup requests are sent.", 
-    backup_role="The role to be pinged for backup requests.",
-    embed_color="A hex color code for embeds (e.g., #FF5733).",
-    thumbnail_url="A URL for the embed thumbnail image."
-)
-async def setup_command(
-    interaction: discord.Interaction, 
-    backup_channel: discord.TextChannel, 
-    backup_role: discord.Role,
-    embed_color: Optional[str] = None,
-    thumbnail_url: Optional[str] = None
-):
-    bot_instance = cast(BackupBot, interaction.client)
-    if not interaction.guild:
-        await interaction.response.send_message("This command must be used in a server.", ephemeral=True)
-        return
-        
-    guild_id = str(interaction.guild.id)
-    
-    # Ensure we have a mutable dict for config; fall back to an empty dict if none exists.
-    config_data = bot_instance.configs.get(guild_id) or {}
-    config_data["backup_role_id"] = backup_role.id
-    config_data["allowed_channel_id"] = backup_channel.id
-
-    embed = discord.Embed(title="✅ Configuration Updated!", description="The bot's settings have been updated.", color=discord.Color.green())
-    embed.add_field(name="Backup Channel", value=backup_channel.mention, inline=False)
-    embed.add_field(name="Backup Role", value=backup_role.mention, inline=False)
-    
-    if embed_color:
-        match = re.match(r'^#?([A-Fa-f0-9]{6})$', embed_color)
-        if match:
-            color_int = int(match.group(1), 16)
-            config_data['embed_color'] = color_int
-            embed.add_field(name="Embed Color", value=f"`#{match.group(1).upper()}`", inline=True)
-        else:
-            await interaction.response.send_message("❌ **Invalid Color:** Please use a valid 6-digit hex format (e.g., `#FF5733`).", ephemeral=True)
+    @discord.app_commands.choices(region=REGION_CHOICES)
+    async def notify_command(interaction: discord.Interaction, enabled: bool, region: Optional[discord.app_commands.Choice[str]] = None):
+        if not interaction.guild:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
             return
 
-    if thumbnail_url:
-        if thumbnail_url.startswith(('http://', 'https://')):
-            config_data['thumbnail_url'] = thumbnail_url
-            embed.add_field(name="Thumbnail URL", value=f"[Link]({thumbnail_url})", inline=True)
+        guild_id, user_id = str(interaction.guild.id), str(interaction.user.id)
+        subscriptions = bot.alert_subscriptions.get(guild_id) or {}
+        regions: Optional[List[str]] = subscriptions.get(user_id)
+
+        if enabled:
+            if region is None:
+                regions = []
+            elif not regions:
+                regions = [region.value]
+            elif region.value not in regions:
+                regions.append(region.value)
+        elif region is not None and regions:
+            regions = [r for r in regions if r != region.value] or None
         else:
-            await interaction.response.send_message("❌ **Invalid URL:** Thumbnail URL must start with `http://` or `https://`.", ephemeral=True)
-            return
-
-    bot_instance.configs.set(guild_id, config_data)
-    await bot_instance.configs.save()
-    
-    await interaction.response.send_message(embed=embed, ephemeral=True)
-    logger.info(f"Bot configured for guild '{interaction.guild.name}' ({guild_id}) by admin {interaction.user}.")
-
-
-@bot.tree.command(name="backup", description="Request backup from your allies.")
-@discord.app_commands.checks.cooldown(1, 60.0, key=lambda i: (i.guild_id, i.user.id))
-@discord.app_commands.describe(roblox_user="Your Roblox username or profile link.", opps="The usernames of the players teaming on you.", link="Optional: A private server link for easy joining.")
-@discord.app_commands.choices(region=[
-    discord.app_commands.Choice(name="🇺🇸 US East", value="US East"), discord.app_commands.Choice(name="🇺🇸 US West", value="US West"),
-    discord.app_commands.Choice(name="🇪🇺 Europe", value="Europe"), discord.app_commands.Choice(name="🇦🇺 Australia", value="Australia"),
-    discord.app_commands.Choice(name="🇸🇬 Asia", value="Asia"), discord.app_commands.Choice(name="❓ Unknown", value="Unknown"),
-])
-async def backup_command(interaction: discord.Interaction, roblox_user: str, opps: str, region: discord.app_commands.Choice[str], link: Optional[str] = None):
-    await _send_backup_request(interaction, roblox_user, opps, region.value, link, is_debug=False)
-
-
-@bot.tree.command(name="debugbackup", description="[ADMIN] Create a backup request without pinging roles.")
-@discord.app_commands.checks.has_permissions(administrator=True)
-@discord.app_commands.choices(region=[
-    discord.app_commands.Choice(name="🇺🇸 US East", value="US East"), discord.app_commands.Choice(name="🇺🇸 US West", value="US West"),
-    discord.app_commands.Choice(name="🇪🇺 Europe", value="Europe"), discord.app_commands.Choice(name="🇦🇺 Australia", value="Australia"),
-    discord.app_commands.Choice(name="🇸🇬 Asia", value="Asia"), discord.app_commands.Choice(name="❓ Unknown", value="Unknown"),
-])
-async def debugbackup_command(interaction: discord.Interaction, roblox_user: str, opps: str, region: discord.app_commands.Choice[str], link: Optional[str] = None):
-    await _send_backup_request(interaction, roblox_user, opps, region.value, link, is_debug=True)
-
-
-@bot.tree.command(name="warstats", description="View statistics about past backup requests.")
-async def warstats_command(interaction: discord.Interaction):
-    if not interaction.guild:
-        await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
-        return
-        
-    guild_id = str(interaction.guild.id)
-    guild_wars = bot.war_data.get(guild_id, [])
-
-    if not guild_wars:
-        await interaction.response.send_message("No war data has been recorded for this server yet.", ephemeral=True)
-        return
-
-    total_wars = len(guild_wars)
-    wins = sum(1 for w in guild_wars if w['status'] == 'Win')
-    losses = sum(1 for w in guild_wars if w['status'] == 'Loss')
-    truces = sum(1 for w in guild_wars if w['status'] == 'Truce')
-    win_rate = (wins / (wins + losses) * 100) if (wins + losses) > 0 else 0
-    
-    total_duration = sum(w.get('duration_seconds', 0) for w in guild_wars)
-    avg_duration_secs = total_duration / total_wars if total_wars > 0 else 0
-    m, s = divmod(avg_duration_secs, 60); h, m = divmod(m, 60)
-    avg_duration_str = f"{int(h):02d}:{int(m):02d}:{int(s):02d}"
-
-    # We've already checked that interaction.guild is not None, but this makes it more explicit
-    # for type checkers and future readers.
-    guild = interaction.guild
-    assert guild is not None
-
-    embed = discord.Embed(title=f"War Statistics for {guild.name}", description=f"Analysis of **{total_wars}** concluded engagements.", color=discord.Color.blue())
-    thumbnail_url = guild.icon.url if guild.icon else "https://i.imgur.com/P5LJ02a.png"
-    embed.set_thumbnail(url=thumbnail_url)
-    embed.add_field(name="📈 Overall Record", value=f"**{wins}** Wins / **{losses}** Losses / **{truces}** Truces", inline=False)
-    embed.add_field(name="📊 Win Rate", value=f"`{win_rate:.1f}%` (Based on Wins and Losses)", inline=True)
-    embed.add_field(name="⏱️ Avg. Duration (H:M:S)", value=f"`{avg_duration_str}`", inline=True)
-
-    if guild_wars:
-        recent_wars = sorted(guild_wars, key=lambda w: w['end_time_utc'], reverse=True)[:5]
-        recent_wars_text = [
-            f"<t:{int(datetime.datetime.fromisoformat(w['start_time_utc']).timestamp())}:R>: **{w['status']}** vs {w['num_opponents']} opp(s) by <@{w['initiator_id']}>"
-            for w in recent_wars
+            regions = None
+
+        if regions is None:
+            subscriptions.pop(user_id, None)
+            message = "🔕 You will no longer receive DM alerts for backup requests in this server."
+        else:
+            subscriptions[user_id] = regions
+            scope = ", ".join(f"**{r}**" for r in regions) if regions else "**all regions**"
+            message = f"🔔 You'll be sent a DM for backup requests in {scope}, as long as you have this server's backup role and allow DMs from server members."
+        bot.alert_subscriptions.set(guild_id, subscriptions)
+        await bot.alert_subscriptions.save()
+
+        await interaction.response.send_message(message, ephemeral=True)
+        logger.info(f"DM alerts for {interaction.user} in guild '{interaction.guild.name}' set to {regions}.")
+
+
+    def format_duration(seconds: float) -> str:
+        """Formats a number of seconds as H:M:S."""
+        m, s = divmod(seconds, 60); h, m = divmod(m, 60)
+        return f"{int(h):02d}:{int(m):02d}:{int(s):02d}"
+
+
+    def format_record(wins: int, losses: int, truces: int, expired: int = 0) -> str:
+        """Formats a Win/Loss/Truce record, adding expired requests only when there are any."""
+        record = f"**{wins}** Wins / **{losses}** Losses / **{truces}** Truces"
+        return f"{record} / **{expired}** Expired" if expired else record
+
+
+    def parse_date_range(start: Optional[str], end: Optional[str]) -> Tuple[Optional[datetime.datetime], Optional[datetime.datetime]]:
+        """
+        Turns YYYY-MM-DD command options into a [since, until) range of UTC datetimes; either
+        may be None. `end` is inclusive, so the cut-off is the following midnight.
+        Raises ValueError for a malformed date.
+        """
+        def midnight(value: str) -> datetime.datetime:
+            return datetime.datetime.combine(datetime.date.fromisoformat(value), datetime.time(), datetime.timezone.utc)
+
+        return (midnight(start) if start else None), (midnight(end) + datetime.timedelta(days=1) if end else None)
+
+
+    async def _send_war_breakdown(interaction: discord.Interaction, breakdown: Optional[str], days: Optional[int]):
+        """Sends the detailed /warstats view computed by the guild's WarAnalytics."""
+        guild = interaction.guild
+        assert guild is not None
+
+        if np is None:
+            await interaction.response.send_message("Detailed breakdowns are unavailable: the bot host needs `numpy` installed.", ephemeral=True)
+            return
+
+        since = discord.utils.utcnow().timestamp() - days * 86400 if days else None
+        result = bot.guild_war_analytics(str(guild.id)).breakdown(since)
+        period = f"the last **{days}** day{'s' if days > 1 else ''}" if days else "all time"
+
+        if not result["total"]:
+            await interaction.response.send_message(f"No war data has been recorded for this server in {period}.", ephemeral=True)
+            return
+
+        def win_rate(wins: int, losses: int) -> str:
+            return f"{wins / (wins + losses) * 100:.1f}%" if (wins + losses) > 0 else "n/a"
+
+        embed = discord.Embed(title=f"War Breakdown for {guild.name}", description=f"Analysis of **{result['total']}** engagements from {period}.", color=discord.Color.blue())
+        embed.add_field(name="📈 Record", value=format_record(result['wins'], result['losses'], result['truces'], result['expired']), inline=False)
+        embed.add_field(name="📊 Win Rate", value=f"`{win_rate(result['wins'], result['losses'])}`", inline=True)
+        if result["percentiles"]:
+            p50, p90, p99 = (format_duration(p) for p in result["percentiles"])
+            embed.add_field(name="⏱️ Duration p50 / p90 / p99", value=f"`{p50}` / `{p90}` / `{p99}`", inline=True)
+
+        if breakdown == "region":
+            lines = [f"**{region}**: `{win_rate(w, l)}` ({total} wars)" for region, total, w, l in result["by_region"]]
+            embed.add_field(name="🌍 Win Rate by Region", value="\n".join(lines), inline=False)
+        elif breakdown == "opponents":
+            cap = WarAnalytics.MAX_OPPONENT_BUCKET
+            lines = [f"**{n}{'+' if n == cap else ''} opp(s)**: `{win_rate(w, l)}` ({total} wars)" for n, total, w, l in result["by_opponents"]]
+            embed.add_field(name="💀 Win Rate by Opponent Count", value="\n".join(lines), inline=False)
+
+        await interaction.response.send_message(embed=embed)
+        logger.info(f"War breakdown ({breakdown or 'summary'}, days={days}) viewed by {interaction.user} in guild '{guild.name}'.")
+
+
+    @bot.tree.command(name="warstats", description="View statistics about past backup requests.")
+    @discord.app_commands.describe(
+        breakdown="Optional: Break the results down by region or by number of opponents.",
+        days="Optional: Only include engagements from the last N days."
+    )
+    @discord.app_commands.choices(breakdown=[
+        discord.app_commands.Choice(name="🌍 Region", value="region"),
+        discord.app_commands.Choice(name="💀 Opponent Count", value="opponents"),
+    ])
+    async def warstats_command(
+        interaction: discord.Interaction,
+        breakdown: Optional[discord.app_commands.Choice[str]] = None,
+        days: Optional[discord.app_commands.Range[int, 1, 3650]] = None
+    ):
+        if not interaction.guild:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+
+        if breakdown or days:
+            await _send_war_breakdown(interaction, breakdown.value if breakdown else None, days)
+            return
+
+        guild_id = str(interaction.guild.id)
+        stats = bot.guild_war_stats(guild_id)
+        summary = stats.summary()
+
+        if not summary["total"]:
+            await interaction.response.send_message("No war data has been recorded for this server yet.", ephemeral=True)
+            return
+
+        total_wars = summary["total"]
+        wins, losses, truces, expired = summary["wins"], summary["losses"], summary["truces"], summary["expired"]
+        win_rate = (wins / (wins + losses) * 100) if (wins + losses) > 0 else 0
+
+        total_duration = summary["total_duration"]
+        avg_duration_secs = total_duration / total_wars if total_wars > 0 else 0
+        avg_duration_str = format_duration(avg_duration_secs)
+
+        # We've already checked that interaction.guild is not None, but this makes it more explicit
+        # for type checkers and future readers.
+        guild = interaction.guild
+        assert guild is not None
+
+        description = f"Analysis of **{total_wars}** concluded engagements."
+        archived = bot.war_archive.summary(guild_id)
+        if archived:
+            description += f" Includes **{archived['total']}** archived engagements."
+        embed = discord.Embed(title=f"War Statistics for {guild.name}", description=description, color=discord.Color.blue())
+        thumbnail_url = guild.icon.url if guild.icon else "https://i.imgur.com/P5LJ02a.png"
+        embed.set_thumbnail(url=thumbnail_url)
+        embed.add_field(name="📈 Overall Record", value=format_record(wins, losses, truces, expired), inline=False)
+        embed.add_field(name="📊 Win Rate", value=f"`{win_rate:.1f}%` (Based on Wins and Losses)", inline=True)
+        embed.add_field(name="⏱️ Avg. Duration (H:M:S)", value=f"`{avg_duration_str}`", inline=True)
+
+        if stats.recent:
+            recent_wars_text = [
+                f"<t:{int(datetime.datetime.fromisoformat(w['start_time_utc']).timestamp())}:R>: **{w['status']}** vs {w['num_opponents']} opp(s) by <@{w['initiator_id']}>"
+                for w in stats.recent
+            ]
+            embed.add_field(name="📜 Recent Engagements", value="\n".join(recent_wars_text), inline=False)
+
+        await interaction.response.send_message(embed=embed)
+        logger.info(f"War stats viewed by {interaction.user} in guild '{interaction.guild.name}'.")
+
+
+    @bot.tree.command(name="wartrend", description="Chart this server's win rate and war durations over time.")
+    @discord.app_commands.describe(
+        period="Optional: Group wars by day or by week (default: week).",
+        days="Optional: Only chart engagements from the last N days."
+    )
+    @discord.app_commands.choices(period=[
+        discord.app_commands.Choice(name="📅 Daily", value="day"),
+        discord.app_commands.Choice(name="🗓️ Weekly", value="week"),
+    ])
+    async def wartrend_command(
+        interaction: discord.Interaction,
+        period: Optional[discord.app_commands.Choice[str]] = None,
+        days: Optional[discord.app_commands.Range[int, 1, 3650]] = None
+    ):
+        if not interaction.guild:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+
+        guild = interaction.guild
+        period_value = period.value if period else "week"
+        since = discord.utils.utcnow().date() - datetime.timedelta(days=days - 1) if days else None
+        range_text = f"the last **{days}** day{'s' if days > 1 else ''}" if days else "all time"
+
+        await interaction.response.defer(thinking=True)
+        png = await bot.render_war_trend(str(guild.id), period_value, since)
+        if png is None:
+            await interaction.followup.send(f"No war data has been recorded for this server in {range_text}.", ephemeral=True)
+            return
+
+        embed = discord.Embed(
+            title=f"War Trend for {guild.name}",
+            description=f"{'Daily' if period_value == 'day' else 'Weekly'} results and average duration for {range_text} (UTC).",
+            color=discord.Color.blue()
+        )
+        embed.set_image(url="attachment://wartrend.png")
+        await interaction.followup.send(embed=embed, file=discord.File(io.BytesIO(png), filename="wartrend.png"))
+        logger.info(f"War trend ({period_value}, days={days}) viewed by {interaction.user} in guild '{guild.name}'.")
+
+    if not HAS_MATPLOTLIB:
+        # E.g. an exe built without matplotlib: offer no command that can only fail.
+        bot.tree.remove_command("wartrend")
+        logger.warning("/wartrend is disabled because matplotlib is not installed. Install it with `pip install matplotlib` and restart the bot to enable trend charts.")
+
+
+    @bot.tree.command(name="leaderboard", description="Rank this server's members by backup requests and results.")
+    @discord.app_commands.describe(category="Optional: What to rank members by (default: most requests).")
+    @discord.app_commands.choices(category=[
+        discord.app_commands.Choice(name="📣 Most Requests", value="requests"),
+        discord.app_commands.Choice(name="🏆 Most Wins", value="wins"),
+        discord.app_commands.Choice(name="📊 Best Win Rate", value="win_rate"),
+        discord.app_commands.Choice(name="🏁 Most Conclusions", value="conclusions"),
+    ])
+    async def leaderboard_command(interaction: discord.Interaction, category: Optional[discord.app_commands.Choice[str]] = None):
+        if not interaction.guild:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+
+        view = bot.LeaderboardView(bot=bot, guild=interaction.guild, category=category.value if category else "requests", author=interaction.user)
+        view.load()
+        if not view.keys:
+            message = "No war data has been recorded for this server yet."
+            if view.category == "win_rate":
+                message = f"Nobody has {MemberLeaderboard.MIN_DECIDED} wins and losses yet, so there's no win-rate ranking."
+            await interaction.response.send_message(message, ephemeral=True)
+            return
+
+        view.interaction = interaction
+        await interaction.response.send_message(embed=view.embed(), view=view)
+        logger.info(f"Leaderboard ({view.category}) viewed by {interaction.user} in guild '{interaction.guild.name}'.")
+
+
+    @bot.tree.command(name="opponent", description="Look up this server's record against an opponent.")
+    @discord.app_commands.describe(name="The opponent's Roblox username.")
+    async def opponent_command(interaction: discord.Interaction, name: str):
+        if not interaction.guild:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+
+        entry = bot.guild_opponent_index(str(interaction.guild.id)).lookup(name)
+        if not entry:
+            await interaction.response.send_message(f"No engagements against `{name}` have been recorded for this server.", ephemeral=True)
+            return
+
+        counts = entry["counts"]
+        wins, losses, truces, expired = counts.get("Win", 0), counts.get("Loss", 0), counts.get("Truce", 0), counts.get("Expired", 0)
+        win_rate = (wins / (wins + losses) * 100) if (wins + losses) > 0 else 0
+
+        embed = discord.Embed(title=f"Record vs {entry['name']}", description=f"**{len(entry['war_ids'])}** concluded engagements against this opponent.", color=discord.Color.dark_red())
+        embed.add_field(name="📈 Record", value=format_record(wins, losses, truces, expired), inline=False)
+        embed.add_field(name="📊 Win Rate", value=f"`{win_rate:.1f}%` (Based on Wins and Losses)", inline=True)
+        if entry["last_fought"]:
+            embed.add_field(name="🕒 Last Fought", value=f"<t:{int(datetime.datetime.fromisoformat(entry['last_fought']).timestamp())}:R>", inline=True)
+        if entry["active"]:
+            embed.add_field(name="⚔️ Ongoing", value=f"Named in **{len(entry['active'])}** active backup request(s).", inline=False)
+
+        await interaction.response.send_message(embed=embed)
+        logger.info(f"Opponent record for '{entry['name']}' viewed by {interaction.user} in guild '{interaction.guild.name}'.")
+
+
+    @opponent_command.autocomplete('name')
+    async def opponent_name_autocomplete(interaction: discord.Interaction, current: str) -> List[discord.app_commands.Choice[str]]:
+        if not interaction.guild:
+            return []
+        matches = bot.guild_opponent_index(str(interaction.guild.id)).search(current)
+        return [discord.app_commands.Choice(name=entry["name"][:100], value=entry["name"][:100]) for entry in matches]
+
+
+    @bot.tree.command(name="warexport", description="[ADMIN] Download this server's war history as a file.")
+    @discord.app_commands.describe(
+        start="Optional: Only include wars that ended on or after this date (YYYY-MM-DD, UTC).",
+        end="Optional: Only include wars that ended on or before this date (YYYY-MM-DD, UTC).",
+        status="Optional: Only include wars with this result.",
+        file_format="Optional: The file format. Defaults to CSV."
+    )
+    @discord.app_commands.rename(file_format="format")
+    @discord.app_commands.choices(
+        status=[
+            discord.app_commands.Choice(name="Win", value="Win"),
+            discord.app_commands.Choice(name="Loss", value="Loss"),
+            discord.app_commands.Choice(name="Truce", value="Truce"),
+            discord.app_commands.Choice(name="Expired", value="Expired"),
+        ],
+        file_format=[
+            discord.app_commands.Choice(name="CSV", value="csv"),
+            discord.app_commands.Choice(name="Parquet", value="parquet"),
         ]
-        embed.add_field(name="📜 Recent Engagements", value="\n".join(recent_wars_text), inline=False)
+    )
+    @discord.app_commands.checks.has_permissions(administrator=True)
+    async def warexport_command(
+        interaction: discord.Interaction,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        status: Optional[discord.app_commands.Choice[str]] = None,
+        file_format: Optional[discord.app_commands.Choice[str]] = None
+    ):
+        guild = interaction.guild
+        if not guild:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+
+        try:
+            since, until = parse_date_range(start, end)
+        except ValueError:
+            await interaction.response.send_message("❌ Dates must be in `YYYY-MM-DD` format (e.g. `2024-05-31`).", ephemeral=True)
+            return
 
-    await interaction.response.send_message(embed=embed)
-    logger.info(f"War stats viewed by {interaction.user} in guild '{interaction.guild.name}'.")
+        fmt = file_format.value if file_format else "csv"
+        if fmt == "parquet" and pq is None:
+            await interaction.response.send_message("Parquet exports are unavailable: the bot host needs `pyarrow` installed. Try CSV instead.", ephemeral=True)
+            return
 
+        await interaction.response.defer(ephemeral=True, thinking=True)
 
-@bot.tree.command(name="resetstats", description="[ADMIN] Reset all war statistics for this server.")
-@discord.app_commands.checks.has_permissions(administrator=True)
-async def resetstats_command(interaction: discord.Interaction):
-    if not interaction.guild:
-        await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
-        return
+        guild_id = str(guild.id)
+        export = WarExport(bot.war_data.iter_wars(guild_id), since, until, status.value if status else None)
+        with tempfile.TemporaryDirectory() as directory:
+            path = await asyncio.get_running_loop().run_in_executor(
+                None, export.write, directory, f"war_history_{guild_id}", fmt, guild.filesize_limit
+            )
+            if not export.exported:
+                await interaction.followup.send("No war records match those filters.", ephemeral=True)
+                return
+            if os.path.getsize(path) > guild.filesize_limit:
+                await interaction.followup.send("❌ The export is too large to upload, even compressed. Try a narrower date range.", ephemeral=True)
+                return
+            await interaction.followup.send(
+                f"📦 Exported **{export.exported}** war records.", file=discord.File(path), ephemeral=True
+            )
 
-    guild_id = str(interaction.guild.id)
+        logger.info(f"War history ({export.exported} records, {fmt}) exported by {interaction.user} in guild '{guild.name}'.")
 
-    if not bot.war_data.get(guild_id):
-        await interaction.response.send_message("ℹ️ No war data found for this server; no action is needed.", ephemeral=True)
-        return
 
-    view = bot.ConfirmResetView(bot=bot, author=interaction.user)
-    await interaction.response.send_message(
-        "**⚠️ Are you sure?**\nThis action is irreversible and will delete all war statistics for this server.",
-        view=view,
-        ephemeral=True
+    @bot.tree.command(name="warprune", description="[ADMIN] Archive or delete this server's detailed war records in a date range.")
+    @discord.app_commands.describe(
+        action="Archive keeps the wars in the lifetime totals; Delete removes them for good.",
+        end="Wars that ended on or before this date (YYYY-MM-DD, UTC).",
+        start="Optional: Only wars that ended on or after this date (YYYY-MM-DD, UTC)."
     )
+    @discord.app_commands.choices(action=[
+        discord.app_commands.Choice(name="Archive", value="archive"),
+        discord.app_commands.Choice(name="Delete", value="delete"),
+    ])
+    @discord.app_commands.checks.has_permissions(administrator=True)
+    async def warprune_command(
+        interaction: discord.Interaction,
+        action: discord.app_commands.Choice[str],
+        end: str,
+        start: Optional[str] = None
+    ):
+        guild = interaction.guild
+        if not guild:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+
+        try:
+            since, until = parse_date_range(start, end)
+        except ValueError:
+            await interaction.response.send_message("❌ Dates must be in `YYYY-MM-DD` format (e.g. `2024-05-31`).", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        guild_id = str(guild.id)
+
+        if action.value == "archive":
+            archived = await bot.archive_wars(guild_id, since, until)
+            if not archived:
+                await interaction.followup.send("No war records in that range; nothing was archived.", ephemeral=True)
+                return
+            await interaction.followup.send(
+                f"🗄️ Archived **{archived}** war records. They still count towards `/warstats`, `/wartrend` and `/leaderboard`.", ephemeral=True
+            )
+            logger.info(f"{archived} war records archived by {interaction.user} in guild '{guild.name}'.")
+            return
+
+        matching = len(await bot.select_wars(guild_id, since, until))
+        if not matching:
+            await interaction.followup.send("No war records in that range; nothing was deleted.", ephemeral=True)
+            return
 
-    await view.wait()
-    
-    if not view.confirmed:
-        for item in view.children:
-            if isinstance(item, (Button, discord.ui.Select)):
-                item.disabled = True
-        await interaction.edit_original_response(
-            content="Confirmation timed out. No stats were reset.",
-            view=view
+        async def prune(guild: discord.Guild) -> str:
+            removed = await bot.prune_wars(str(guild.id), since, until)
+            logger.warning(f"{removed} war records of guild '{guild.name}' were pruned by admin {interaction.user}.")
+            return f"✅ **Done.** **{removed}** war records were deleted."
+
+        view = bot.ConfirmView(author=interaction.user, label="Confirm Delete", progress="⏳ Deleting war records...", action=prune)
+        await interaction.followup.send(
+            f"**⚠️ Are you sure?**\nThis will permanently delete **{matching}** war records and remove them from this server's statistics. "
+            "Archived wars are not affected.",
+            view=view,
+            ephemeral=True
         )
 
+        await view.wait()
 
-# --- Main execution block ---
-if __name__ == "__main__":
-    if not TOKEN:
-        logger.critical("FATAL: DISCORD_TOKEN environment variable not set.")
-        sys.exit("Environment variable not set. Check log file for details.")
-    if not DEV_GUILD_ID:
-        logger.critical("FATAL: DEV_GUILD_ID is not set. Please set the variable in the script.")
-        sys.exit("Developer Guild ID not set. Check log file for details.")
-        
-    try:
-        # Pass log_handler=None as we have configured the root logger ourselves.
-        bot.run(TOKEN, log_handler=None)
-    except Exception as e:
-        logger.critical("Bot run failed with a fatal exception.", exc_info=e)
-        sys.exit("Bot encountered a fatal error. Check log file for details.")
\ No newline at end of file
+        if not view.confirmed:
+            for item in view.children:
+                if isinstance(item, (Button, discord.ui.Select)):
+                    item.disabled = True
+            await interaction.edit_original_response(content="Confirmation timed out. No records were deleted.", view=view)
+
+
+    @bot.tree.command(name="resetstats", description="[ADMIN] Reset all war statistics for this server.")
+    @discord.app_commands.checks.has_permissions(administrator=True)
+    async def resetstats_command(interaction: discord.Interaction):
+        if not interaction.guild:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+
+        guild_id = str(interaction.guild.id)
+
+        if not bot.guild_war_stats(guild_id).total:
+            await interaction.response.send_message("ℹ️ No war data found for this server; no action is needed.", ephemeral=True)
+            return
+
+        async def reset(guild: discord.Guild) -> str:
+            war_count = await bot.clear_war_history(str(guild.id))
+            logger.warning(f"War data for guild '{guild.name}' ({guild.id}) was reset by admin {interaction.user}.")
+            return f"✅ **Success!** All **{war_count}** war records have been deleted for this server."
+
+        view = bot.ConfirmView(author=interaction.user, label="Confirm Reset", progress="⏳ Deleting war records...", action=reset)
+        await interaction.response.send_message(
+            "**⚠️ Are you sure?**\nThis action is irreversible and will delete all war statistics for this server.",
+            view=view,
+            ephemeral=True
+        )
+
+        await view.wait()
+
+        if not view.confirmed:
+            for item in view.children:
+                if isinstance(item, (Button, discord.ui.Select)):
+                    item.disabled = True
+            await interaction.edit_original_response(
+                content="Confirmation timed out. No stats were reset.",
+                view=view
+            )
+
+
+    @bot.tree.command(name="botstats", description="[ADMIN] Show the bot's performance metrics.")
+    @discord.app_commands.checks.has_permissions(administrator=True)
+    async def botstats_command(interaction: discord.Interaction):
+        def describe(summary: dict) -> str:
+            return f"`{summary['count']}` calls · p50 `{summary['p50'] * 1000:.1f}ms` · p99 `{summary['p99'] * 1000:.1f}ms`"
+
+        uptime = time.time() - metrics.started_at
+        embed = discord.Embed(title="Celestial Sentry Metrics", description=f"Uptime: `{format_duration(uptime)}`", color=discord.Color.blurple())
+        latency_ms = 0.0 if math.isnan(bot.latency) else bot.latency * 1000  # NaN before the first heartbeat.
+        embed.add_field(name="💓 Gateway Heartbeat", value=f"`{latency_ms:.0f}ms`", inline=True)
+        for key, summary in metrics.histogram_summary("event_loop_lag_seconds").items():
+            embed.add_field(name="🌀 Event Loop Lag", value=f"p50 `{summary['p50'] * 1000:.1f}ms` · p99 `{summary['p99'] * 1000:.1f}ms`", inline=True)
+        embed.add_field(name="🔕 Pings Suppressed", value=f"`{int(metrics.counter_value('backup_pings_suppressed_total'))}` merged duplicate requests", inline=True)
+
+        sections = [
+            ("⌨️ Commands", "command_latency_seconds", "command"),
+            ("🔘 Buttons", "button_latency_seconds", "button"),
+            ("💾 Saves", "datamanager_save_seconds", "file"),
+            ("🔒 Save Lock Wait", "datamanager_lock_wait_seconds", "file"),
+        ]
+        for title, name, label in sections:
+            lines = [f"**{dict(key)[label]}**: {describe(summary)}" for key, summary in sorted(metrics.histogram_summary(name).items())]
+            if lines:
+                embed.add_field(name=title, value="\n".join(lines)[:1024], inline=False)
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+    # --- Main execution block ---
+    if __name__ == "__main__":
+        if not TOKEN:
+            logger.critical("FATAL: DISCORD_TOKEN environment variable not set.")
+            sys.exit("Environment variable not set. Check log file for details.")
+        if BOT_MODE != 'production' and not DEV_GUILD_ID:
+            logger.critical("FATAL: DEV_GUILD_ID is not set. Set it in .env, or set BOT_MODE=production to sync commands globally.")
+            sys.exit("Developer Guild ID not set. Check log file for details.")
+        if SHARD_IDS and not SHARD_COUNT:
+            logger.critical("FATAL: SHARD_IDS requires SHARD_COUNT to be set.")
+            sys.exit("SHARD_COUNT not set. Check log file for details.")
+
+        try:
+            # Pass log_handler=None as we have configured the root logger ourselves.
+            bot.run(TOKEN, log_handler=None)
+        except Exception as e:
+            logger.critical("Bot run failed with a fatal exception.", exc_info=e)
+            sys.exit("Bot encountered a fatal error. Check log file for details.")
\ No newline at end of file
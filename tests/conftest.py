@@ -0,0 +1,256 @@
+"""
+Shared fixtures: offline stand-ins for the discord.py objects the bot's handlers touch,
+a temporary data directory, and BackupBots wired to it. Embeds are real discord.Embed
+objects, which are plain data containers.
+"""
+import atexit
+import datetime
+import itertools
+import os
+import random
+import shutil
+import sys
+import tempfile
+from typing import Iterator, List, Optional
+
+import discord
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing celestialsentry builds the module-level bot, which opens its data files and
+# bot.log. Point those at a throwaway directory so test runs never touch real data.
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="celestialsentry-test-data-")
+atexit.register(shutil.rmtree, os.environ["DATA_DIR"], True)
+
+import celestialsentry as cs  # noqa: E402
+
+GUILD_ID = 1_000_000_000_000_000_001
+CHANNEL_ID = 2_000
+ROLE_ID = 3_000
+AUTHOR_ID = 10_001
+ADMIN_ID = 10_002
+
+REGIONS = ["US East", "US West", "Europe", "Australia", "Asia", "Unknown"]
+STATUSES = ["Win", "Loss", "Truce"]
+
+_snowflakes = itertools.count(1_100_000_000_000_000_000)
+
+
+def next_snowflake() -> int:
+    return next(_snowflakes)
+
+
+class FakeRole:
+    def __init__(self, role_id: int):
+        self.id = role_id
+        self.mention = f"<@&{role_id}>"
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, name: str = "Test Guild"):
+        self.id = guild_id
+        self.name = name
+        self.icon = None
+        self.filesize_limit = 25 * 1024 * 1024
+
+    def get_role(self, role_id: int) -> FakeRole:
+        return FakeRole(role_id)
+
+
+class FakePermissions:
+    def __init__(self, administrator: bool = False):
+        self.administrator = administrator
+
+
+class FakeUser:
+    def __init__(self, user_id: int, administrator: bool = False):
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+        self.guild_permissions = FakePermissions(administrator)
+
+    def __str__(self) -> str:
+        return f"user#{self.id}"
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+        self.mention = f"<#{channel_id}>"
+        self.messages: dict = {}
+
+    async def fetch_message(self, message_id: int) -> 'FakeMessage':
+        return self.messages[message_id]
+
+
+class FakeMessage:
+    def __init__(self, message_id: int, content: str, embed: Optional[discord.Embed], channel: FakeChannel):
+        self.id = message_id
+        self.content = content or ""
+        self.embeds: List[discord.Embed] = [embed] if embed else []
+        self.channel = channel
+        self.created_at = discord.utils.utcnow()
+        channel.messages[message_id] = self
+
+    async def edit(self, content=None, embed=None, **kwargs):
+        if content is not None:
+            self.content = content
+        if embed is not None:
+            self.embeds = [embed]
+
+
+class FakeCallbackResponse:
+    def __init__(self, message_id: Optional[int]):
+        self.message_id = message_id
+
+
+class FakeResponse:
+    """Records what a handler sent instead of talking to Discord."""
+    def __init__(self, interaction: 'FakeInteraction'):
+        self._interaction = interaction
+        self._done = False
+        self.sent: list = []
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def send_message(self, content=None, **kwargs) -> FakeCallbackResponse:
+        self._done = True
+        self.sent.append(("send_message", content, kwargs))
+        message = FakeMessage(next_snowflake(), content, kwargs.get("embed"), self._interaction.channel)
+        self._interaction.sent_message = message
+        return FakeCallbackResponse(message.id)
+
+    async def edit_message(self, **kwargs):
+        self._done = True
+        self.sent.append(("edit_message", None, kwargs))
+
+    async def send_modal(self, modal):
+        self._done = True
+        self.sent.append(("send_modal", None, {"modal": modal}))
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.sent: list = []
+
+    async def send(self, *args, **kwargs):
+        self.sent.append((args, kwargs))
+
+
+class FakeInteraction:
+    def __init__(
+        self, client, guild: FakeGuild, user: FakeUser, channel: FakeChannel,
+        message: Optional[FakeMessage] = None
+    ):
+        self.id = next_snowflake()
+        self.client = client
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = user
+        self.channel = channel
+        self.channel_id = channel.id
+        self.message = message
+        self.command = None
+        self.extras: dict = {}
+        self.created_at = discord.utils.utcnow()
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup()
+        self.sent_message: Optional[FakeMessage] = None
+
+    async def edit_original_response(self, **kwargs):
+        self.response.sent.append(("edit_original_response", None, kwargs))
+
+
+def iter_war_history(count: int, *, seed: int = 0, members: int = 200, opponent_pool: int = 5000) -> Iterator[dict]:
+    """Yields `count` war records shaped like the ones conclude_request stores, oldest first."""
+    rng = random.Random(seed)
+    end = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+    for _ in range(count):
+        duration = rng.lognormvariate(5.5, 0.8)
+        end += datetime.timedelta(seconds=rng.randint(60, 3600))
+        opponents = [f"opp_{rng.randrange(opponent_pool)}" for _ in range(rng.randint(1, 6))]
+        initiator = 10_000 + rng.randrange(members)
+        yield {
+            "war_id": next_snowflake(), "initiator_id": initiator,
+            "initiator_roblox_user": f"roblox_{initiator}", "opponents": ", ".join(opponents),
+            "num_opponents": len(opponents), "region": rng.choice(REGIONS),
+            "start_time_utc": (end - datetime.timedelta(seconds=duration)).isoformat(),
+            "end_time_utc": end.isoformat(), "duration_seconds": duration,
+            "status": rng.choice(STATUSES),
+            "concluded_by_id": initiator if rng.random() < 0.9 else 10_000 + rng.randrange(members)
+        }
+
+
+class Harness:
+    """A configured guild, its backup channel and a BackupBot over the test's data directory."""
+    def __init__(self, make_bot, **options):
+        self.make_bot = make_bot
+        self.options = options
+        self.guild = FakeGuild(GUILD_ID)
+        self.channel = FakeChannel(CHANNEL_ID)
+        self.author = FakeUser(AUTHOR_ID)
+        self.bot = self.new_bot()
+        self.bot.configs.set(str(GUILD_ID), {"allowed_channel_id": CHANNEL_ID, "backup_role_id": ROLE_ID})
+        # The command callbacks resolve the module-level `bot`, so point it at this instance.
+        cs.bot = self.bot
+
+    def new_bot(self) -> cs.BackupBot:
+        """Builds another bot over the same data directory, e.g. to simulate a restart."""
+        return self.make_bot(**self.options)
+
+    def interaction(self, message: Optional[FakeMessage] = None, user: Optional[FakeUser] = None, bot=None) -> FakeInteraction:
+        return FakeInteraction(bot or self.bot, self.guild, user or self.author, self.channel, message=message)
+
+    def admin(self) -> FakeUser:
+        return FakeUser(ADMIN_ID, administrator=True)
+
+    async def send_request(self, opps: str = "opp_1, opp_2, opp_3", region: str = "Europe", user: Optional[FakeUser] = None) -> FakeInteraction:
+        """Runs /backup and returns its interaction; the request message is `sent_message`."""
+        interaction = self.interaction(user=user)
+        await cs._send_backup_request(interaction, f"roblox_{interaction.user.id}", opps, region, None, is_debug=False)
+        return interaction
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Points the bot's data files at a fresh temporary directory."""
+    monkeypatch.setattr(cs, "BASE_DIR", str(tmp_path))
+    monkeypatch.setattr(cs, "bot", cs.bot)  # Restored after tests that swap in their own bot.
+    return tmp_path
+
+
+@pytest.fixture
+def make_bot(data_dir):
+    """Builds BackupBots over the temporary data directory and closes their SQLite handles afterwards."""
+    bots = []
+
+    def make(**options) -> cs.BackupBot:
+        bot = cs.BackupBot(intents=discord.Intents.default(), **{"guild_id": None, **options})
+        bots.append(bot)
+        return bot
+
+    yield make
+    for bot in bots:
+        bot.cooldowns.close()
+        if isinstance(bot.war_data, cs.SQLiteWarStore):
+            bot.war_data.close()
+
+
+@pytest.fixture
+def make_harness(make_bot):
+    """Builds a Harness; keyword arguments are passed on to BackupBot."""
+    def make(**options) -> Harness:
+        return Harness(make_bot, **options)
+    return make
+
+
+@pytest.fixture
+def war_history():
+    """Returns a function generating synthetic war records: war_history(count, seed=0)."""
+    def generate(count: int, **options) -> List[dict]:
+        return list(iter_war_history(count, **options))
+    return generate
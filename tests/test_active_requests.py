@@ -0,0 +1,75 @@
+import asyncio
+
+from conftest import AUTHOR_ID, GUILD_ID, FakeMessage, FakeUser, next_snowflake
+
+
+def test_backup_request_is_registered(make_harness):
+    async def scenario():
+        h = make_harness()
+        return h, await h.send_request(opps="alpha, beta", region="Asia")
+
+    h, request = asyncio.run(scenario())
+    entry = h.bot.get_active_request(str(GUILD_ID), request.sent_message.id)
+    assert entry["author_id"] == AUTHOR_ID and entry["roblox_user"] == f"roblox_{AUTHOR_ID}"
+    assert (entry["opponents"], entry["region"], entry["is_debug"]) == ("alpha, beta", "Asia", False)
+    assert entry["start_time_utc"]
+
+
+def test_buttons_read_the_registry_instead_of_the_embed(make_harness):
+    async def scenario():
+        h = make_harness()
+        request = await h.send_request()
+        message = request.sent_message
+        message.embeds[0].set_footer(text="")  # Nothing left to parse.
+        view = h.bot.BackupControlsView(bot=h.bot)
+        stranger = h.interaction(message=message, user=FakeUser(99))
+        assert not await view.interaction_check(stranger)
+        assert await view.interaction_check(h.interaction(message=message))
+        await view.win.callback(h.interaction(message=message))
+        return h, message
+
+    h, message = asyncio.run(scenario())
+    assert h.bot.get_active_request(str(GUILD_ID), message.id) is None
+    [record] = h.bot.war_data.get(str(GUILD_ID))
+    assert (record["initiator_id"], record["initiator_roblox_user"]) == (AUTHOR_ID, f"roblox_{AUTHOR_ID}")
+
+
+def test_edit_opps_updates_the_registry(make_harness):
+    async def scenario():
+        h = make_harness()
+        request = await h.send_request(opps="alpha")
+        modal = h.bot.EditOppsModal(current_opps="gamma, delta")
+        await modal.on_submit(h.interaction(message=request.sent_message))
+        return h, request.sent_message
+
+    h, message = asyncio.run(scenario())
+    assert h.bot.get_active_request(str(GUILD_ID), message.id)["opponents"] == "gamma, delta"
+    assert h.bot.BackupControlsView.parse_request_embed(message)["opponents"] == "gamma, delta"
+
+
+def test_registry_survives_a_restart(make_harness):
+    async def scenario():
+        h = make_harness()
+        request = await h.send_request(opps="alpha")
+        await h.bot.active_requests.flush()
+        return h, request.sent_message
+
+    h, message = asyncio.run(scenario())
+    restarted = h.new_bot()
+    assert restarted.get_active_request(str(GUILD_ID), message.id) == h.bot.get_active_request(str(GUILD_ID), message.id)
+
+
+def test_legacy_messages_fall_back_to_the_embed(make_harness):
+    async def scenario():
+        h = make_harness()
+        request = await h.send_request(opps="alpha, beta", region="Asia")
+        template = request.sent_message
+        # A request posted before the registry existed: same embed, no registry entry.
+        legacy = FakeMessage(next_snowflake(), template.content, template.embeds[0], h.channel)
+        view = h.bot.BackupControlsView(bot=h.bot)
+        assert await view.interaction_check(h.interaction(message=legacy))
+        return view.get_request(h.interaction(message=legacy))
+
+    request = asyncio.run(scenario())
+    assert request["author_id"] == AUTHOR_ID and request["roblox_user"] == f"roblox_{AUTHOR_ID}"
+    assert (request["opponents"], request["region"]) == ("alpha, beta", "Asia")
@@ -0,0 +1,140 @@
+import asyncio
+import socket
+import time
+from types import SimpleNamespace
+
+import aiohttp
+import discord
+from aiohttp import web
+
+from conftest import next_snowflake
+import celestialsentry as cs
+
+MESSAGES_ROUTE = "POST /channels/{channel_id}/messages"
+
+
+def http_error(cls, status: int, headers: dict = None):
+    return cls(SimpleNamespace(status=status, reason="", headers=headers or {}), "")
+
+
+class FakeDMChannel:
+    def __init__(self, failures: list):
+        self.id = next_snowflake()
+        self.failures = failures
+        self.sent: list = []
+
+    async def send(self, content=None, embed=None):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append(embed)
+
+
+class FakeMember:
+    def __init__(self, *failures):
+        self.dm_channel = None
+        self.failures = list(failures)
+
+    async def create_dm(self) -> FakeDMChannel:
+        self.dm_channel = FakeDMChannel(self.failures)
+        return self.dm_channel
+
+
+async def fan_out(dispatcher: cs.AlertDispatcher, recipients: list) -> tuple:
+    done = asyncio.get_running_loop().create_future()
+
+    async def report(delivered: int, failed: int):
+        done.set_result((delivered, failed))
+
+    dispatcher.start()
+    try:
+        dispatcher.dispatch(recipients, None, discord.Embed(title="Backup needed"), report)
+        return await asyncio.wait_for(done, 5)
+    finally:
+        await dispatcher.close()
+
+
+def test_bucket_allows_a_burst_then_refills():
+    async def scenario():
+        bucket = cs.TokenBucket(rate=50.0, capacity=3.0)
+        start = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire()
+        burst = time.monotonic() - start
+        await bucket.acquire()
+        return burst, time.monotonic() - start
+
+    burst, total = asyncio.run(scenario())
+    assert burst < 0.01 and total >= 0.015
+
+
+def test_bucket_waits_out_the_reset_when_headers_report_none_left():
+    async def scenario():
+        bucket = cs.TokenBucket(rate=1000.0, capacity=5.0)
+        bucket.sync(remaining=0, reset_after=0.05)
+        start = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(scenario()) >= 0.045
+
+
+def test_successful_responses_resync_alert_buckets():
+    dispatcher = cs.AlertDispatcher()
+    bucket = dispatcher.bucket(MESSAGES_ROUTE, channel_id=42)
+    headers = {"X-RateLimit-Remaining": "1", "X-RateLimit-Reset-After": "2.5"}
+
+    dispatcher.observe_response("POST", "/api/v10/channels/42/messages", headers)
+    assert bucket.tokens <= 1
+    dispatcher.observe_response("POST", "/api/v10/channels/43/messages", headers)
+    assert "POST /channels/43/messages" not in dispatcher._buckets  # Not an alert channel.
+
+    dispatcher.observe_response("POST", "/api/v10/channels/42/messages", dict(headers, **{"X-RateLimit-Remaining": "0"}))
+    assert bucket.blocked_until > time.monotonic() + 2
+
+
+def test_attached_trace_sees_real_responses():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    async def handle(request: web.Request) -> web.Response:
+        return web.json_response({}, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "3"})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_post("/api/v10/channels/{channel_id}/messages", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        dispatcher = cs.AlertDispatcher()
+        bucket = dispatcher.bucket(MESSAGES_ROUTE, channel_id=7)
+        trace = aiohttp.TraceConfig()
+        dispatcher.attach(trace)
+        try:
+            async with aiohttp.ClientSession(trace_configs=[trace]) as session:
+                async with session.post(f"http://127.0.0.1:{port}/api/v10/channels/7/messages", json={}) as response:
+                    await response.read()
+        finally:
+            await runner.cleanup()
+        return bucket
+
+    bucket = asyncio.run(scenario())
+    assert bucket.blocked_until > time.monotonic() + 2
+
+
+def test_fan_out_reports_delivered_and_failed_counts():
+    members = [FakeMember() for _ in range(4)] + [FakeMember(http_error(discord.Forbidden, 403))]
+    delivered, failed = asyncio.run(fan_out(cs.AlertDispatcher(workers=3), members))
+    assert (delivered, failed) == (4, 1)
+    assert all(len(member.dm_channel.sent) == 1 for member in members[:4])
+
+
+def test_rate_limited_dm_is_retried_after_retry_after():
+    before = cs.metrics.counter_value("alert_rate_limited_total")
+    member = FakeMember(http_error(discord.HTTPException, 429, {"Retry-After": "0.05"}))
+
+    start = time.monotonic()
+    assert asyncio.run(fan_out(cs.AlertDispatcher(), [member])) == (1, 0)
+    assert time.monotonic() - start >= 0.045
+    assert len(member.dm_channel.sent) == 1
+    assert cs.metrics.counter_value("alert_rate_limited_total") == before + 1
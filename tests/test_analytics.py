@@ -0,0 +1,47 @@
+import collections
+import datetime
+
+import pytest
+
+import celestialsentry as cs
+
+pytest.importorskip("numpy")
+
+
+def test_breakdown_matches_a_plain_count(war_history):
+    records = war_history(500, seed=10)
+    result = cs.WarAnalytics.from_records(records).breakdown()
+
+    statuses = collections.Counter(record["status"] for record in records)
+    assert (result["total"], result["wins"], result["losses"], result["truces"]) == (
+        len(records), statuses["Win"], statuses["Loss"], statuses["Truce"]
+    )
+    by_region = {region: (total, wins, losses) for region, total, wins, losses in result["by_region"]}
+    for region in {record["region"] for record in records}:
+        in_region = [record for record in records if record["region"] == region]
+        assert by_region[region] == (
+            len(in_region),
+            sum(1 for r in in_region if r["status"] == "Win"),
+            sum(1 for r in in_region if r["status"] == "Loss"),
+        )
+    assert sum(total for _, total, _, _ in result["by_opponents"]) == len(records)
+
+
+def test_breakdown_since_counts_only_later_wars(war_history):
+    records = war_history(100, seed=11)
+    analytics = cs.WarAnalytics.from_records(records[:60])
+    for record in records[60:]:
+        analytics.add(record)  # Buffered until the next query.
+
+    since = datetime.datetime.fromisoformat(records[40]["end_time_utc"]).timestamp()
+    assert analytics.breakdown(since)["total"] == 60
+    assert analytics.breakdown()["total"] == 100
+
+
+def test_naive_timestamps_are_read_as_utc(war_history):
+    record = war_history(1, seed=12)[0]
+    naive = dict(record, end_time_utc=datetime.datetime.fromisoformat(record["end_time_utc"]).replace(tzinfo=None).isoformat())
+    since = datetime.datetime.fromisoformat(record["end_time_utc"]).timestamp()
+
+    assert cs.WarAnalytics.from_records([naive]).breakdown(since)["total"] == 1
+    assert cs.WarAnalytics.from_records([naive]).breakdown(since + 1)["total"] == 0
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+import celestialsentry as cs
+
+GUILD = "1000000000000000001"
+
+
+def stores(records):
+    """The same history in a plain-list store and in a columnar (WarRecordColumns) one."""
+    plain = cs.JSONWarStore("plain.json")
+    plain.set(GUILD, [dict(r) for r in records])
+    compact = cs.JSONWarStore("compact.json", list_factory=cs.WarRecordColumns)
+    compact.set(GUILD, list(records))
+    assert isinstance(compact.get(GUILD), cs.WarRecordColumns)
+    return plain, compact
+
+
+def legacy(record):
+    """A record with a naive timestamp, which the columns keep as a raw dict."""
+    record = dict(record)
+    record["end_time_utc"] = record["end_time_utc"].replace("+00:00", "")
+    return record
+
+
+def assert_same_queries(plain, compact):
+    assert compact.war_summary(GUILD) == pytest.approx(plain.war_summary(GUILD))
+    assert compact.concluded_war_ids(GUILD) == plain.concluded_war_ids(GUILD)
+    assert compact.recent_wars(GUILD, 5) == plain.recent_wars(GUILD, 5)
+    assert list(compact.iter_wars(GUILD)) == list(plain.iter_wars(GUILD))
+
+
+def test_summary_all_raw(data_dir, war_history):
+    records = [legacy(r) for r in war_history(20, seed=3)]
+    plain, compact = stores(records)
+    assert len(compact.get(GUILD)._raw) == len(records)
+    assert_same_queries(plain, compact)
+
+
+def test_summary_mixed(data_dir, war_history):
+    records = war_history(50, seed=4)
+    records[::7] = [legacy(r) for r in records[::7]]
+    plain, compact = stores(records)
+    assert 0 < len(compact.get(GUILD)._raw) < len(records)
+    assert_same_queries(plain, compact)
+    assert list(compact.get(GUILD)) == records
+
+
+def test_columns_survive_appends_and_a_reload(data_dir, war_history):
+    records = war_history(40, seed=5)
+    plain, compact = stores(records[:30])
+    for record in records[30:]:
+        plain.append(GUILD, dict(record))
+        compact.append(GUILD, record)
+    assert_same_queries(plain, compact)
+
+    asyncio.run(compact.save())
+    reloaded = cs.JSONWarStore("compact.json", list_factory=cs.WarRecordColumns)
+    assert isinstance(reloaded.get(GUILD), cs.WarRecordColumns)
+    assert_same_queries(plain, reloaded)
@@ -0,0 +1,59 @@
+import asyncio
+
+import discord
+
+import celestialsentry as cs
+
+
+def make_synced_bot(make_bot, monkeypatch, syncs: list, extra_commands=()) -> cs.BackupBot:
+    """A bot carrying the real command tree, whose tree.sync only records the call."""
+    bot = make_bot()
+    for command in [*cs.bot.tree.get_commands(), *extra_commands]:
+        bot.tree.add_command(command)
+
+    async def sync(*, guild=None):
+        syncs.append(guild)
+        return []
+
+    monkeypatch.setattr(bot.tree, "sync", sync)
+    return bot
+
+
+async def ping(interaction: discord.Interaction):
+    pass
+
+
+def test_fingerprint_is_stable_and_tracks_the_tree(make_bot, monkeypatch):
+    first = make_synced_bot(make_bot, monkeypatch, [])
+    second = make_synced_bot(make_bot, monkeypatch, [])
+    assert first.command_fingerprint() == second.command_fingerprint()
+
+    second.tree.add_command(discord.app_commands.Command(name="ping", description="Ping.", callback=ping))
+    assert first.command_fingerprint() != second.command_fingerprint()
+
+
+def test_unchanged_tree_is_not_resynced_after_a_restart(make_bot, monkeypatch):
+    syncs: list = []
+    assert asyncio.run(make_synced_bot(make_bot, monkeypatch, syncs).sync_commands())
+    assert not asyncio.run(make_synced_bot(make_bot, monkeypatch, syncs).sync_commands())
+    assert len(syncs) == 1
+
+    assert asyncio.run(make_synced_bot(make_bot, monkeypatch, syncs).sync_commands(force=True))
+    assert len(syncs) == 2
+
+
+def test_changed_tree_is_resynced(make_bot, monkeypatch):
+    syncs: list = []
+    asyncio.run(make_synced_bot(make_bot, monkeypatch, syncs).sync_commands())
+    changed = make_synced_bot(make_bot, monkeypatch, syncs, [discord.app_commands.Command(name="ping", description="Ping.", callback=ping)])
+    assert asyncio.run(changed.sync_commands())
+    assert len(syncs) == 2
+
+
+def test_each_guild_scope_is_tracked_separately(make_bot, monkeypatch):
+    syncs: list = []
+    bot = make_synced_bot(make_bot, monkeypatch, syncs)
+    guild = discord.Object(id=1234)
+    asyncio.run(bot.sync_commands())
+    assert asyncio.run(bot.sync_commands(guild=guild))
+    assert syncs == [None, guild]
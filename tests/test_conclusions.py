@@ -0,0 +1,93 @@
+import asyncio
+import collections
+import sqlite3
+
+import pytest
+
+from conftest import GUILD_ID
+import celestialsentry as cs
+
+
+def test_racing_clicks_record_each_war_once(make_harness):
+    async def scenario():
+        h = make_harness()
+        requests = [await h.send_request() for _ in range(5)]
+        view = h.bot.BackupControlsView(bot=h.bot)
+        clicks = []
+        for request in requests:
+            message = request.sent_message
+            clicks.append(view.win.callback(h.interaction(message=message)))
+            clicks.append(view.lose.callback(h.interaction(message=message, user=h.admin())))
+            clicks.append(view.truce.callback(h.interaction(message=message)))
+        await asyncio.gather(*clicks)
+        await h.bot.war_data.flush()
+        return h, requests
+
+    h, requests = asyncio.run(scenario())
+    recorded = collections.Counter(record["war_id"] for record in h.bot.war_data.iter_wars(str(GUILD_ID)))
+    assert recorded == {request.sent_message.id: 1 for request in requests}
+    assert h.bot.guild_war_stats(str(GUILD_ID)).total == 5
+    assert h.bot.verify_war_stats(str(GUILD_ID))
+
+
+def test_click_after_restart_is_rejected(make_harness):
+    async def scenario():
+        h = make_harness()
+        request = await h.send_request()
+        view = h.bot.BackupControlsView(bot=h.bot)
+        await view.win.callback(h.interaction(message=request.sent_message))
+        await h.bot.war_data.flush()
+        await h.bot.active_requests.flush()
+
+        restarted = h.new_bot()
+        cs.bot = restarted
+        late = h.interaction(message=request.sent_message, user=h.admin(), bot=restarted)
+        await restarted.BackupControlsView(bot=restarted).lose.callback(late)
+        return restarted, late
+
+    restarted, late = asyncio.run(scenario())
+    assert "already concluded" in late.response.sent[-1][1]
+    assert restarted.war_data.war_count(str(GUILD_ID)) == 1
+
+
+def test_redelivered_conclusion_is_ignored(make_harness):
+    h = make_harness()
+    guild_id = str(GUILD_ID)
+    before = cs.metrics.counter_value("duplicate_conclusions_total")
+
+    async def scenario():
+        message = (await h.send_request()).sent_message
+        request = h.bot.get_active_request(guild_id, message.id)
+        now = cs.discord.utils.utcnow()
+        first = await h.bot.conclude_request(guild_id, message.id, request, "Win", now, h.author.id)
+        again = await h.bot.conclude_request(guild_id, message.id, request, "Loss", now, h.author.id)
+        return first, again
+
+    assert asyncio.run(scenario()) == (True, False)
+    assert cs.metrics.counter_value("duplicate_conclusions_total") == before + 1
+    assert [record["status"] for record in h.bot.war_data.iter_wars(guild_id)] == ["Win"]
+
+
+def test_failed_conclusion_can_be_retried(make_harness, monkeypatch):
+    h = make_harness()
+    guild_id = str(GUILD_ID)
+    record_war = h.bot.record_war
+
+    async def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    async def scenario():
+        message = (await h.send_request()).sent_message
+        view = h.bot.BackupControlsView(bot=h.bot)
+        monkeypatch.setattr(h.bot, "record_war", locked)
+        with pytest.raises(sqlite3.OperationalError):
+            await view.win.callback(h.interaction(message=message))
+        assert h.bot.get_active_request(guild_id, message.id) is not None
+
+        monkeypatch.setattr(h.bot, "record_war", record_war)
+        await view.win.callback(h.interaction(message=message))
+        return message
+
+    message = asyncio.run(scenario())
+    assert [record["war_id"] for record in h.bot.war_data.iter_wars(guild_id)] == [message.id]
+    assert h.bot.get_active_request(guild_id, message.id) is None
@@ -0,0 +1,110 @@
+import asyncio
+import sqlite3
+import time
+
+import discord
+import pytest
+
+from conftest import GUILD_ID
+import celestialsentry as cs
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, data_dir):
+    store = cs.MemoryCooldownStore() if request.param == "memory" else cs.SQLiteCooldownStore("cooldowns.sqlite3")
+    yield store
+    store.close()
+
+
+def test_bucket_refills_at_its_rate(store):
+    assert store.consume("backup:1:2", 1 / 60, 1, 1000.0) == 0.0
+    assert store.consume("backup:1:2", 1 / 60, 1, 1010.0) == pytest.approx(50.0)
+    assert store.consume("backup:1:3", 1 / 60, 1, 1010.0) == 0.0  # Other members have their own bucket.
+    assert store.consume("backup:1:2", 1 / 60, 1, 1061.0) == 0.0
+
+
+def test_only_full_buckets_expire(store):
+    store.consume("backup:1:2", 1 / 60, 1, 1000.0)
+    assert store.expire_idle(1059.0) == 0
+    assert store.expire_idle(1060.0) == 1
+    assert store.consume("backup:1:2", 1 / 60, 1, 1060.0) == 0.0
+
+
+def test_sqlite_buckets_survive_a_restart(data_dir):
+    now = time.time()
+    first = cs.SQLiteCooldownStore("cooldowns.sqlite3")
+    first.consume("backup:1:2", 1 / 60, 1, now)
+    first.close()
+
+    second = cs.SQLiteCooldownStore("cooldowns.sqlite3")
+    try:
+        assert second.consume("backup:1:2", 1 / 60, 1, now + 1) == pytest.approx(59.0)
+    finally:
+        second.close()
+
+
+def test_check_uses_the_guild_cooldown(make_harness):
+    h = make_harness()
+    interaction = h.interaction()
+    assert h.bot.check_cooldown(interaction, "backup")
+    with pytest.raises(discord.app_commands.CommandOnCooldown) as excinfo:
+        h.bot.check_cooldown(interaction, "backup")
+    assert excinfo.value.cooldown.per == cs.BackupBot.DEFAULT_BACKUP_COOLDOWN
+
+    h.bot.configs.get(str(GUILD_ID))["backup_cooldown_seconds"] = 0
+    assert h.bot.check_cooldown(interaction, "backup")
+
+    restarted = h.new_bot()
+    restarted.configs.set(str(GUILD_ID), {"backup_cooldown_seconds": 600})
+    with pytest.raises(discord.app_commands.CommandOnCooldown):
+        restarted.check_cooldown(interaction, "backup")
+
+
+def test_cooldown_store_is_abstract():
+    with pytest.raises(TypeError):
+        cs.CooldownStore()
+
+
+def test_locked_sqlite_store_fails_open(make_harness, data_dir):
+    h = make_harness(cooldown_storage="sqlite")
+    bot, interaction = h.bot, h.interaction()
+    bot.cooldowns.consume("warmup", 1, 1, 0.0)  # Creates the database.
+    locker = sqlite3.connect(data_dir / "cooldowns.sqlite3", isolation_level=None)
+    try:
+        locker.execute("BEGIN IMMEDIATE")
+        started = time.perf_counter()
+        assert bot.check_cooldown(interaction, "backup")
+        assert bot.check_cooldown(interaction, "backup")  # Not counted, so still allowed.
+        assert time.perf_counter() - started < 1.0
+        assert cs.metrics.counter_value("cooldown_checks_total", outcome="unavailable") >= 2
+    finally:
+        locker.close()
+    assert bot.check_cooldown(interaction, "backup")
+    with pytest.raises(discord.app_commands.CommandOnCooldown):
+        bot.check_cooldown(interaction, "backup")
+
+
+def test_corrupt_sqlite_store_fails_open(make_harness, data_dir):
+    (data_dir / "cooldowns.sqlite3").write_bytes(b"not a database" * 512)
+    h = make_harness(cooldown_storage="sqlite")
+    bot, interaction = h.bot, h.interaction()
+    before = cs.metrics.counter_value("cooldown_checks_total", outcome="unavailable")
+
+    assert bot.check_cooldown(interaction, "backup")
+    assert bot.check_cooldown(interaction, "backup")
+    assert cs.metrics.counter_value("cooldown_checks_total", outcome="unavailable") == before + 2
+
+    async def expiry_survives():
+        task = asyncio.get_running_loop().create_task(bot._expire_cooldowns(interval=0))
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert not task.done()
+        task.cancel()
+
+    asyncio.run(expiry_survives())
+
+    # Once the file is replaced, the store reopens it and cooldowns apply again.
+    (data_dir / "cooldowns.sqlite3").unlink()
+    assert bot.check_cooldown(interaction, "backup")
+    with pytest.raises(discord.app_commands.CommandOnCooldown):
+        bot.check_cooldown(interaction, "backup")
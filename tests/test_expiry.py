@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+from conftest import GUILD_ID, ROLE_ID, CHANNEL_ID
+import celestialsentry as cs
+
+
+def test_deadlines_fire_in_order():
+    async def scenario():
+        fired = []
+
+        async def callback(key, deadline):
+            fired.append(key)
+            if key == "broken":
+                raise RuntimeError("callback failed")
+
+        scheduler = cs.ExpiryScheduler(callback)
+        scheduler.start()
+        now = time.time()
+        scheduler.schedule(now + 0.06, "late")
+        scheduler.schedule(now + 0.02, "broken")
+        await asyncio.sleep(0.005)
+        scheduler.schedule(now + 0.01, "early")  # Earlier than what the task is sleeping towards.
+        scheduler.schedule(now - 1, "overdue")
+        await asyncio.sleep(0.1)
+        await scheduler.close()
+        return fired, len(scheduler)
+
+    fired, pending = asyncio.run(scenario())
+    assert fired == ["overdue", "early", "broken", "late"]
+    assert pending == 0
+
+
+def expiring_harness(make_harness):
+    h = make_harness()
+    h.bot.configs.set(str(GUILD_ID), {"allowed_channel_id": CHANNEL_ID, "backup_role_id": ROLE_ID, "request_timeout_minutes": 5})
+    h.bot.get_channel = lambda channel_id: h.channel if channel_id == CHANNEL_ID else None
+    return h
+
+
+def test_unanswered_request_expires(make_harness):
+    async def scenario():
+        h = expiring_harness(make_harness)
+        request = await h.send_request()
+        message = request.sent_message
+        key = f"{GUILD_ID}:{message.id}"
+        deadline = h.bot.get_active_request(str(GUILD_ID), message.id)["expires_at"]
+        assert deadline == request.created_at.timestamp() + 300 and len(h.bot.expiry) == 1
+
+        await h.bot.expire_request(key, deadline)
+        return h, message
+
+    h, message = asyncio.run(scenario())
+    assert h.bot.get_active_request(str(GUILD_ID), message.id) is None
+    [record] = h.bot.war_data.get(str(GUILD_ID))
+    assert record["status"] == "Expired" and record["concluded_by_id"] is None
+    assert "expired" in message.content and "Expired" in message.embeds[0].title
+    assert h.bot.guild_war_stats(str(GUILD_ID)).summary()["expired"] == 1
+
+
+def test_concluded_request_does_not_expire(make_harness):
+    async def scenario():
+        h = expiring_harness(make_harness)
+        request = await h.send_request()
+        message = request.sent_message
+        deadline = h.bot.get_active_request(str(GUILD_ID), message.id)["expires_at"]
+        await h.bot.BackupControlsView(bot=h.bot).win.callback(h.interaction(message=message))
+
+        await h.bot.expire_request(f"{GUILD_ID}:{message.id}", deadline)
+        return h
+
+    h = asyncio.run(scenario())
+    assert [record["status"] for record in h.bot.war_data.get(str(GUILD_ID))] == ["Win"]
+
+
+def test_requests_without_a_timeout_are_not_scheduled(make_harness):
+    async def scenario():
+        h = make_harness()
+        request = await h.send_request()
+        return h, request.sent_message
+
+    h, message = asyncio.run(scenario())
+    assert h.bot.get_active_request(str(GUILD_ID), message.id)["expires_at"] is None
+    assert len(h.bot.expiry) == 0
@@ -0,0 +1,77 @@
+import asyncio
+import csv
+import datetime
+import gzip
+import io
+
+import discord
+import pytest
+
+from conftest import GUILD_ID
+import celestialsentry as cs
+
+
+def read_csv(path) -> list:
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding='utf-8', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def test_filters_select_by_end_date_and_status(tmp_path, war_history):
+    records = war_history(300, seed=15)
+    since = datetime.datetime.fromisoformat(records[100]["end_time_utc"])
+    until = datetime.datetime.fromisoformat(records[200]["end_time_utc"])
+    export = cs.WarExport(iter(records), since, until, "Win")
+
+    path = export.write(str(tmp_path), "export", "csv", 10 * 1024 * 1024)
+    expected = [r for r in records[100:200] if r["status"] == "Win"]
+    rows = read_csv(path)
+    assert export.exported == len(expected) == len(rows)
+    assert [int(row["war_id"]) for row in rows] == [r["war_id"] for r in expected]
+    assert tuple(rows[0]) == tuple(cs.WarExport.COLUMNS)
+
+
+def test_records_are_consumed_in_chunks(war_history, monkeypatch):
+    monkeypatch.setattr(cs.WarExport, "CHUNK_SIZE", 7)
+    export = cs.WarExport(iter(war_history(30, seed=16)))
+    assert [len(chunk) for chunk in export.chunks()] == [7, 7, 7, 7, 2]
+
+
+def test_exports_over_the_size_limit_are_gzipped(tmp_path, war_history):
+    records = war_history(500, seed=17)
+    path = cs.WarExport(iter(records)).write(str(tmp_path), "export", "csv", 4096)
+    assert path.endswith(".csv.gz") and list(tmp_path.iterdir()) == [tmp_path / "export.csv.gz"]
+    assert len(read_csv(path)) == 500
+
+
+def test_parquet_export_round_trips(tmp_path, war_history):
+    pq = pytest.importorskip("pyarrow.parquet")
+    records = war_history(50, seed=18)
+    path = cs.WarExport(iter(records)).write(str(tmp_path), "export", "parquet", 10 * 1024 * 1024)
+    assert pq.read_table(path).to_pylist() == [{col: r[col] for col in cs.WarExport.COLUMNS} for r in records]
+
+
+def test_warexport_command_sends_the_guild_history(make_harness, war_history):
+    h = make_harness()
+    records = war_history(40, seed=19)
+    h.bot.war_data.set(str(GUILD_ID), records)
+    interaction = h.interaction(user=h.admin())
+    loss = discord.app_commands.Choice(name="Loss", value="Loss")
+
+    async def scenario():
+        await cs.warexport_command.callback(interaction, start=records[10]["end_time_utc"][:10], status=loss)
+        (_, kwargs), = interaction.followup.sent
+        return kwargs["file"].fp.read().decode('utf-8')
+
+    rows = list(csv.DictReader(io.StringIO(asyncio.run(scenario()))))
+    start_day = records[10]["end_time_utc"][:10]
+    assert [int(row["war_id"]) for row in rows] == [
+        r["war_id"] for r in records if r["status"] == "Loss" and r["end_time_utc"][:10] >= start_day
+    ]
+
+
+def test_warexport_command_rejects_malformed_dates(make_harness):
+    h = make_harness()
+    interaction = h.interaction(user=h.admin())
+    asyncio.run(cs.warexport_command.callback(interaction, start="31/05/2024"))
+    assert "YYYY-MM-DD" in interaction.response.sent[0][1]
@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import celestialsentry as cs
+
+GUILD = "1000000000000000001"
+OTHER_GUILD = "1000000000000000002"
+
+
+def read_json(path) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_journal_is_replayed_and_compacted(data_dir):
+    manager = cs.DataManager("data.json", journaled=True, compact_threshold=1000)
+    manager.set(GUILD, [])
+    for war_id in range(3):
+        manager.append(GUILD, {"war_id": war_id})
+    manager.delete(OTHER_GUILD)
+    asyncio.run(manager.save())
+    assert not (data_dir / "data.json").exists()
+
+    replayed = cs.DataManager("data.json", journaled=True)
+    assert replayed.get(GUILD) == [{"war_id": 0}, {"war_id": 1}, {"war_id": 2}]
+
+    asyncio.run(replayed.compact())
+    assert (data_dir / "data.json.journal").read_text() == ""
+    assert read_json(data_dir / "data.json")[GUILD] == [{"war_id": 0}, {"war_id": 1}, {"war_id": 2}]
+    assert cs.DataManager("data.json", journaled=True).get(GUILD) == replayed.get(GUILD)
+
+
+def test_torn_journal_tail_is_discarded(data_dir):
+    manager = cs.DataManager("data.json", journaled=True)
+    manager.set(GUILD, {"a": 1})
+    asyncio.run(manager.save())
+    with open(data_dir / "data.json.journal", "a", encoding='utf-8') as f:
+        f.write('{"seq": 2, "op": "set", "key"')
+
+    reloaded = cs.DataManager("data.json", journaled=True)
+    assert reloaded.get(GUILD) == {"a": 1}
+    assert (data_dir / "data.json.journal").read_text().endswith("\n")
+
+
+def test_entry_torn_before_its_newline_is_discarded(data_dir):
+    manager = cs.DataManager("data.json", journaled=True)
+    manager.set(GUILD, {"a": 1})
+    asyncio.run(manager.save())
+    manager.set(OTHER_GUILD, {"b": 2})
+    asyncio.run(manager.save())
+    journal = data_dir / "data.json.journal"
+    journal.write_bytes(journal.read_bytes()[:-1])  # The last entry is valid JSON, but its newline never landed.
+
+    reloaded = cs.DataManager("data.json", journaled=True)
+    assert reloaded.get(OTHER_GUILD) is None
+    reloaded.set(GUILD, {"c": 3})
+    asyncio.run(reloaded.save())
+
+    again = cs.DataManager("data.json", journaled=True)
+    assert again.get(GUILD) == {"c": 3}
+    assert journal.read_bytes().count(b"\n") == 2
+
+
+def test_journal_is_folded_in_when_journaling_is_disabled(data_dir):
+    journaled = cs.DataManager("data.json", journaled=True)
+    journaled.set(GUILD, {"a": 1})
+    journaled.append(OTHER_GUILD, {"war_id": 1})
+    asyncio.run(journaled.save())
+
+    plain = cs.DataManager("data.json")
+    assert plain.get(GUILD) == {"a": 1} and plain.get(OTHER_GUILD) == [{"war_id": 1}]
+    assert not (data_dir / "data.json.journal").exists()
+    assert read_json(data_dir / "data.json")[cs.DataManager.JOURNAL_SEQ_KEY] == 2
+
+
+def test_switching_journaling_back_on_never_replays_stale_entries(data_dir):
+    journaled = cs.DataManager("data.json", journaled=True)
+    journaled.set(GUILD, {"value": "old"})
+    journaled.append(OTHER_GUILD, {"war_id": 1})
+    asyncio.run(journaled.save())
+
+    plain = cs.DataManager("data.json")
+    plain.set(GUILD, {"value": "new"})
+    plain.append(OTHER_GUILD, {"war_id": 2})
+    asyncio.run(plain.save())
+
+    again = cs.DataManager("data.json", journaled=True)
+    assert again.get(GUILD) == {"value": "new"}
+    assert again.get(OTHER_GUILD) == [{"war_id": 1}, {"war_id": 2}]
+    again.append(OTHER_GUILD, {"war_id": 3})
+    asyncio.run(again.save())
+    assert cs.DataManager("data.json", journaled=True).get(OTHER_GUILD) == [{"war_id": 1}, {"war_id": 2}, {"war_id": 3}]
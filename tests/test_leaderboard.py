@@ -0,0 +1,111 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+import celestialsentry as cs
+from conftest import GUILD_ID
+
+CATEGORIES = list(cs.MemberLeaderboard.CATEGORIES)
+
+
+def brute_force_ranking(records, category):
+    """Ranks members by grouping the whole history, the way the leaderboard avoids doing."""
+    counts = {}
+    for record in records:
+        initiator = counts.setdefault(record["initiator_id"], Counter())
+        initiator["requests"] += 1
+        initiator[record["status"]] += 1
+        counts.setdefault(record["concluded_by_id"], Counter())["conclusions"] += 1
+    ranking = []
+    for member_id, c in counts.items():
+        decided = c["Win"] + c["Loss"]
+        if category == "win_rate":
+            if decided >= cs.MemberLeaderboard.MIN_DECIDED:
+                ranking.append((-c["Win"] / decided, -decided, member_id))
+        else:
+            value = c["Win"] if category == "wins" else c[category]
+            if value:
+                ranking.append((-value, member_id))
+    return sorted(ranking)
+
+
+@pytest.mark.parametrize("category", CATEGORIES)
+def test_rankings_match_a_full_sort(war_history, category):
+    records = war_history(3000, seed=11, members=80)
+    assert cs.MemberLeaderboard.from_records(records).rankings[category] == brute_force_ranking(records, category)
+
+
+def test_incremental_updates_match_a_rebuild(war_history):
+    records = war_history(2000, seed=12, members=60)
+    board = cs.MemberLeaderboard.from_records(records[:500])
+    for record in records[500:]:
+        board.add_war(record)
+    rebuilt = cs.MemberLeaderboard.from_records(records)
+    assert board.rankings == rebuilt.rankings
+    assert board.members == rebuilt.members
+
+
+@pytest.mark.parametrize("category", CATEGORIES)
+def test_paging_by_cursor_walks_the_whole_ranking(war_history, category):
+    board = cs.MemberLeaderboard.from_records(war_history(1500, seed=13, members=70))
+    ranking = board.rankings[category]
+
+    forward, after = [], None
+    while True:
+        start, keys = board.page(category, 7, after=after)
+        if not keys:
+            break
+        assert start == len(forward)
+        forward.extend(keys)
+        after = keys[-1]
+    assert forward == ranking
+
+    backward, before = [], (float("inf"),)
+    while True:
+        start, keys = board.page(category, 7, before=before)
+        if not keys:
+            break
+        assert keys == ranking[start:start + len(keys)]
+        backward[:0] = keys
+        before = keys[0]
+    assert backward == ranking
+
+
+def test_record_war_updates_the_cached_board(make_bot, war_history):
+    bot = make_bot()
+    records = war_history(300, seed=14, members=30)
+    for record in records[:200]:
+        bot.war_data.append(str(GUILD_ID), record)
+    board = bot.guild_leaderboard(str(GUILD_ID))
+
+    async def scenario():
+        for record in records[200:]:
+            await bot.record_war(str(GUILD_ID), record)
+
+    asyncio.run(scenario())
+    assert bot.guild_leaderboard(str(GUILD_ID)) is board
+    assert board.rankings == cs.MemberLeaderboard.from_records(records).rankings
+
+
+def test_view_pages_with_its_buttons(make_harness, war_history):
+    h = make_harness()
+    records = war_history(400, seed=15, members=35)
+    for record in records:
+        h.bot.war_data.append(str(GUILD_ID), record)
+    ranking = h.bot.guild_leaderboard(str(GUILD_ID)).rankings["requests"]
+
+    async def scenario():
+        view = h.bot.LeaderboardView(bot=h.bot, guild=h.guild, category="requests", author=h.author)
+        view.load()
+        assert view.keys == ranking[:10] and view.previous.disabled
+        await view.next.callback(h.interaction())
+        assert view.start == 10 and view.keys == ranking[10:20]
+        await view.next.callback(h.interaction())
+        await view.next.callback(h.interaction())
+        assert view.keys == ranking[30:] and view.next.disabled
+        await view.previous.callback(h.interaction())
+        assert view.start == 20 and view.keys == ranking[20:30]
+        assert "Ranks 21-30 of 35" in view.embed().footer.text
+
+    asyncio.run(scenario())
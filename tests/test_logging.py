@@ -0,0 +1,75 @@
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import subprocess
+import sys
+
+import celestialsentry as cs
+
+
+def make_record(message: str, exc_info=None) -> logging.LogRecord:
+    return logging.LogRecord("discord", logging.WARNING, __file__, 1, message, None, exc_info)
+
+
+def test_json_formatter_writes_one_line_per_record():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = make_record("Request\nfailed: ✔️", sys.exc_info())
+
+    line = cs.JsonLogFormatter().format(record)
+    assert "\n" not in line
+    entry = json.loads(line)
+    assert (entry["level"], entry["logger"], entry["message"]) == ("WARNING", "discord", "Request\nfailed: ✔️")
+    assert "ValueError: boom" in entry["exception"]
+
+
+def test_rotated_segments_are_compressed(tmp_path):
+    handler = logging.handlers.RotatingFileHandler(tmp_path / "bot.log", maxBytes=200, backupCount=2, encoding='utf-8')
+    handler.namer = lambda name: f"{name}.gz"
+    handler.rotator = cs.compress_rotated_log
+    for i in range(30):
+        handler.emit(make_record(f"line {i:02d} " + "x" * 40))
+    handler.close()
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["bot.log", "bot.log.1.gz", "bot.log.2.gz"]
+    with gzip.open(tmp_path / "bot.log.1.gz", "rt", encoding='utf-8') as f:
+        newest_segment = f.read()
+    assert newest_segment and "line 29" not in newest_segment
+    assert "line 29" in (tmp_path / "bot.log").read_text(encoding='utf-8')
+
+
+def test_queued_records_are_written_by_the_listener_thread(tmp_path):
+    file_handler = logging.FileHandler(tmp_path / "bot.log", encoding='utf-8')
+    file_handler.setFormatter(cs.JsonLogFormatter())
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    logger = logging.getLogger("celestialsentry-test-queue")
+    logger.propagate = False
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener.start()
+    try:
+        for i in range(100):
+            logger.warning("record %d", i)
+    finally:
+        listener.stop()
+        logger.handlers.clear()
+        file_handler.close()
+
+    lines = (tmp_path / "bot.log").read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line)["message"] for line in lines] == [f"record {i}" for i in range(100)]
+
+
+def test_unknown_log_level_falls_back_to_info(tmp_path):
+    # Read at import, so import the bot script fresh with the setting in place.
+    env = {**os.environ, "LOG_LEVEL": "verbose", "DATA_DIR": str(tmp_path)}
+    check = "import logging, celestialsentry; print(logging.getLevelName(logging.getLogger().level))"
+    result = subprocess.run(
+        [sys.executable, "-c", check], env=env, cwd=os.path.dirname(cs.__file__), capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "INFO"
+    assert "Unknown LOG_LEVEL 'VERBOSE'" in (tmp_path / "bot.log").read_text(encoding='utf-8')
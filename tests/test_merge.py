@@ -0,0 +1,88 @@
+import asyncio
+
+import discord
+
+from conftest import CHANNEL_ID, GUILD_ID, ROLE_ID, FakeChannel, FakeUser
+import celestialsentry as cs
+
+
+def posted_request(interaction) -> bool:
+    """Whether /backup posted a new request (with its buttons) rather than an ephemeral reply."""
+    return any("view" in kwargs for _, _, kwargs in interaction.response.sent)
+
+
+def run_requests(h, *requests) -> list:
+    async def scenario():
+        return [await h.send_request(**options) for options in requests]
+    return asyncio.run(scenario())
+
+
+def test_merging_is_off_by_default(make_harness):
+    h = make_harness()
+    first, second = run_requests(h, {}, {"user": FakeUser(20_001)})
+    assert posted_request(first) and posted_request(second)
+
+
+def merging_harness(make_harness):
+    h = make_harness(merge_window=90)
+    h.bot.get_channel = lambda channel_id: h.channel if channel_id == CHANNEL_ID else None
+    return h
+
+
+def test_matching_request_joins_the_active_one(make_harness):
+    h = merging_harness(make_harness)
+    helper = FakeUser(20_001)
+    first, second = run_requests(h, {"opps": "Alpha, beta"}, {"opps": "BETA, alpha", "user": helper})
+
+    assert not posted_request(second)
+    assert "Already Requested" in second.response.sent[0][1] and second.response.sent[0][2]["ephemeral"]
+    request = h.bot.get_active_request(str(GUILD_ID), first.sent_message.id)
+    assert request["joined"] == [{"user_id": helper.id, "roblox_user": f"roblox_{helper.id}"}]
+    assert [field.name for field in first.sent_message.embeds[0].fields].count("🛡️ Also Needs Help") == 1
+
+
+def test_join_edits_the_request_in_its_own_channel(make_harness):
+    h = merging_harness(make_harness)
+    [first] = run_requests(h, {"opps": "alpha"})
+    request_channel, h.channel = h.channel, FakeChannel(CHANNEL_ID + 1)  # /setup moved the backup channel since.
+    h.bot.configs.set(str(GUILD_ID), {"allowed_channel_id": h.channel.id, "backup_role_id": ROLE_ID})
+    h.bot.invalidate_request_template(str(GUILD_ID))
+    h.bot.get_channel = {request_channel.id: request_channel, h.channel.id: h.channel}.get
+    [second] = run_requests(h, {"opps": "alpha", "user": FakeUser(20_001)})
+
+    assert "you've been added" in second.response.sent[0][1]
+    assert "🛡️ Also Needs Help" in [field.name for field in first.sent_message.embeds[0].fields]
+
+
+def test_join_reply_says_when_the_request_could_not_be_updated(make_harness):
+    h = merging_harness(make_harness)
+    [first] = run_requests(h, {"opps": "alpha"})
+
+    async def fail(**kwargs):
+        raise discord.HTTPException(type("Response", (), {"status": 403, "reason": "Forbidden"})(), "Missing Access")
+
+    first.sent_message.edit = fail
+    [second] = run_requests(h, {"opps": "alpha", "user": FakeUser(20_001)})
+    assert "couldn't be updated" in second.response.sent[0][1]
+    [again] = run_requests(h, {"opps": "alpha", "user": FakeUser(20_001)})
+    assert "already on it" in again.response.sent[0][1]
+
+
+def test_other_regions_and_edited_requests_are_not_joined(make_harness):
+    h = merging_harness(make_harness)
+    first, other_region = run_requests(h, {"opps": "alpha"}, {"opps": "alpha", "region": "Asia", "user": FakeUser(20_001)})
+    assert posted_request(other_region)
+
+    request = h.bot.get_active_request(str(GUILD_ID), first.sent_message.id)
+    request["opponents"] = "gamma"  # Edit Opps.
+    asyncio.run(h.bot.set_active_request(str(GUILD_ID), first.sent_message.id, request))
+    [after_edit] = run_requests(h, {"opps": "alpha", "user": FakeUser(20_002)})
+    assert posted_request(after_edit)
+
+
+def test_index_forgets_requests_outside_the_window():
+    index = cs.RecentRequestIndex(window=90)
+    index.add("1", "alpha, beta", "Europe", 100, created_at=1_000.0)
+    assert index.find("1", "beta,alpha", "Europe", now=1_090.0) == 100
+    assert index.find("1", "alpha, beta", "Europe", now=1_091.0) is None
+    assert cs.RecentRequestIndex(window=0).find("1", "alpha", "Europe", now=0.0) is None
@@ -0,0 +1,81 @@
+import asyncio
+import socket
+
+import aiohttp
+import pytest
+
+import celestialsentry as cs
+
+
+def test_counters_are_kept_per_label_set():
+    metrics = cs.Metrics()
+    metrics.inc("commands_total", command="backup", status="ok")
+    metrics.inc("commands_total", 2, status="ok", command="backup")
+    metrics.inc("commands_total", command="setup", status="ok")
+
+    assert metrics.counter_value("commands_total", command="backup", status="ok") == 3
+    assert metrics.counter_value("commands_total", command="setup", status="ok") == 1
+    assert metrics.counter_value("commands_total", command="setup", status="error") == 0
+
+
+def test_histogram_summary_estimates_quantiles():
+    metrics = cs.Metrics()
+    for _ in range(98):
+        metrics.observe("latency_seconds", 0.003, command="backup")
+    for _ in range(2):
+        metrics.observe("latency_seconds", 3.0, command="backup")
+
+    [(key, summary)] = metrics.histogram_summary("latency_seconds").items()
+    assert key == (("command", "backup"),)
+    assert summary["count"] == 100
+    assert summary["mean"] == pytest.approx((98 * 0.003 + 2 * 3.0) / 100)
+    assert 0.0025 <= summary["p50"] <= 0.005
+    assert 2.5 <= summary["p99"] <= 5.0
+
+
+def test_render_uses_the_prometheus_text_format():
+    metrics = cs.Metrics()
+    metrics.inc("commands_total", command='say "hi"')
+    metrics.set_gauge("guilds", 3)
+    metrics.observe("latency_seconds", 0.2)
+    metrics.observe("latency_seconds", 20.0)
+
+    lines = metrics.render().splitlines()
+    assert "# TYPE celestialsentry_commands_total counter" in lines
+    assert 'celestialsentry_commands_total{command="say \\"hi\\""} 1.0' in lines
+    assert "celestialsentry_guilds 3" in lines
+    assert 'celestialsentry_latency_seconds_bucket{le="0.1"} 0.0' in lines
+    assert 'celestialsentry_latency_seconds_bucket{le="0.25"} 1.0' in lines
+    assert 'celestialsentry_latency_seconds_bucket{le="+Inf"} 2.0' in lines
+    assert "celestialsentry_latency_seconds_count 2.0" in lines
+    assert any(line.startswith("celestialsentry_uptime_seconds ") for line in lines)
+
+
+def test_time_observes_blocks_that_raise():
+    metrics = cs.Metrics()
+    with pytest.raises(ValueError):
+        with metrics.time("button_latency_seconds", button="win"):
+            raise ValueError
+    assert metrics.histogram_summary("button_latency_seconds")[(("button", "win"),)]["count"] == 1
+
+
+def test_metrics_endpoint_serves_the_registry(make_bot):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    async def scenario():
+        bot = make_bot()
+        await bot.start_metrics_server(port)
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"http://127.0.0.1:{port}/metrics") as response:
+                    return response.status, await response.text()
+        finally:
+            await bot._metrics_runner.cleanup()
+
+    cs.metrics.inc("duplicate_conclusions_total", 0)
+    status, body = asyncio.run(scenario())
+    assert status == 200
+    assert "celestialsentry_duplicate_conclusions_total" in body
+    assert "celestialsentry_gateway_latency_seconds" in body
@@ -0,0 +1,59 @@
+import asyncio
+
+from conftest import GUILD_ID
+import celestialsentry as cs
+
+
+def test_lookup_tallies_every_war_against_an_opponent(war_history):
+    records = war_history(400, seed=13, opponent_pool=50)
+    index = cs.OpponentIndex.from_records(records)
+
+    for name in ("opp_0", "opp_7", "opp_49"):
+        against = [r for r in records if name in cs.OpponentIndex.split(r["opponents"])]
+        entry = index.lookup(f" `@{name.upper()}` ")
+        assert entry["war_ids"] == [r["war_id"] for r in against]
+        assert sum(entry["counts"].values()) == len(against)
+        assert entry["last_fought"] == max(r["end_time_utc"] for r in against)
+    assert index.lookup("nobody") is None
+
+
+def test_search_returns_prefix_matches_in_order(war_history):
+    index = cs.OpponentIndex.from_records(war_history(400, seed=14, opponent_pool=50))
+    index.add_war({"war_id": 1, "status": "Win", "opponents": "Opp_1x", "end_time_utc": "2025-02-01T00:00:00+00:00"})
+
+    names = [entry["name"] for entry in index.search("OPP_1")]
+    assert names == ["opp_1"] + [f"opp_{n}" for n in range(10, 20)] + ["Opp_1x"]
+    assert len(index.search("opp_", limit=5)) == 5
+    assert index.search("zzz") == []
+
+
+def test_ongoing_requests_follow_edits_and_conclusions():
+    index = cs.OpponentIndex()
+    index.set_active(1, "alpha, beta")
+    index.set_active(1, "beta, gamma")  # Edit Opps.
+    assert not index.lookup("alpha")["active"]
+    assert index.lookup("gamma")["active"] == {1}
+
+    index.add_war({"war_id": 1, "status": "Loss", "opponents": "beta, gamma", "end_time_utc": "2025-02-01T00:00:00+00:00"})
+    assert not index.lookup("beta")["active"]
+    assert index.lookup("beta")["counts"] == {"Loss": 1}
+
+    index.set_active(2, "alpha")
+    index.clear_history()
+    assert index.lookup("beta") is None
+    assert index.lookup("alpha")["active"] == {2}
+
+
+def test_requests_and_conclusions_update_the_bot_index(make_harness):
+    async def scenario():
+        h = make_harness()
+        request = await h.send_request(opps="Alpha, Beta")
+        index = h.bot.guild_opponent_index(str(GUILD_ID))
+        assert index.lookup("alpha")["active"] == {request.sent_message.id}
+
+        await h.bot.BackupControlsView(bot=h.bot).win.callback(h.interaction(message=request.sent_message))
+        return index
+
+    index = asyncio.run(scenario())
+    assert index.lookup("beta")["counts"] == {"Win": 1}
+    assert not index.lookup("beta")["active"]
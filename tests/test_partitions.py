@@ -0,0 +1,124 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from conftest import GUILD_ID
+import celestialsentry as cs
+
+GUILD = "1000000000000000001"
+OTHER_GUILD = "1000000000000000002"
+
+
+@pytest.fixture
+def partition_loads(monkeypatch):
+    """Records the thread every partition file is read on."""
+    threads = []
+    load = cs.DataManager.load
+
+    def recording_load(self):
+        if os.sep in os.path.relpath(self.filepath, cs.BASE_DIR):
+            threads.append(threading.current_thread())
+        load(self)
+
+    monkeypatch.setattr(cs.DataManager, "load", recording_load)
+    return threads
+
+
+def write_partitions(guild_ids):
+    partitioned = cs.PartitionedDataManager("config")
+    for guild_id in guild_ids:
+        partitioned.set(guild_id, {"guild": guild_id})
+    asyncio.run(partitioned.flush())
+
+
+def test_partitioned_seeding_splits_legacy_file_with_journal(data_dir):
+    # Never compacted, so there is only a journal and no config.json.
+    legacy = cs.DataManager("config.json", journaled=True)
+    legacy.set(GUILD, {"a": 1})
+    legacy.set(f"{OTHER_GUILD}:123", {"b": 2})
+    asyncio.run(legacy.save())
+
+    partitioned = cs.PartitionedDataManager("config", legacy_filename="config.json")
+    assert sorted(os.listdir(data_dir / "config")) == [f"{GUILD}.json", f"{OTHER_GUILD}.json"]
+    assert partitioned.get(GUILD) == {"a": 1}
+    assert partitioned.get(f"{OTHER_GUILD}:123") == {"b": 2}
+
+
+def test_load_reads_partitions_off_the_event_loop(data_dir, partition_loads):
+    write_partitions([GUILD])
+    partition_loads.clear()
+
+    async def scenario():
+        partitioned = cs.PartitionedDataManager("config")
+        await asyncio.gather(*(partitioned.load(f"{GUILD}:{n}") for n in range(5)))
+        await partitioned.load(OTHER_GUILD)  # No file: nothing to read.
+        return partitioned
+
+    partitioned = asyncio.run(scenario())
+    assert len(partition_loads) == 1 and partition_loads[0] is not threading.main_thread()
+    assert partitioned.get(GUILD) == {"guild": GUILD} and len(partition_loads) == 1
+    assert partitioned.get(OTHER_GUILD) is None
+
+
+def test_changes_made_while_loading_are_kept(data_dir):
+    write_partitions([GUILD])
+
+    async def scenario():
+        partitioned = cs.PartitionedDataManager("config")
+        loading = asyncio.ensure_future(partitioned.load(GUILD))
+        await asyncio.sleep(0)
+        partitioned.set(GUILD, {"guild": "changed"})  # Loads the partition synchronously.
+        await loading
+        return partitioned
+
+    assert asyncio.run(scenario()).get(GUILD) == {"guild": "changed"}
+
+
+def test_partition_stays_dirty_until_its_save_completes(data_dir):
+    partitioned = cs.PartitionedDataManager("config")
+    partitioned.set(GUILD, {"guild": GUILD})
+    manager = partitioned._cache[GUILD]
+    save, dirty_while_saving = manager.save, []
+
+    async def observed_save():
+        dirty_while_saving.append(GUILD in partitioned._dirty)
+        await save()
+
+    manager.save = observed_save
+    asyncio.run(partitioned.save())
+    assert dirty_while_saving == [True] and not partitioned._dirty
+
+
+def test_least_recently_used_partitions_are_evicted(data_dir):
+    guild_ids = [str(1_000_000_000_000_000_000 + n) for n in range(4)]
+    write_partitions(guild_ids)
+    evicted = []
+
+    async def scenario():
+        partitioned = cs.PartitionedDataManager("config", max_guilds=2)
+        partitioned.eviction_listeners.append(evicted.append)
+        for guild_id in (guild_ids[0], guild_ids[1], guild_ids[0], guild_ids[2]):  # Guild 1 is the coldest.
+            await partitioned.load(guild_id)
+        await partitioned.flush()
+        return partitioned
+
+    partitioned = asyncio.run(scenario())
+    assert evicted == [guild_ids[1]]
+    assert list(partitioned._cache) == [guild_ids[0], guild_ids[2]]
+
+
+def test_interactions_load_the_guild_before_handlers_run(make_harness, partition_loads):
+    h = make_harness(partitioned=True)
+    asyncio.run(h.bot.configs.flush())
+    restarted = h.new_bot()
+    partition_loads.clear()
+
+    async def scenario():
+        assert await restarted.tree.interaction_check(h.interaction(bot=restarted))
+
+    asyncio.run(scenario())
+    assert partition_loads and all(thread is not threading.main_thread() for thread in partition_loads)
+    assert restarted.configs.get(str(GUILD_ID))["allowed_channel_id"] == h.bot.configs.get(str(GUILD_ID))["allowed_channel_id"]
+    assert all(thread is not threading.main_thread() for thread in partition_loads)  # Nothing read on the loop afterwards.
@@ -0,0 +1,167 @@
+import asyncio
+import datetime
+
+import pytest
+
+import celestialsentry as cs
+from conftest import GUILD_ID, FakeRole
+
+GUILD = str(GUILD_ID)
+OTHER_GUILD = "1000000000000000002"
+UTC = datetime.timezone.utc
+
+
+def ended(record) -> datetime.datetime:
+    return datetime.datetime.fromisoformat(record["end_time_utc"])
+
+
+def store_history(bot, records):
+    for record in records:
+        bot.war_data.append(GUILD, record)
+
+
+async def run_setup(h, **options):
+    interaction = h.interaction(user=h.admin())
+    await cs.setup_command.callback(interaction, h.channel, FakeRole(3_000), **options)
+
+
+def test_archiving_keeps_lifetime_totals(make_bot, war_history):
+    bot = make_bot()
+    records = war_history(300, seed=21)
+    store_history(bot, records)
+    before = bot.guild_war_stats(GUILD).summary()
+    cutoff = ended(records[200])
+
+    archived = asyncio.run(bot.archive_wars(GUILD, None, cutoff))
+
+    assert archived == 200
+    assert [r["war_id"] for r in bot.war_data.iter_wars(GUILD)] == [r["war_id"] for r in records[200:]]
+    after = bot.guild_war_stats(GUILD).summary()
+    assert after.pop("total_duration") == pytest.approx(before.pop("total_duration"))
+    assert after == before
+    assert bot.verify_war_stats(GUILD)
+    segment = bot.war_archive.summary(GUILD)["segments"][0]
+    assert [r["war_id"] for r in bot.war_archive.read_segment(GUILD, segment)] == [r["war_id"] for r in records[:200]]
+
+
+def test_retention_job_only_visits_indexed_guilds(make_harness, monkeypatch):
+    h = make_harness()
+    h.bot.configs.set(OTHER_GUILD, {"allowed_channel_id": 1, "backup_role_id": 2})
+    asyncio.run(run_setup(h, retention_days=30))
+    assert dict(h.bot.retention_index.items()) == {GUILD: 30}
+
+    visited = []
+
+    async def archive_wars(guild_id, start, end):
+        visited.append((guild_id, start))
+        return 0
+
+    def configs_items():
+        raise AssertionError("the retention job read every config")
+
+    monkeypatch.setattr(h.bot, "archive_wars", archive_wars)
+    monkeypatch.setattr(h.bot.configs, "items", configs_items)
+    h.bot._rebuild_retention_index = False
+
+    async def one_pass():
+        task = asyncio.get_running_loop().create_task(h.bot._enforce_retention(interval=3600))
+        await asyncio.sleep(0)
+        task.cancel()
+
+    asyncio.run(one_pass())
+    assert visited == [(GUILD, None)]
+
+    asyncio.run(run_setup(h, retention_days=0))
+    assert dict(h.bot.retention_index.items()) == {}
+
+
+def test_index_is_rebuilt_from_the_configs(make_harness):
+    h = make_harness()
+    h.bot.configs.set(OTHER_GUILD, {"allowed_channel_id": 1, "backup_role_id": 2, "retention_days": 7})
+    asyncio.run(h.bot.configs.save())
+
+    restarted = h.new_bot()
+    assert restarted._rebuild_retention_index
+    asyncio.run(restarted.rebuild_retention_index())
+    assert dict(restarted.retention_index.items()) == {OTHER_GUILD: 7}
+
+
+def test_partitioned_index_is_built_once(make_harness):
+    h = make_harness(partitioned=True)
+    h.bot.configs.set(OTHER_GUILD, {"allowed_channel_id": 1, "backup_role_id": 2, "retention_days": 7})
+    asyncio.run(h.bot.configs.flush())
+    assert h.bot._rebuild_retention_index
+    asyncio.run(h.bot.rebuild_retention_index())
+
+    restarted = h.new_bot()
+    assert not restarted._rebuild_retention_index
+    assert dict(restarted.retention_index.items()) == {OTHER_GUILD: 7}
+
+
+def test_orphaned_segment_is_adopted_or_dropped(make_bot, war_history):
+    bot = make_bot()
+    records = war_history(60, seed=22)
+    store_history(bot, records[30:])
+    archive = bot.war_archive
+
+    # A crash after writing a segment whose records were already removed: adopt it.
+    adopted = archive.write_segment(GUILD, records[:30])
+    summary = archive.recover(GUILD, None, bot.war_data.iter_wars(GUILD))
+    assert summary["segments"] == [adopted] and summary["total"] == 30
+
+    # A crash before the records were removed from the live history: drop the segment.
+    dropped = archive.write_segment(GUILD, records[30:40])
+    assert archive.recover(GUILD, summary, bot.war_data.iter_wars(GUILD)) is None
+    assert dropped not in archive._segments(GUILD)
+
+
+def test_parse_date_range():
+    since, until = cs.parse_date_range("2024-05-01", "2024-05-31")
+    assert since == datetime.datetime(2024, 5, 1, tzinfo=UTC)
+    assert until == datetime.datetime(2024, 6, 1, tzinfo=UTC)
+    assert cs.parse_date_range(None, None) == (None, None)
+    with pytest.raises(ValueError):
+        cs.parse_date_range("31/05/2024", None)
+
+
+def test_warprune_delete_runs_after_confirmation(make_harness, war_history):
+    h = make_harness()
+    records = war_history(50, seed=23)
+    store_history(h.bot, records)
+    end = ended(records[19]).date()
+    expected = sum(1 for record in records if ended(record).date() <= end)
+
+    async def scenario():
+        interaction = h.interaction(user=h.admin())
+        command = asyncio.get_running_loop().create_task(cs.warprune_command.callback(
+            interaction, cs.discord.app_commands.Choice(name="Delete", value="delete"), end.isoformat()
+        ))
+        while not interaction.followup.sent:
+            await asyncio.sleep(0)
+        view = interaction.followup.sent[0][1]["view"]
+        assert isinstance(view, cs.BackupBot.ConfirmView) and view.confirm.label == "Confirm Delete"
+        assert h.bot.war_data.war_count(GUILD) == 50
+
+        # Only the admin who ran the command can confirm it.
+        assert not await view.interaction_check(h.interaction())
+        confirm = h.interaction(user=h.admin())
+        await view.confirm.callback(confirm)
+        await command
+        return confirm
+
+    confirm = asyncio.run(scenario())
+    assert h.bot.war_data.war_count(GUILD) == 50 - expected
+    assert confirm.response.sent[0][2]["content"] == "⏳ Deleting war records..."
+
+
+def test_archive_summaries_survive_a_shard_count_change(data_dir, war_history):
+    guilds = [str(1_000_000_000_000_000_000 + (slot << 22)) for slot in range(6)]
+    archive = cs.WarArchive("war_archive", shard_count=2)
+    for seed, guild_id in enumerate(guilds):
+        records = war_history(10, seed=seed)
+        archive.summaries.set(guild_id, cs.WarArchive.fold(None, archive.write_segment(guild_id, records), records))
+    asyncio.run(archive.summaries.save())
+
+    resharded = cs.WarArchive("war_archive", shard_count=3)
+    assert {guild_id: resharded.summary(guild_id) for guild_id in guilds} == {guild_id: archive.summary(guild_id) for guild_id in guilds}
+    assert all(resharded.summary(guild_id)["total"] == 10 for guild_id in guilds)
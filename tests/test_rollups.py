@@ -0,0 +1,115 @@
+import asyncio
+import datetime
+import logging
+import os
+import runpy
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import celestialsentry as cs
+import trendchart
+from conftest import GUILD_ID
+
+
+def brute_force_series(records, period):
+    buckets = {}
+    for record in records:
+        day = datetime.datetime.fromisoformat(record["end_time_utc"]).astimezone(datetime.timezone.utc).date()
+        if period == "week":
+            day -= datetime.timedelta(days=day.weekday())
+        bucket = buckets.setdefault(day, Counter())
+        bucket[record["status"]] += 1
+        bucket["total"] += 1
+        bucket["duration"] += record["duration_seconds"]
+    return [
+        (day, b["Win"], b["Loss"], b["Truce"], b["Expired"], b["total"], pytest.approx(b["duration"]))
+        for day, b in sorted(buckets.items())
+    ]
+
+
+@pytest.mark.parametrize("period", ["day", "week"])
+def test_series_matches_a_scan_of_the_records(war_history, period):
+    records = war_history(2000, seed=3)
+    assert cs.WarRollups.from_records(records).series(period) == brute_force_series(records, period)
+
+
+def test_series_since_leaves_out_earlier_buckets(war_history):
+    records = war_history(500, seed=4)
+    rollups = cs.WarRollups.from_records(records)
+    since = rollups.series("day")[3][0]
+    assert rollups.series("day", since) == rollups.series("day")[3:]
+
+
+def test_record_war_updates_the_rollups(make_bot, war_history):
+    bot = make_bot()
+    records = war_history(50, seed=5)
+    for record in records[:40]:
+        bot.war_data.append(str(GUILD_ID), record)
+    rollups = bot.guild_war_rollups(str(GUILD_ID))
+    for record in records[40:]:
+        asyncio.run(bot.record_war(str(GUILD_ID), record))
+    assert bot.guild_war_rollups(str(GUILD_ID)) is rollups
+    assert rollups.series("week") == brute_force_series(records, "week")
+
+
+def test_charts_are_reused_until_the_next_war(make_bot, war_history, monkeypatch):
+    bot = make_bot()
+    records = war_history(30, seed=6)
+    for record in records[:-1]:
+        bot.war_data.append(str(GUILD_ID), record)
+    renders = []
+
+    def render(period, series):
+        renders.append(period)
+        return f"{period}:{len(series)}".encode()
+
+    # Draw in a thread so the stand-in renderer is the one that runs.
+    monkeypatch.setattr(trendchart, "render_trend_chart", render)
+    bot._chart_pool = ThreadPoolExecutor(max_workers=1)
+
+    async def scenario():
+        first = await bot.render_war_trend(str(GUILD_ID), "day", None)
+        assert await bot.render_war_trend(str(GUILD_ID), "day", None) == first
+        await bot.render_war_trend(str(GUILD_ID), "week", None)
+        assert renders == ["day", "week"]
+        await bot.record_war(str(GUILD_ID), records[-1])
+        await bot.render_war_trend(str(GUILD_ID), "day", None)
+        assert renders == ["day", "week", "day"]
+        assert await bot.render_war_trend(str(GUILD_ID), "day", datetime.date(2100, 1, 1)) is None
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        bot._chart_pool.shutdown()
+
+
+def test_chart_workers_do_not_import_the_bot():
+    pool = trendchart.start_pool(2)
+    try:
+        imported = pool.submit(eval, "'celestialsentry' in __import__('sys').modules").result(timeout=60)
+    finally:
+        pool.shutdown()
+    assert not imported
+
+
+def test_bot_script_builds_nothing_in_a_chart_worker(tmp_path, monkeypatch):
+    # What a spawned chart worker runs before its first task when the bot script is __main__.
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    handlers = list(logging.getLogger().handlers)
+    namespace = runpy.run_path(cs.__file__, run_name="__mp_main__")
+    assert namespace["CHART_WORKER"] and "bot" not in namespace
+    assert logging.getLogger().handlers == handlers
+    assert not os.listdir(tmp_path)
+
+
+def test_render_in_a_chart_worker(war_history):
+    pytest.importorskip("matplotlib")
+    series = cs.WarRollups.from_records(war_history(200, seed=7)).series("week")
+    pool = trendchart.start_pool(1)
+    try:
+        png = pool.submit(trendchart.render_trend_chart, "week", series).result(timeout=120)
+    finally:
+        pool.shutdown()
+    assert png.startswith(b"\x89PNG")
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import celestialsentry as cs
+
+# Consecutive shard slots, so the guilds spread over every shard for any shard count.
+GUILDS = [str(1_000_000_000_000_000_000 + (slot << 22)) for slot in range(12)]
+
+
+def write_json(path, data: dict):
+    with open(path, "w", encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+def age(path, seconds: float):
+    """Backdates a file, since a fast test can write several files within one mtime tick."""
+    mtime = os.path.getmtime(path) - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def open_all(shard_count: int) -> dict:
+    merged = {}
+    for shard_id in range(shard_count):
+        shard = cs.ShardedDataManager("config.json", shard_count=shard_count, shard_ids=[shard_id])
+        owned = dict(shard.items())
+        assert all(cs.shard_id_for(key.split(':')[0], shard_count) == shard_id for key in owned)
+        merged.update(owned)
+    return merged
+
+
+def test_sharded_seeding_splits_legacy_file(data_dir):
+    legacy = {guild_id: {"n": i} for i, guild_id in enumerate(GUILDS)}
+    write_json(data_dir / "config.json", legacy)
+
+    assert open_all(3) == legacy
+    assert sorted(name for name in os.listdir(data_dir) if ".shard-" in name) == [f"config.shard-{i}-of-3.json" for i in range(3)]
+    assert not [name for name in os.listdir(data_dir) if name.endswith(".tmp")]
+
+
+@pytest.mark.parametrize("options", [{"journaled": True}, {"snapshot_format": "binary"}], ids=["journal", "binary"])
+def test_sharded_seeding_reads_journal_and_binary_legacy_files(data_dir, options):
+    legacy = cs.DataManager("config.json", **options)
+    legacy.set(GUILDS[0], {"a": 1})
+    legacy.set(f"{GUILDS[1]}:123", {"b": 2})
+    asyncio.run(legacy.save())
+    assert not (data_dir / "config.json").exists()
+
+    sharded = cs.ShardedDataManager("config.json", shard_count=2)
+    assert dict(sharded.items()) == dict(legacy.items())
+
+
+def test_changing_the_shard_count_resplits_the_data(data_dir):
+    write_json(data_dir / "config.json", {guild_id: {"n": 0} for guild_id in GUILDS})
+    four = cs.ShardedDataManager("config.json", shard_count=4)
+    for i, guild_id in enumerate(GUILDS):
+        four.set(guild_id, {"n": i})
+    asyncio.run(four.save())
+    age(data_dir / "config.json", 10)
+
+    three = cs.ShardedDataManager("config.json", shard_count=3)
+    assert dict(three.items()) == {guild_id: {"n": i} for i, guild_id in enumerate(GUILDS)}
+    assert all(three.get(guild_id) == {"n": i} for i, guild_id in enumerate(GUILDS))
+
+
+def test_switching_back_to_an_old_shard_count_picks_up_newer_changes(data_dir):
+    two = cs.ShardedDataManager("config.json", shard_count=2, journaled=True)
+    two.set(GUILDS[0], {"n": "old"})
+    asyncio.run(two.save())
+    for shard_id in range(2):
+        for name in os.listdir(data_dir):
+            if name.startswith(f"config.shard-{shard_id}-of-2"):
+                age(data_dir / name, 20)
+
+    three = cs.ShardedDataManager("config.json", shard_count=3)
+    three.set(GUILDS[0], {"n": "new"})
+    three.set(GUILDS[5], {"n": "added"})
+    asyncio.run(three.save())
+
+    back = cs.ShardedDataManager("config.json", shard_count=2, journaled=True)
+    assert dict(back.items()) == {GUILDS[0]: {"n": "new"}, GUILDS[5]: {"n": "added"}}
+    assert not (data_dir / f"config.shard-{cs.shard_id_for(GUILDS[0], 2)}-of-2.json.journal").exists()
+
+    # Up to date now, so another start leaves the files alone.
+    before = {name: os.path.getmtime(data_dir / name) for name in os.listdir(data_dir)}
+    cs.ShardedDataManager("config.json", shard_count=2, journaled=True)
+    assert {name: os.path.getmtime(data_dir / name) for name in os.listdir(data_dir)} == before
+
+
+def test_shard_files_from_before_the_count_was_in_their_names_are_read(data_dir):
+    for shard_id in range(2):
+        write_json(data_dir / f"config.shard-{shard_id}.json", {
+            guild_id: {"n": i} for i, guild_id in enumerate(GUILDS) if cs.shard_id_for(guild_id, 2) == shard_id
+        })
+
+    assert open_all(2) == {guild_id: {"n": i} for i, guild_id in enumerate(GUILDS)}
+
+
+def test_development_bot_runs_a_single_shard(make_bot):
+    assert make_bot(guild_id=int(GUILDS[0])).shard_count == 1
+    assert make_bot().shard_count is None  # Production: Discord's recommended count.
+    assert make_bot(guild_id=int(GUILDS[0]), shard_count=4, shard_ids=[0]).shard_count == 4
+
+
+def test_shard_stays_dirty_until_its_save_completes(data_dir):
+    sharded = cs.ShardedDataManager("config.json", shard_count=2)
+    sharded.set(GUILDS[0], {"a": 1})
+    shard_id = sharded._shard_for(GUILDS[0])
+    manager = sharded._shards[shard_id]
+    save, dirty_while_saving = manager.save, []
+
+    async def observed_save():
+        dirty_while_saving.append(shard_id in sharded._dirty)
+        await save()
+
+    manager.save = observed_save
+    asyncio.run(sharded.save())
+    assert dirty_while_saving == [True] and not sharded._dirty
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+import celestialsentry as cs
+
+GUILD = "1000000000000000001"
+OTHER_GUILD = "1000000000000000002"
+
+
+def write_binary(data: dict, **options) -> cs.DataManager:
+    manager = cs.DataManager("war_data.json", snapshot_format="binary", **options)
+    for key, value in data.items():
+        manager.set(key, value)
+    asyncio.run(manager.save())
+    return manager
+
+
+def test_binary_snapshot_converts_both_ways(data_dir, war_history):
+    records = war_history(50, seed=1)
+    manager = cs.DataManager("war_data.json", list_factory=cs.WarRecordColumns)
+    manager.set(GUILD, records)
+    asyncio.run(manager.save())
+
+    binary = cs.DataManager("war_data.json", snapshot_format="binary")
+    assert (data_dir / "war_data.snap").exists() and (data_dir / "war_data.json.converted").exists()
+    assert binary.get(GUILD) == records
+
+    back = cs.DataManager("war_data.json")
+    assert (data_dir / "war_data.json").exists() and (data_dir / "war_data.snap.converted").exists()
+    assert back.get(GUILD) == records
+
+
+def test_columns_round_trip_as_columns(data_dir, war_history):
+    records = war_history(40, seed=2)
+    write_binary({GUILD: records}, list_factory=cs.WarRecordColumns)
+
+    compact = cs.DataManager("war_data.json", snapshot_format="binary", list_factory=cs.WarRecordColumns)
+    assert isinstance(compact.get(GUILD), cs.WarRecordColumns)
+    assert list(compact.get(GUILD)) == records
+    plain = cs.DataManager("war_data.json", snapshot_format="binary")
+    assert plain.get(GUILD) == records and isinstance(plain.get(GUILD), list)
+
+
+def test_values_are_decoded_on_first_use(data_dir):
+    write_binary({GUILD: {"a": 1}, OTHER_GUILD: {"b": 2}})
+
+    manager = cs.DataManager("war_data.json", snapshot_format="binary")
+    assert GUILD in manager._encoded and OTHER_GUILD in manager._encoded
+    assert manager.get(GUILD) == {"a": 1}
+    assert GUILD not in manager._encoded and OTHER_GUILD in manager._encoded
+
+    # A key never read is written back still encoded.
+    manager.set(GUILD, {"a": 3})
+    asyncio.run(manager.save())
+    reloaded = cs.DataManager("war_data.json", snapshot_format="binary")
+    assert reloaded.get(GUILD) == {"a": 3} and reloaded.get(OTHER_GUILD) == {"b": 2}
+
+
+def test_damaged_payload_only_loses_its_key(data_dir):
+    write_binary({GUILD: {"a": 1}, OTHER_GUILD: {"b": 2}})
+    path = data_dir / "war_data.snap"
+    buffer = bytearray(path.read_bytes())
+    entries = cs.BinarySnapshot.read(str(path))
+    buffer[buffer.rindex(entries[GUILD].payload)] ^= 0xFF
+    path.write_bytes(bytes(buffer))
+
+    manager = cs.DataManager("war_data.json", snapshot_format="binary")
+    assert manager.get(GUILD) is None
+    assert manager.get(OTHER_GUILD) == {"b": 2}
+
+
+@pytest.mark.parametrize("damage", [
+    lambda buffer: buffer[:-3],
+    lambda buffer: b"NOTSNP" + buffer[6:],
+])
+def test_unreadable_snapshot_is_rejected(data_dir, damage):
+    write_binary({GUILD: {"a": 1}})
+    path = data_dir / "war_data.snap"
+    path.write_bytes(damage(path.read_bytes()))
+
+    with pytest.raises(ValueError):
+        cs.BinarySnapshot.read(str(path))
+    assert cs.DataManager("war_data.json", snapshot_format="binary").get(GUILD) is None
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+import celestialsentry as cs
+
+GUILD = "1000000000000000001"
+
+
+@pytest.fixture
+def sqlite_store(data_dir):
+    store = cs.SQLiteWarStore("war_data.sqlite3")
+    yield store
+    store.close()
+
+
+def test_sqlite_migration_imports_json_once(data_dir, sqlite_store, war_history):
+    records = war_history(20, seed=2)
+    with open(data_dir / "war_data.json", "w", encoding='utf-8') as f:
+        json.dump({GUILD: records}, f)
+
+    assert sqlite_store.migrate_from_json("war_data.json") == 20
+    assert (data_dir / "war_data.json.migrated").exists()
+    assert sqlite_store.get(GUILD) == records
+    assert sqlite_store.war_summary(GUILD) == pytest.approx(cs.JSONWarStore("war_data.json.migrated").war_summary(GUILD))
+    assert sqlite_store.migrate_from_json("war_data.json") == 0
+
+
+def test_sqlite_migration_replays_journal(data_dir, sqlite_store, war_history):
+    records = war_history(30, seed=3)
+    legacy = cs.JSONWarStore("war_data.json", journaled=True)
+    legacy.set(GUILD, records[:10])
+    asyncio.run(legacy.compact())
+    for record in records[10:]:
+        legacy.append(GUILD, record)
+    asyncio.run(legacy.save())
+    assert (data_dir / "war_data.json.journal").exists()
+
+    assert sqlite_store.migrate_from_json("war_data.json") == 30
+    assert sqlite_store.get(GUILD) == records
+    assert not (data_dir / "war_data.json").exists() and not (data_dir / "war_data.json.journal").exists()
+    assert (data_dir / "war_data.json.migrated").exists() and (data_dir / "war_data.json.journal.migrated").exists()
+
+
+def test_sqlite_migration_imports_journal_only_store(data_dir, sqlite_store, war_history):
+    # Never compacted, so there is only a journal and no war_data.json.
+    records = war_history(5, seed=4)
+    legacy = cs.JSONWarStore("war_data.json", journaled=True)
+    for record in records:
+        legacy.append(GUILD, record)
+    asyncio.run(legacy.save())
+    assert not (data_dir / "war_data.json").exists()
+
+    assert sqlite_store.migrate_from_json("war_data.json") == 5
+    assert sqlite_store.get(GUILD) == records
+    assert (data_dir / "war_data.json.journal.migrated").exists()
+    assert sqlite_store.migrate_from_json("war_data.json") == 0
+
+
+def test_queued_records_are_read_once_before_and_after_saving(sqlite_store, war_history):
+    records = war_history(8, seed=5)
+    sqlite_store.set(GUILD, records[:5])
+    for record in records[5:]:
+        sqlite_store.append(GUILD, record)
+
+    def reads():
+        return (
+            list(sqlite_store.iter_wars(GUILD)), sqlite_store.war_count(GUILD), sqlite_store.war_summary(GUILD),
+            sqlite_store.concluded_war_ids(GUILD), sqlite_store.recent_wars(GUILD, 3), sqlite_store.guild_ids()
+        )
+
+    queued = reads()
+    assert queued[0] == records and queued[1] == 8 and queued[2]["total"] == 8
+    assert queued[3] == {record["war_id"] for record in records}
+    assert queued[4] == sorted(records, key=lambda record: record["end_time_utc"], reverse=True)[:3]
+    asyncio.run(sqlite_store.save())
+    assert not sqlite_store._queued
+    assert reads() == queued
+
+
+def test_save_waits_for_the_write_lock_off_the_loop(sqlite_store, war_history):
+    record = war_history(1, seed=6)[0]
+    other = sqlite3.connect(sqlite_store.filepath, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")  # E.g. another shard process writing.
+
+    async def scenario():
+        sqlite_store.append(GUILD, record)
+        save = asyncio.create_task(sqlite_store.save())
+        await asyncio.sleep(0.2)
+        assert not save.done()  # Still waiting for the lock, without holding up the loop.
+        other.execute("COMMIT")
+        await save
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        other.close()
+    assert not sqlite_store._queued
+    assert sqlite_store.get(GUILD) == [record]
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import celestialsentry as cs
+
+GUILD = "1000000000000000001"
+OTHER_GUILD = "1000000000000000002"
+
+
+def read_json(path) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_json_round_trip(data_dir):
+    manager = cs.DataManager("data.json")
+    manager.set(GUILD, {"backup_role_id": 1})
+    manager.append(OTHER_GUILD, {"war_id": 2})
+    asyncio.run(manager.save())
+
+    assert read_json(data_dir / "data.json") == {GUILD: {"backup_role_id": 1}, OTHER_GUILD: [{"war_id": 2}], cs.DataManager.JOURNAL_SEQ_KEY: 0}
+    assert dict(cs.DataManager("data.json").items()) == dict(manager.items())
+
+
+def test_write_behind_is_persisted_on_flush(data_dir):
+    async def scenario():
+        manager = cs.DataManager("data.json", write_behind=60)
+        manager.set(GUILD, {"a": 1})
+        await manager.save()
+        assert not (data_dir / "data.json").exists()
+        await manager.flush()
+
+    asyncio.run(scenario())
+    assert read_json(data_dir / "data.json") == {GUILD: {"a": 1}, cs.DataManager.JOURNAL_SEQ_KEY: 0}
+
+
+def test_failed_write_behind_is_retried(data_dir, monkeypatch):
+    async def scenario():
+        manager = cs.DataManager("data.json", write_behind=60)
+        write_snapshot = manager._write_snapshot
+
+        def fail(data):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(manager, "_write_snapshot", fail)
+        manager.set(GUILD, {"a": 1})
+        await manager.save()
+        await manager.flush()
+        assert not (data_dir / "data.json").exists()
+
+        monkeypatch.setattr(manager, "_write_snapshot", write_snapshot)
+        await manager.flush()
+
+    asyncio.run(scenario())
+    assert read_json(data_dir / "data.json")[GUILD] == {"a": 1}
+
+
+def test_snapshot_ignores_later_in_place_edits(data_dir):
+    manager = cs.DataManager("data.json")
+    request = {"joined": [{"user_id": 1}]}
+    manager.set(GUILD, request)
+    snapshot = manager._snapshot()
+
+    request["joined"].append({"user_id": 2})  # Edited on the loop while the snapshot is being written.
+    manager._write_snapshot(snapshot)
+    assert read_json(data_dir / "data.json")[GUILD] == {"joined": [{"user_id": 1}]}
+
+    manager.set(GUILD, request)
+    asyncio.run(manager.save())
+    assert read_json(data_dir / "data.json")[GUILD] == {"joined": [{"user_id": 1}, {"user_id": 2}]}
+
+
+@pytest.mark.parametrize("list_factory", [None, cs.WarRecordColumns])
+def test_appends_only_copy_new_items_on_the_loop(data_dir, war_history, list_factory):
+    records = war_history(30, seed=8)
+    manager = cs.DataManager("data.json", snapshot_format="binary", list_factory=list_factory)
+    manager.set(GUILD, records[:20])
+    asyncio.run(manager.save())
+    first = manager._frozen[GUILD]
+
+    for record in records[20:]:
+        manager.append(GUILD, record)
+    snapshot = manager._snapshot()
+    pending = snapshot[GUILD]
+    assert pending.base is first and list(pending.tail) == records[20:]
+
+    manager.append(GUILD, {"war_id": 99})  # Appended while the snapshot is being written.
+    manager._write_snapshot(snapshot)
+    assert list(cs.DataManager("data.json", snapshot_format="binary").get(GUILD)) == records
+
+
+def test_loaded_encoding_is_merged_with_new_appends(data_dir, war_history):
+    records = war_history(12, seed=9)
+    manager = cs.DataManager("data.json", snapshot_format="binary")
+    manager.set(GUILD, records[:10])
+    asyncio.run(manager.save())
+
+    reloaded = cs.DataManager("data.json", snapshot_format="binary")
+    loaded = reloaded._encoded[GUILD]
+    reloaded.append(GUILD, records[10])
+    reloaded.append(GUILD, records[11])
+    assert reloaded._snapshot()[GUILD].base.entry is loaded
+    asyncio.run(reloaded.save())
+    assert cs.DataManager("data.json", snapshot_format="binary").get(GUILD) == records
+
+
+def test_recording_a_war_does_not_wait_for_the_write(data_dir, make_bot, war_history, monkeypatch):
+    bot = make_bot()
+    release = threading.Event()
+    write_snapshot = bot.war_data._write_snapshot
+
+    def slow_write(data):
+        release.wait(timeout=10)
+        return write_snapshot(data)
+
+    monkeypatch.setattr(bot.war_data, "_write_snapshot", slow_write)
+    record = war_history(1, seed=10)[0]
+
+    async def scenario():
+        await asyncio.wait_for(bot.record_war(GUILD, record), timeout=1)
+        release.set()
+        await bot.war_data.flush()
+
+    asyncio.run(scenario())
+    assert read_json(data_dir / "war_data.json")[GUILD] == [record]
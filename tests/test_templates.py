@@ -0,0 +1,85 @@
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+
+import discord
+
+import celestialsentry as cs
+from conftest import GUILD_ID, CHANNEL_ID, ROLE_ID, FakeRole
+
+GUILD = str(GUILD_ID)
+
+
+def test_template_is_compiled_once(make_harness):
+    h = make_harness()
+    template = h.bot.request_template(h.guild)
+    assert template is h.bot.request_template(h.guild)
+    assert template.allowed_channel_id == CHANNEL_ID and template.backup_role.id == ROLE_ID
+
+    embed = template.render(h.author, "roblox_1", "opp_1, opp_2", "Europe", None)
+    again = template.render(h.author, "roblox_2", "opp_3", "Asia", "https://example.com")
+    assert embed.color == discord.Color.gold()
+    assert embed.thumbnail.url == cs.RequestTemplate.DEFAULT_THUMBNAIL_URL
+    assert [field.value for field in embed.fields][1:3] == ["`opp_1, opp_2`", "`Europe`"]
+    assert [field.value for field in again.fields][1:3] == ["`opp_3`", "`Asia`"]
+
+
+def test_setup_recompiles_the_template(make_harness):
+    h = make_harness()
+    before = h.bot.request_template(h.guild)
+
+    asyncio.run(cs.setup_command.callback(
+        h.interaction(user=h.admin()), h.channel, FakeRole(ROLE_ID), embed_color="#123456", thumbnail_url="https://example.com/t.png"
+    ))
+    request = asyncio.run(h.send_request())
+
+    embed = request.sent_message.embeds[0]
+    assert h.bot.request_template(h.guild) is not before
+    assert embed.color == discord.Color(0x123456) and embed.thumbnail.url == "https://example.com/t.png"
+
+
+def test_deleting_the_role_or_channel_drops_the_template(make_harness):
+    h = make_harness()
+    guild = SimpleNamespace(id=GUILD_ID)
+
+    async def scenario():
+        h.bot.request_template(h.guild)
+        await h.bot.on_guild_role_delete(SimpleNamespace(id=ROLE_ID + 1, guild=guild))
+        await h.bot.on_guild_channel_delete(SimpleNamespace(id=CHANNEL_ID + 1, guild=guild))
+        assert GUILD in h.bot._request_templates
+
+        await h.bot.on_guild_role_delete(SimpleNamespace(id=ROLE_ID, guild=guild))
+        assert GUILD not in h.bot._request_templates
+
+        h.bot.request_template(h.guild)
+        await h.bot.on_guild_channel_delete(SimpleNamespace(id=CHANNEL_ID, guild=guild))
+        assert GUILD not in h.bot._request_templates
+
+    asyncio.run(scenario())
+
+
+def test_config_edited_on_disk_is_hot_reloaded(make_harness, data_dir):
+    h = make_harness()
+    asyncio.run(h.bot.configs.save())
+    h.bot.request_template(h.guild)
+
+    path = data_dir / "config.json"
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data[GUILD]["embed_color"] = 0xABCDEF
+    data[GUILD]["retention_days"] = 30
+    path.write_text(json.dumps(data), encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    async def scenario():
+        watcher = asyncio.get_running_loop().create_task(h.bot._watch_config(interval=0))
+        while GUILD in h.bot._request_templates:
+            await asyncio.sleep(0.01)
+        watcher.cancel()
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+    assert h.bot.configs.get(GUILD)["embed_color"] == 0xABCDEF
+    assert h.bot.request_template(h.guild).render(h.author, "r", "o", "Europe", None).color == discord.Color(0xABCDEF)
+    assert dict(h.bot.retention_index.items()) == {GUILD: 30}
+    assert h.bot.configs.reload_changed() == []
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+import celestialsentry as cs
+
+GUILD = "1000000000000000001"
+
+
+def expected_summary(records) -> dict:
+    def count(status):
+        return sum(1 for record in records if record["status"] == status)
+    return {
+        "total": len(records), "wins": count("Win"), "losses": count("Loss"), "truces": count("Truce"),
+        "expired": count("Expired"), "total_duration": pytest.approx(sum(r["duration_seconds"] for r in records))
+    }
+
+
+def test_aggregates_match_a_full_pass(war_history):
+    records = war_history(300, seed=5)
+    stats = cs.GuildWarStats.from_records(records)
+
+    assert stats.summary() == expected_summary(records)
+    newest = sorted(records, key=lambda r: r["end_time_utc"], reverse=True)[:cs.GuildWarStats.RECENT_LIMIT]
+    assert [w["war_id"] for w in stats.recent] == [w["war_id"] for w in newest]
+
+
+def test_older_war_does_not_displace_recent_ones(war_history):
+    records = war_history(10, seed=6)
+    stats = cs.GuildWarStats.from_records(records[1:])
+    recent = list(stats.recent)
+    stats.add(records[0])
+
+    assert stats.recent == recent
+    assert stats.total == 10
+
+
+@pytest.mark.parametrize("war_storage", ["json", "sqlite"])
+def test_record_war_keeps_aggregates_in_step_with_storage(make_bot, war_history, war_storage):
+    records = war_history(40, seed=7)
+    bot = make_bot(war_storage=war_storage)
+    bot.war_data.set(GUILD, records[:30])
+
+    async def scenario():
+        assert bot.guild_war_stats(GUILD).total == 30  # Built from storage on first access.
+        for record in records[30:]:
+            await bot.record_war(GUILD, record)
+
+    asyncio.run(scenario())
+    assert bot.guild_war_stats(GUILD).summary() == expected_summary(records)
+    assert bot.verify_war_stats(GUILD)
+
+
+def test_verify_war_stats_rebuilds_drifted_aggregates(make_bot, war_history):
+    records = war_history(20, seed=8)
+    bot = make_bot()
+    bot.war_data.set(GUILD, records)
+    bot.guild_war_stats(GUILD).add(records[0])  # Counted twice.
+
+    assert not bot.verify_war_stats(GUILD)
+    assert bot.guild_war_stats(GUILD).summary() == expected_summary(records)
+    assert bot.verify_war_stats(GUILD)
+
+
+def test_clear_war_history_resets_aggregates(make_bot, war_history):
+    bot = make_bot()
+    bot.war_data.set(GUILD, war_history(10, seed=9))
+    assert bot.guild_war_stats(GUILD).total == 10
+
+    assert asyncio.run(bot.clear_war_history(GUILD)) == 10
+    assert bot.guild_war_stats(GUILD).total == 0
+    assert bot.verify_war_stats(GUILD)
@@ -0,0 +1,71 @@
+"""
+/wartrend chart rendering. Kept apart from celestialsentry so the chart worker processes
+only import this module and matplotlib, never the bot script and its module-level bot.
+"""
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+
+def start_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Starts a pool of `workers` spawned chart processes. A spawned child re-runs the
+    parent's __main__ as __mp_main__ before its first task; the bot script checks for
+    that (CHART_WORKER) and skips building a bot, so the workers only run this module.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=init_worker)
+
+
+def init_worker():
+    """Runs once in each chart worker: loads matplotlib up front, so the first chart isn't slower than the rest."""
+    try:
+        import matplotlib
+    except ImportError:
+        return  # /wartrend is disabled without it; nothing will be rendered here.
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+
+
+def render_trend_chart(period: str, series: List[tuple]) -> bytes:
+    """
+    Draws a WarRollups series as a PNG: wars per bucket stacked by result with the win rate
+    on top, and the average duration below. Runs in a chart worker process.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    dates = [row[0] for row in series]
+    wins, losses, truces, expired, totals, durations = (list(column) for column in zip(*[row[1:] for row in series]))
+    width = 5 if period == "week" else 0.8
+
+    figure, (counts_axis, duration_axis) = plt.subplots(2, 1, figsize=(10, 6), sharex=True, gridspec_kw={"height_ratios": (3, 2)})
+    try:
+        bottom = [0] * len(dates)
+        for label, values, color in (("Wins", wins, "#2ecc71"), ("Losses", losses, "#e74c3c"), ("Truces", truces, "#95a5a6"), ("Expired", expired, "#34495e")):
+            if any(values):
+                counts_axis.bar(dates, values, width, bottom=bottom, label=label, color=color)
+                bottom = [b + v for b, v in zip(bottom, values)]
+        counts_axis.set_ylabel("Wars")
+        counts_axis.legend(loc="upper left", fontsize="small")
+
+        rate_axis = counts_axis.twinx()
+        rated = [(d, w / (w + l) * 100) for d, w, l in zip(dates, wins, losses) if w + l]
+        if rated:
+            rate_axis.plot(*zip(*rated), color="#3498db", marker="o", markersize=3, label="Win rate")
+        rate_axis.set_ylim(0, 100)
+        rate_axis.set_ylabel("Win rate (%)")
+
+        duration_axis.plot(dates, [d / t / 60 for d, t in zip(durations, totals)], color="#9b59b6", marker="o", markersize=3)
+        duration_axis.set_ylabel("Avg. duration (min)")
+        duration_axis.set_ylim(bottom=0)
+        duration_axis.grid(axis="y", alpha=0.3)
+        figure.autofmt_xdate()
+        figure.tight_layout()
+
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format="png", dpi=100)
+        return buffer.getvalue()
+    finally:
+        plt.close(figure)